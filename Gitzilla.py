@@ -1,15 +1,28 @@
 #!/usr/bin/env python3
 
 import os
-import re
+import sys
 import tkinter as tk
 import tkinter.ttk as ttk
-import subprocess
-import tempfile
-import shutil
 from tkinter import filedialog, messagebox
 from pathlib import Path
 
+# Git, SSH and upload logic lives in the GUI-free gitzilla_core package
+from gitzilla_core.api import connect_repo, open_cache, resume_upload, upload_batch, upload_to_repo
+from gitzilla_core.cache import BROWSE_MODE, CLONE_MODES, parse_target, repo_key, sparse_add
+from gitzilla_core.config import load_config, save_config
+from gitzilla_core.dedup import ContentIndex
+from gitzilla_core.jobs import GitzillaError, JobCancelled, JobExecutor
+from gitzilla_core.journal import UploadJournal
+from gitzilla_core.keys import DEFAULT_KEY_NAME, KeyStore
+from gitzilla_core.multi import MultiRepoSync
+from gitzilla_core.progress import format_size
+from gitzilla_core.ssh import SshSession
+from gitzilla_core.trace import Tracer
+from gitzilla_core.tree import TreeCache
+from gitzilla_core.upload import UploadItem, collect_upload_items, default_commit_message, parse_dropped_paths
+from gitzilla_core.watch import FolderSync
+
 # For drag and drop (optional):
 try:
     from tkdnd_wrapper import TkDND
@@ -24,6 +37,12 @@ ENTRY_COLOR = "#21262D"  # entry / button background
 BTN_COLOR   = "#21262D"
 BTN_FG      = "#C9D1D9"
 
+# Shown in the username field until the user types their own; it never names a key
+USERNAME_PLACEHOLDER = "yourUsername"
+# Keys not tied to an account: the one made with no username, and older ones named after the placeholder
+UNNAMED_KEYS = (DEFAULT_KEY_NAME, USERNAME_PLACEHOLDER)
+
+
 class GitzillaApp:
     def __init__(self, master):
         self.master = master
@@ -37,9 +56,17 @@ class GitzillaApp:
             self.dnd = TkDND(master)
 
         #  Track program state
-        self.clone_dir = None
+        self.config = load_config()
+        self.cache = open_cache(self.config)
+        self.cache.reaper.sweep()  # finish deleting what a previous session left behind
+        self.ssh = SshSession(self.config["ssh_multiplex"], self.config["ssh_control_persist"])
+        self.clone_dir = None     # working clone; None in browse mode
+        self.repo_dir = None      # where folders are read: the clone, or the bare browse repository
+        self.repo_target = None   # (cache key, URL) of the connected repository
+        self.keys = KeyStore()
+        self.journal = UploadJournal()  # uploads not pushed yet, resumable after a restart
+        self.index = ContentIndex()     # file hashes, to skip files a repository already has
         self.generated_priv_key = None
-        self.generated_pub_key = None
 
         # Store the entire public key
         self.current_pub_key_full = ""
@@ -85,6 +112,17 @@ class GitzillaApp:
         )
         self.copy_key_btn.grid(row=0, column=2, padx=5, pady=5, sticky="w")
 
+        # Replace the key with a fresh one
+        self.new_key_btn = tk.Button(
+            self.top_frame,
+            text="New Key",
+            command=lambda: self.generate_ssh_key(replace=True),
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=10
+        )
+        self.new_key_btn.grid(row=0, column=3, padx=5, pady=5, sticky="w")
+
         # --------------- 2) GitHub Username & Repo Name + Connect Button --------------- #
         self.second_frame = tk.Frame(master, bg=BG_COLOR)
         self.second_frame.pack(pady=10, fill="x", padx=10)
@@ -108,7 +146,7 @@ class GitzillaApp:
             fg=FG_COLOR
         )
         self.username_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
-        self.username_entry.insert(0, "yourUsername")  # example default
+        self.username_entry.insert(0, USERNAME_PLACEHOLDER)  # example default
 
         # Repo name label
         self.repo_name_label = tk.Label(
@@ -142,7 +180,63 @@ class GitzillaApp:
         )
         self.connect_btn.grid(row=0, column=4, padx=15, pady=5, sticky="w")
 
-        # --------------- 3) Folder Dropdown --------------- #
+        # Clone mode (saved to config on Connect)
+        self.clone_mode_label = tk.Label(
+            self.second_frame,
+            text="Clone mode:",
+            bg=BG_COLOR,
+            fg=FG_COLOR
+        )
+        self.clone_mode_label.grid(row=1, column=0, padx=5, pady=5, sticky="e")
+
+        self.clone_mode_var = tk.StringVar(value=self.config["clone_mode"])
+        self.clone_mode_dropdown = ttk.Combobox(
+            self.second_frame,
+            textvariable=self.clone_mode_var,
+            state="readonly",
+            width=27
+        )
+        self.clone_mode_dropdown.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.clone_mode_dropdown['values'] = list(CLONE_MODES) + [BROWSE_MODE]
+
+        self.sparse_var = tk.BooleanVar(value=bool(self.config["sparse_checkout"]))
+        self.sparse_check = tk.Checkbutton(
+            self.second_frame,
+            text="Sparse checkout",
+            variable=self.sparse_var,
+            bg=BG_COLOR,
+            fg=FG_COLOR,
+            selectcolor=ENTRY_COLOR,
+            activebackground=BG_COLOR,
+            activeforeground=FG_COLOR
+        )
+        self.sparse_check.grid(row=1, column=2, padx=5, pady=5, sticky="w")
+
+        # Push the upload queue into many repositories at once
+        self.multi_btn = tk.Button(
+            self.second_frame,
+            text="Multi-Repo...",
+            command=self.open_multi_repo_window,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        )
+        self.multi_btn.grid(row=1, column=4, padx=15, pady=5, sticky="w")
+        self.multi_window = None
+
+        # Rolling per-phase timings
+        self.timings_btn = tk.Button(
+            self.second_frame,
+            text="Timings...",
+            command=self.open_timings_window,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        )
+        self.timings_btn.grid(row=1, column=3, padx=5, pady=5, sticky="e")
+        self.timings_window = None
+
+        # --------------- 3) Folder Tree --------------- #
         self.third_frame = tk.Frame(master, bg=BG_COLOR)
         self.third_frame.pack(pady=10, fill="x", padx=10)
 
@@ -152,18 +246,23 @@ class GitzillaApp:
             bg=BG_COLOR,
             fg=FG_COLOR
         )
-        self.folders_label.grid(row=0, column=0, padx=5, pady=5, sticky="e")
+        self.folders_label.grid(row=0, column=0, padx=5, pady=5, sticky="ne")
 
+        # Selected target folder, repo-relative ("" is the top level)
         self.folders_var = tk.StringVar()
-        self.folders_dropdown = ttk.Combobox(
-            self.third_frame,
-            textvariable=self.folders_var,
-            state="readonly",
-            width=30
-        )
-        self.folders_dropdown.grid(row=0, column=1, padx=5, pady=5, sticky="w")
-        self.folders_dropdown['values'] = ["(No folders yet)"]
-        self.folders_dropdown.current(0)
+        # Folders are read with git ls-tree as they are expanded; item ids are
+        # "/" + path, "?" + path marks a folder whose children aren't loaded yet
+        self.trees = TreeCache()
+        self.folder_shas = {}  # item id -> tree SHA
+        self.folders_tree = ttk.Treeview(self.third_frame, show="tree", selectmode="browse", height=6)
+        self.folders_tree.column("#0", width=330)
+        self.folders_tree.grid(row=0, column=1, padx=(5, 0), pady=5, sticky="w")
+        self.folders_scroll = ttk.Scrollbar(self.third_frame, orient="vertical", command=self.folders_tree.yview)
+        self.folders_scroll.grid(row=0, column=2, pady=5, sticky="ns")
+        self.folders_tree.configure(yscrollcommand=self.folders_scroll.set)
+        self.folders_tree.insert("", "end", iid="/", text="(No folders yet)")
+        self.folders_tree.bind("<<TreeviewOpen>>", self.on_folder_opened)
+        self.folders_tree.bind("<<TreeviewSelect>>", self.on_folder_selected)
 
         # --------------- 4) New file/folder path --------------- #
         self.fourth_frame = tk.Frame(master, bg=BG_COLOR)
@@ -227,6 +326,43 @@ class GitzillaApp:
         if self.dnd:
             self.dnd.bindtarget(self.drag_label, "text/uri-list", "<Drop>", self.handle_drop)
 
+        self.locate_folder_btn = tk.Button(
+            self.fifth_frame,
+            text="Locate Folder",
+            command=self.locate_folder_dialog,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        )
+        self.locate_folder_btn.grid(row=1, column=0, padx=5, pady=5, sticky="nw")
+
+        # Upload queue: every file here goes into the same commit and push
+        self.upload_items = []
+        self.item_rows = {}           # id(item) -> listbox row
+        # (listed item, item with its repo-relative dest, (key, url, clone_dir, mode)) awaiting the next push
+        self.pending_uploads = []
+        self.uploads_in_flight = set()  # ids of listed items in the running push
+        self.flush_after_id = None
+        self.queue_listbox = tk.Listbox(
+            self.fifth_frame,
+            bg=ENTRY_COLOR,
+            fg=FG_COLOR,
+            width=50,
+            height=6,
+            activestyle="none"
+        )
+        self.queue_listbox.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+
+        self.clear_queue_btn = tk.Button(
+            self.fifth_frame,
+            text="Clear Queue",
+            command=self.clear_upload_queue,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        )
+        self.clear_queue_btn.grid(row=1, column=2, padx=5, pady=5, sticky="nw")
+
         # --------------- 6) Upload & progress bar --------------- #
         self.sixth_frame = tk.Frame(master, bg=BG_COLOR)
         self.sixth_frame.pack(pady=10, fill="x", padx=10)
@@ -249,6 +385,43 @@ class GitzillaApp:
         )
         self.progress_bar.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
+        self.cancel_btn = tk.Button(
+            self.sixth_frame,
+            text="Cancel",
+            command=self.cancel_operation,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=10,
+            state="disabled"
+        )
+        self.cancel_btn.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+
+        # Hash files into git from where they are instead of copying them into the clone
+        self.in_place_var = tk.BooleanVar(value=self.config["ingest_mode"] == "in_place")
+        self.in_place_check = tk.Checkbutton(
+            self.sixth_frame,
+            text="Hash in place (no copy)",
+            variable=self.in_place_var,
+            bg=BG_COLOR,
+            fg=FG_COLOR,
+            selectcolor=ENTRY_COLOR,
+            activebackground=BG_COLOR,
+            activeforeground=FG_COLOR
+        )
+        self.in_place_check.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+
+        # Keep uploading whatever is written to a local folder
+        self.watch_btn = tk.Button(
+            self.sixth_frame,
+            text="Watch Folder...",
+            command=self.toggle_watch,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        )
+        self.watch_btn.grid(row=1, column=2, padx=5, pady=5, sticky="w")
+        self.watch_job = None
+
         # --------------- Status and Exit --------------- #
         self.status_var = tk.StringVar(value="Ready.")
         self.status_label = tk.Label(
@@ -270,55 +443,57 @@ class GitzillaApp:
         )
         self.exit_btn.pack(pady=5)
 
+        # Background job runner; results come back through master.after polling. Every
+        # job and git command is timed; with "trace" set in the config, spans are also written out.
+        self.tracer = Tracer.from_config(self.config)
+        self.jobs = JobExecutor(master, on_status=self.update_status, on_progress=self.set_progress,
+                                tracer=self.tracer)
+        self.jobs_stopped = True
+        self.master.protocol("WM_DELETE_WINDOW", self.quit_app)
+
     #   1) Generate SSH Key
-    def generate_ssh_key(self):
-        """Generate new SSH key pair, copy pubkey to clipboard, show snippet."""
-        # Define a persistent directory for SSH keys for easier debugging
-        keys_dir = Path.home() / ".gitzilla_keys"
-        keys_dir.mkdir(exist_ok=True)
-        self.generated_priv_key = keys_dir / "id_rsa_gitzilla"
-        self.generated_pub_key = self.generated_priv_key.with_suffix(".pub")
-
-        # Cleanup old keys if they exist
-        if self.generated_priv_key.exists():
-            self.generated_priv_key.unlink()
-        if self.generated_pub_key.exists():
-            self.generated_pub_key.unlink()
-
-        self.update_status("Generating SSH key pair...")
-        try:
-            subprocess.run([
-                "ssh-keygen",
-                "-t", "rsa",
-                "-b", "4096",
-                "-C", "gitzilla_key",
-                "-f", str(self.generated_priv_key),
-                "-N", ""
-            ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.decode().strip() if e.stderr else "Unknown error."
-            self.update_status(f"Error generating key: {error_msg}")
-            messagebox.showerror("SSH Key Generation Error", f"Error generating key:\n{error_msg}")
-            return
-
-        # Read the public key
+    def generate_ssh_key(self, replace=False):
+        """
+        Load the SSH key for the entered GitHub username (or generate one if there
+        is none, or replace is set), copy pubkey to clipboard, show snippet.
+        """
+        if not self._ensure_idle():
+            return
         try:
-            with open(self.generated_pub_key, "r") as f:
-                pub_key = f.read().strip()
-                self.current_pub_key_full = pub_key
-        except Exception as e:
-            self.update_status(f"Error reading public key: {str(e)}")
-            messagebox.showerror("Public Key Error", f"Error reading public key:\n{str(e)}")
+            name = self._key_name()
+            self.keys.path_for(name)
+        except GitzillaError as e:
+            self.update_status(f"Error: {e.message}")
+            messagebox.showerror(e.title, e.message)
             return
+        keys, key_type = self.keys, self.config["ssh_key_type"]
+
+        def work(job):
+            if replace:
+                return keys.generate(job, name, key_type) + (True, name)
+            if keys.get(name) is None:
+                # A key made before a username was entered is the one registered on GitHub: keep using it
+                only = keys.only()
+                if only is not None and only[0] in UNNAMED_KEYS:
+                    return only[1], only[2], False, only[0]
+            return keys.ensure(job, name, key_type) + (name,)
+
+        def done(result):
+            self.generated_priv_key, self.current_pub_key_full, created, used = result
+
+            # Show snippet
+            snippet = self.current_pub_key_full[:30] + "..."
+            self.pubkey_snippet_var.set(snippet)
+
+            # Copy to clipboard
+            self.master.clipboard_clear()
+            self.master.clipboard_append(self.current_pub_key_full)
+            if created:
+                self.update_status("SSH key generated & public key copied to clipboard.\nPlease add it to your GitHub account.")
+            else:
+                self.update_status(f"Using saved SSH key '{used}'; public key copied to clipboard.")
 
-        # Show snippet
-        snippet = self.current_pub_key_full[:30] + "..."
-        self.pubkey_snippet_var.set(snippet)
-
-        # Copy to clipboard
-        self.master.clipboard_clear()
-        self.master.clipboard_append(self.current_pub_key_full)
-        self.update_status("SSH key generated & public key copied to clipboard.\nPlease add it to your GitHub account.")
+        self._start_job("keygen", work, done, self._job_failed)
 
     def copy_pub_key(self):
         """Copies the full public key to the clipboard again."""
@@ -336,9 +511,10 @@ class GitzillaApp:
     def connect_to_github(self):
         """
         1) Uses provided GitHub username and repository name to build SSH URL.
-        2) Clones the repository using the specified SSH key.
+        2) Clones the repository using the specified SSH key, or fetches into
+           the cached clone from an earlier session.
         """
-        if not self.generated_priv_key or not self.generated_priv_key.exists():
+        if not self._load_key():
             self.update_status("Error: No generated SSH key found. Generate SSH key first.")
             messagebox.showerror("No SSH Key", "No generated SSH key found. Please generate an SSH key first.")
             return
@@ -356,211 +532,697 @@ class GitzillaApp:
             messagebox.showerror("Repository Name Missing", "Please enter a repository name.")
             return
 
+        if self.pending_uploads:
+            # They were queued for the repository connected now; don't let them follow the switch
+            self.flush_uploads()
+            self.update_status("Pushing the queued uploads first; connect again once they are done.")
+            return
+
+        if not self._ensure_idle():
+            return
+
+        try:
+            key = repo_key(github_username, repo_name)
+        except GitzillaError as e:
+            self.update_status(f"Error: {e.message}")
+            messagebox.showerror(e.title, e.message)
+            return
+
         self.github_username = github_username
 
         # Step 1: Build final SSH URL
         final_url = f"git@github.com:{self.github_username}/{repo_name}.git"
-        self.update_status(f"Cloning repository '{final_url}'...")
-
-        # Step 2: Clone the repository using GIT_SSH_COMMAND
-        try:
-            # Set GIT_SSH_COMMAND to use the specific SSH key
-            git_env = os.environ.copy()
-            git_env["GIT_SSH_COMMAND"] = f'ssh -i "{self.generated_priv_key}" -o IdentitiesOnly=yes -o StrictHostKeyChecking=no'
-
-            # Create a temporary directory for cloning
-            if self.clone_dir and Path(self.clone_dir).exists():
-                shutil.rmtree(self.clone_dir)
-            self.clone_dir = tempfile.mkdtemp(prefix="gitzilla_clone_")
-
-            # Clone the repository
-            clone_cmd = ["git", "clone", final_url, self.clone_dir]
-            clone_proc = subprocess.run(
-                clone_cmd,
-                shell=False,
-                check=True,
-                capture_output=True,
-                text=True,
-                env=git_env
-            )
+        self.update_status(f"Connecting to '{final_url}'...")
 
-            self.update_status("Repository cloned successfully.")
+        git_env = self._git_env()
 
-        except subprocess.CalledProcessError as e:
-            # Capture and display stderr
-            error_output = e.stderr.strip() if e.stderr else "No error output."
-            self.update_status(f"Error cloning repository:\n{error_output}")
-            messagebox.showerror("Clone Error", f"Error cloning repository:\n{error_output}")
+        # Remember the clone strategy for next time
+        mode = self.clone_mode_var.get()
+        sparse = self.sparse_var.get()
+        self.config.update(clone_mode=mode, sparse_checkout=sparse)
+        try:
+            save_config(self.config)
+        except OSError as e:
+            print(f"Error saving config file: {str(e)}")
+
+        self.clone_dir = self.repo_dir = self.repo_target = None
+
+        # Step 2: Clone, or fetch into the cached clone, on a worker
+        config = dict(self.config)
+        cache, trees = self.cache, self.trees
+
+        def work(job):
+            job.progress(0)
+            repo_dir, reused, _ = connect_repo(job, cache, key, final_url, config, env=git_env, trees=trees)
+            job.progress(100)
+            root = trees.root(job, repo_dir, env=git_env)
+            folders = trees.folders(job, repo_dir, root, env=git_env) if root else []
+            return str(repo_dir), reused, folders
+
+        def done(result):
+            self.repo_dir, reused, folders = result
+            self.repo_target = (key, final_url)
+            if mode == BROWSE_MODE:
+                self.update_status("Repository folders loaded (browse only, no checkout).")
+            else:
+                self.clone_dir = self.repo_dir
+                if reused:
+                    self.update_status("Repository updated from local cache.")
+                else:
+                    self.update_status("Repository cloned successfully.")
+            # Step 3: Show the top-level folders in the tree
+            self.populate_folders(folders)
+            self.offer_resume()
+
+        def failed(exc):
+            self._job_failed(exc, "Clone Error", "Unexpected error during cloning")
+
+        self._start_job("clone", work, done, failed)
+
+    def populate_folders(self, folders, parent="/"):
+        """Show (name, tree SHA) sub-folders under a tree item; the top level by default."""
+        tree = self.folders_tree
+        if parent == "/":
+            tree.delete(*tree.get_children(""))
+            self.folder_shas.clear()
+            tree.insert("", "end", iid="/", text="(top level)", open=True)
+            self.folders_var.set("")
+            tree.selection_set("/")
+        base = parent.rstrip("/")
+        for name, sha in folders:
+            iid = f"{base}/{name}"
+            tree.insert(parent, "end", iid=iid, text=name)
+            self.folder_shas[iid] = sha
+            # Placeholder child so the folder can be expanded; replaced on first open
+            tree.insert(iid, "end", iid="?" + iid, text="...")
+        if parent == "/":
+            self.update_status("Folders updated.")
+
+    def on_folder_opened(self, event=None):
+        """Load the sub-folders of an expanded folder (cached per tree SHA)."""
+        tree = self.folders_tree
+        iid = tree.focus()
+        if not self.repo_dir or not tree.exists("?" + iid):
             return
-        except Exception as e:
-            self.update_status(f"Unexpected error during cloning: {str(e)}")
-            messagebox.showerror("Clone Error", f"Unexpected error during cloning:\n{str(e)}")
+        tree_sha = self.folder_shas[iid]
+        repo_dir, trees, git_env = self.repo_dir, self.trees, self._git_env()
+
+        def done(folders):
+            if repo_dir != self.repo_dir or not tree.exists("?" + iid):
+                return  # reconnected meanwhile, or already loaded
+            tree.delete("?" + iid)
+            self.populate_folders(folders, iid)
+
+        def failed(exc):
+            if not isinstance(exc, JobCancelled):
+                self.update_status(f"Error reading folder: {getattr(exc, 'stderr', None) or exc}")
+
+        # Runs beside other jobs: it only reads objects and never touches the work tree
+        self.jobs.submit("tree", lambda job: trees.folders(job, repo_dir, tree_sha, env=git_env), done, failed)
+
+    def on_folder_selected(self, event=None):
+        """Remember the chosen folder and widen a sparse checkout to it in the background."""
+        selection = self.folders_tree.selection()
+        if not selection or selection[0].startswith("?"):
             return
-
-        # Step 3: Populate the folders dropdown
-        try:
-            folder_list = []
-            for item in os.listdir(self.clone_dir):
-                full_path = Path(self.clone_dir) / item
-                if full_path.is_dir() and item != ".git":
-                    folder_list.append(item)
-            folder_list.sort()
-            if not folder_list:
-                folder_list = ["(No folders yet)"]
-            self.folders_dropdown['values'] = folder_list
-            self.folders_dropdown.current(0)
-            self.update_status("Folders dropdown updated.")
-        except Exception as e:
-            self.update_status(f"Error reading repository folders: {str(e)}")
-            messagebox.showerror("Folder Read Error", f"Error reading repository folders:\n{str(e)}")
+        folder_choice = selection[0].strip("/")
+        self.folders_var.set(folder_choice)
+        if not self.clone_dir or not folder_choice or self.jobs.busy():
+            return  # upload_file widens the checkout itself if needed
+        if not self.sparse_var.get():
             return
+        clone_dir = self.clone_dir
+        git_env = self._git_env()
+        self._start_job(
+            "sparse",
+            lambda job: sparse_add(job, clone_dir, [folder_choice], env=git_env),
+            lambda result: self.update_status(f"Checked out folder '{folder_choice}'."),
+            lambda exc: self._job_failed(exc, "Sparse Checkout Error", "Error widening sparse checkout")
+        )
 
     #   3) File location & DnD
     def locate_file_dialog(self):
-        """Open a file dialog and store the selected file path."""
-        fp = filedialog.askopenfilename(title="Select file to upload")
-        if fp and os.path.isfile(fp):
-            self.selected_file_var.set(fp)
-            self.update_status(f"Selected file: {os.path.basename(fp)}")
+        """Open a file dialog and queue the selected file(s)."""
+        fps = filedialog.askopenfilenames(title="Select file(s) to upload")
+        if fps:
+            self.add_to_upload_queue(self.master.tk.splitlist(fps))
+
+    def locate_folder_dialog(self):
+        """Open a folder dialog and queue every file under the selected folder."""
+        fp = filedialog.askdirectory(title="Select folder to upload")
+        if fp and os.path.isdir(fp):
+            self.add_to_upload_queue([fp])
 
     def handle_drop(self, event):
-        """Handle file(s) dropped into the drag label."""
-        dropped = event.data.strip()
-        if dropped.startswith("{") and dropped.endswith("}"):
-            dropped = dropped[1:-1]
-        if dropped.startswith("file:///"):
-            dropped = dropped[8:]
-        dropped = dropped.replace("\\", "/")
-        pieces = dropped.split()
-        fp = pieces[0]
-        if os.path.isfile(fp):
-            self.selected_file_var.set(fp)
-            self.update_status(f"File dropped: {os.path.basename(fp)}")
+        """Handle file(s) and folder(s) dropped into the drag label."""
+        # The drop data is a Tcl list: paths containing spaces arrive braced.
+        pieces = parse_dropped_paths(self.master.tk.splitlist(event.data))
+        valid = [p for p in pieces if os.path.isfile(p) or os.path.isdir(p)]
+        if valid:
+            self.add_to_upload_queue(valid)
         else:
             self.update_status("Dropped data is not a file.")
-            messagebox.showwarning("Invalid Drop", "Dropped data is not a valid file.")
+            messagebox.showwarning("Invalid Drop", "Dropped data is not a valid file or folder.")
+
+    def add_to_upload_queue(self, paths):
+        """Expand paths into upload items and add them to the queue."""
+        try:
+            new_items = collect_upload_items(paths)
+        except OSError as e:
+            self.update_status(f"Error reading selection: {str(e)}")
+            messagebox.showerror("File Error", f"Error reading selection:\n{str(e)}")
+            return
+        if not new_items:
+            self.update_status("No files found in selection.")
+            return
+        # Items from a finished upload make way for the new batch; a later
+        # item with the same destination replaces an earlier one, unless that
+        # one was already sent off with Upload (queued or being pushed): it
+        # stays, and the push that lands last wins
+        sent = {id(item) for item, _, _ in self.pending_uploads} | self.uploads_in_flight
+        kept = [item for item in self.upload_items if id(item) in sent]
+        by_dest = {item.dest: item for item in self.upload_items
+                   if item.state not in UploadItem.DONE_STATES and id(item) not in sent}
+        for item in new_items:
+            by_dest[item.dest] = item
+        self.upload_items = kept + list(by_dest.values())
+        self.refresh_upload_queue()
+        if len(new_items) == 1:
+            self.update_status(f"Selected file: {new_items[0].source.name}")
+        else:
+            self.update_status(f"Queued {len(new_items)} files.")
+
+    def clear_upload_queue(self):
+        if not self._ensure_idle():
+            return
+        self.upload_items = []
+        self.pending_uploads = []
+        self.refresh_upload_queue()
+
+    def refresh_upload_queue(self):
+        self.item_rows = {id(item): n for n, item in enumerate(self.upload_items)}
+        self.queue_listbox.delete(0, "end")
+        for item in self.upload_items:
+            self.queue_listbox.insert("end", item.label())
+        if not self.upload_items:
+            self.selected_file_var.set("(no file chosen)")
+        elif len(self.upload_items) == 1:
+            self.selected_file_var.set(str(self.upload_items[0].source))
+        else:
+            total = sum(item.size for item in self.upload_items)
+            self.selected_file_var.set(f"{len(self.upload_items)} files ({format_size(total)})")
+
+    def set_item_state(self, item, state):
+        """Update one queue entry's state (UI thread); items no longer listed are just updated."""
+        item.state = state
+        index = self.item_rows.get(id(item))
+        if index is not None:
+            self.queue_listbox.delete(index)
+            self.queue_listbox.insert(index, item.label())
 
     #   4) Upload File
     def upload_file(self):
-        """Creates a new file/folder path (if needed), copies the file in, commits, and pushes."""
-        if not self.clone_dir or not Path(self.clone_dir).exists():
+        """
+        Queue every selected file for the next push. Uploads requested within
+        upload_coalesce_s of each other (or while a push is running) are
+        landed together as one commit and one push by flush_uploads().
+        """
+        if not self.repo_target or (self.clone_dir and not Path(self.clone_dir).exists()):
             self.update_status("Error: Repository not cloned. Connect first.")
             messagebox.showerror("Clone Required", "Repository not cloned. Please connect to GitHub first.")
             return
+        if self.watch_job is not None:
+            self.update_status("Error: A folder watch is running. Stop watching to upload files by hand.")
+            messagebox.showerror("Watch Running", "A folder watch is uploading to this repository.\n"
+                                                  "Stop watching to upload files by hand.")
+            return
 
-        local_file = self.selected_file_var.get().strip()
-        if not local_file or not os.path.isfile(local_file):
+        waiting = {id(item) for item, _, _ in self.pending_uploads} | self.uploads_in_flight
+        items = [item for item in self.upload_items
+                 if item.state not in UploadItem.DONE_STATES and id(item) not in waiting]
+        if not items or not all(item.source.is_file() for item in items):
+            if waiting:
+                self.update_status("Those files are already queued for upload.")
+                return
             self.update_status("Error: No valid file to upload.")
             messagebox.showerror("No File Selected", "No valid file selected for upload.")
             return
 
         new_path = self.new_path_var.get().strip()
 
-        # Determine selected folder from dropdown
+        # Determine selected folder from the tree ("" is the top level)
         folder_choice = self.folders_var.get().strip()
-        if folder_choice in ("(No folders yet)", "(No folders yet)"):
-            folder_choice = ""  # top-level
 
-        repo_target_dir = Path(self.clone_dir) / folder_choice if folder_choice else Path(self.clone_dir)
-        full_target_path = repo_target_dir / new_path if new_path else repo_target_dir
-
-        # Create the target directory if it doesn't exist
-        try:
-            full_target_path.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            self.update_status(f"Error creating new folder(s): {str(e)}")
-            messagebox.showerror("Folder Creation Error", f"Error creating new folder(s):\n{str(e)}")
+        # Repo-relative target folder, folded into each file's destination so
+        # uploads to different folders can still share a commit
+        target_rel = "/".join(part for part in (folder_choice, new_path) if part)
+        # The repository is fixed now, not when the push runs
+        target = (*self.repo_target, self.clone_dir, self.config["clone_mode"])
+        for item in items:
+            dest = "/".join(part for part in (target_rel, item.dest) if part)
+            for entry in [entry for entry in self.pending_uploads if entry[1].dest == dest and entry[2] == target]:
+                self.pending_uploads.remove(entry)
+                self.set_item_state(entry[0], "replaced")  # a later upload to the same path wins
+            self.pending_uploads.append((item, UploadItem(item.source, dest), target))
+            self.set_item_state(item, "queued")
+
+        ingest_mode = "in_place" if self.in_place_var.get() else "copy"
+        if ingest_mode != self.config.get("ingest_mode"):
+            self.config["ingest_mode"] = ingest_mode
+            try:
+                save_config(self.config)
+            except OSError as e:
+                print(f"Error saving config file: {str(e)}")
+
+        window = float(self.config["upload_coalesce_s"])
+        if self.flush_after_id is None:
+            self.flush_after_id = self.master.after(int(window * 1000), self.flush_uploads)
+        when = "once the current operation finishes" if self.jobs.busy() else f"within {window:g}s"
+        self.update_status(f"{len(self.pending_uploads)} file(s) queued; they go out in one push "
+                           f"{when}. Queue more and Upload again to add them.")
+
+    def flush_uploads(self):
+        """
+        Commit and push what upload_file queued, once no other job is running;
+        one push per repository, to the one each file was queued for.
+        """
+        if self.flush_after_id is not None:
+            self.master.after_cancel(self.flush_after_id)
+        self.flush_after_id = None
+        if not self.pending_uploads:
             return
-
-        # Copy the local file to the target directory
-        dest_file = full_target_path / Path(local_file).name
-        try:
-            shutil.copyfile(local_file, dest_file)
-            self.update_status(f"File copied to {dest_file}.")
-        except Exception as e:
-            self.update_status(f"Error copying file: {str(e)}")
-            messagebox.showerror("File Copy Error", f"Error copying file:\n{str(e)}")
+        if self.jobs.busy():
+            # One push at a time: whatever queues up meanwhile joins the next one
+            self.flush_after_id = self.master.after(250, self.flush_uploads)
             return
 
-        # Update progress bar
+        target = self.pending_uploads[0][2]
+        batch = [entry for entry in self.pending_uploads if entry[2] == target]
+        self.pending_uploads = [entry for entry in self.pending_uploads if entry[2] != target]
+        if self.pending_uploads:
+            self.flush_after_id = self.master.after(250, self.flush_uploads)
+        originals = [item for item, _, _ in batch]
+        items = [upload for _, upload, _ in batch]
+        self.uploads_in_flight.update(id(item) for item in originals)
+        key, url, clone_dir, mode = target
+        git_env = self._git_env()
         self.progress_bar["value"] = 0
-        self.progress_bar.update_idletasks()
+        commit_msg = default_commit_message(items)
+        config = dict(self.config, clone_mode=mode)
+        cache, trees, journal, index = self.cache, self.trees, self.journal, self.index
+        on_state = lambda n, state: self.jobs.post(self.set_item_state, originals[n], state)
+
+        def work(job):
+            if clone_dir is None:
+                # Browse mode: build the commit on the bare repository, no checkout
+                return upload_batch(job, cache, key, url, items, "", config, env=git_env,
+                                    commit_msg=commit_msg, on_state=on_state, trees=trees, journal=journal,
+                                    index=index)[1]
+            return upload_to_repo(
+                job, clone_dir, items, "", config, env=git_env, commit_msg=commit_msg,
+                on_state=on_state, journal=journal, target=(key, url), index=index
+            )
 
-        # Set GIT_SSH_COMMAND to use the specific SSH key
-        git_env = os.environ.copy()
-        git_env["GIT_SSH_COMMAND"] = f'ssh -i "{self.generated_priv_key}" -o IdentitiesOnly=yes -o StrictHostKeyChecking=no'
+        def finished():
+            self.uploads_in_flight.difference_update(id(item) for item in originals)
 
-        # Commit and push changes
-        try:
-            original_cwd = os.getcwd()
-            os.chdir(self.clone_dir)
-
-            # Git add
-            add_cmd = ["git", "add", "."]
-            subprocess.run(add_cmd, shell=False, check=True, capture_output=True, text=True, env=git_env)
-            self.progress_bar["value"] = 33
-            self.progress_bar.update_idletasks()
-
-            # Git commit
-            commit_cmd = ["git", "commit", "-m", "Add file via Gitzilla"]
-            commit_proc = subprocess.run(commit_cmd, shell=False, check=True, capture_output=True, text=True, env=git_env)
-            if "nothing to commit" in commit_proc.stdout.lower():
+        def done(pushed):
+            finished()
+            if not pushed:
+                for item in originals:
+                    self.set_item_state(item, "unchanged")
                 self.update_status("Nothing to commit.")
                 messagebox.showinfo("No Changes", "No changes to commit.")
-                os.chdir(original_cwd)
                 self.progress_bar["value"] = 0
                 return
-            self.progress_bar["value"] = 66
-            self.progress_bar.update_idletasks()
-
-            # Git push
-            push_cmd = ["git", "push"]
-            subprocess.run(push_cmd, shell=False, check=True, capture_output=True, text=True, env=git_env)
-            self.progress_bar["value"] = 100
-            self.progress_bar.update_idletasks()
-
-            os.chdir(original_cwd)
-            self.update_status("File uploaded and changes pushed successfully.")
-            messagebox.showinfo("Success", "File uploaded and changes pushed successfully.")
-        except subprocess.CalledProcessError as e:
-            os.chdir(original_cwd)
-            error_output = e.stderr.strip() if e.stderr else "No error output."
-            self.update_status(f"Error during Git operations:\n{error_output}")
-            messagebox.showerror("Git Error", f"Error during Git operations:\n{error_output}")
+            if len(items) == 1:
+                msg = "File uploaded and changes pushed successfully."
+            else:
+                msg = f"{len(items)} files uploaded in one commit and pushed successfully."
+            self.update_status(msg)
+            messagebox.showinfo("Success", msg)
+
+        def failed(exc):
+            finished()
+            for item in originals:
+                if item.state not in UploadItem.DONE_STATES:
+                    self.set_item_state(item, "failed")
+            self._job_failed(exc, "Git Error", "Unexpected error during Git operations")
             self.progress_bar["value"] = 0
+
+        self._start_job("upload", work, done, failed)
+
+    def offer_resume(self):
+        """After connecting, offer to finish uploads to this repository that never got pushed."""
+        key, url = self.repo_target
+        pending = self.journal.pending(key)
+        if not pending or self.jobs.busy():
             return
-        except Exception as e:
-            os.chdir(original_cwd)
-            self.update_status(f"Unexpected error during Git operations: {str(e)}")
-            messagebox.showerror("Git Error", f"Unexpected error during Git operations:\n{str(e)}")
-            self.progress_bar["value"] = 0
+        files = sum(len(entry["items"]) for entry in pending)
+        answer = messagebox.askyesnocancel(
+            "Interrupted Uploads",
+            f"{len(pending)} earlier upload(s) to {key} ({files} files) did not finish.\n\n"
+            "Yes: resume them now\nNo: discard them\nCancel: ask again next time"
+        )
+        if answer is None:
+            return
+        if not answer:
+            for entry in pending:
+                self.journal.finish(entry["id"])
+            self.update_status("Interrupted uploads discarded.")
+            return
+
+        config = dict(self.config)
+        cache, journal, trees = self.cache, self.journal, self.trees
+        git_env = self._git_env()
+
+        def work(job):
+            return [resume_upload(job, cache, journal, entry["id"], config, env=git_env, trees=trees)
+                    for entry in pending]
+
+        def done(results):
+            pushed = sum(1 for r in results if r["status"] == "pushed")
+            msg = f"Resumed {len(results)} interrupted upload(s); {pushed} pushed."
+            self.update_status(msg)
+            messagebox.showinfo("Success", msg)
+
+        def failed(exc):
+            self._job_failed(exc, "Git Error", "Unexpected error while resuming uploads")
+
+        self._start_job("resume", work, done, failed)
+
+    #   5) Multi-repository upload
+    def open_multi_repo_window(self):
+        """Window listing target repositories and a per-repo result table."""
+        if self.multi_window is not None and self.multi_window.winfo_exists():
+            self.multi_window.lift()
             return
+        win = self.multi_window = tk.Toplevel(self.master)
+        win.title("Gitzilla - Multi-Repo Upload")
+        win.configure(bg=BG_COLOR)
+        win.geometry("700x500")
+
+        tk.Label(
+            win,
+            text="Target repositories (owner/repo or SSH URL, one per line):",
+            bg=BG_COLOR,
+            fg=FG_COLOR,
+            anchor="w"
+        ).pack(fill="x", padx=10, pady=(10, 0))
+
+        self.multi_targets_text = tk.Text(win, height=8, bg=ENTRY_COLOR, fg=FG_COLOR, insertbackground=FG_COLOR)
+        self.multi_targets_text.pack(fill="x", padx=10, pady=5)
+        self.multi_targets_text.insert("1.0", "\n".join(self.config.get("multi_targets") or []))
+
+        tk.Label(
+            win,
+            text="Uploads the queued files into the \"New file/folder path\" of every repository.",
+            bg=BG_COLOR,
+            fg=FG_COLOR,
+            anchor="w"
+        ).pack(fill="x", padx=10)
+
+        tk.Button(
+            win,
+            text="Start",
+            command=self.start_multi_repo,
+            bg=BTN_COLOR,
+            fg=BTN_FG,
+            width=15
+        ).pack(pady=5)
+
+        self.multi_table = ttk.Treeview(win, columns=("status", "seconds", "bytes"), height=10)
+        self.multi_table.heading("#0", text="Repository")
+        self.multi_table.heading("status", text="Status")
+        self.multi_table.heading("seconds", text="Duration (s)")
+        self.multi_table.heading("bytes", text="Bytes moved")
+        self.multi_table.column("#0", width=220)
+        self.multi_table.column("status", width=260)
+        self.multi_table.column("seconds", width=90, anchor="e")
+        self.multi_table.column("bytes", width=100, anchor="e")
+        self.multi_table.pack(fill="both", expand=True, padx=10, pady=10)
+
+    def start_multi_repo(self):
+        """Upload the queue into every listed repository in parallel."""
+        if not self._load_key():
+            self.update_status("Error: No generated SSH key found. Generate SSH key first.")
+            messagebox.showerror("No SSH Key", "No generated SSH key found. Please generate an SSH key first.")
+            return
+        items = [item for item in self.upload_items if item.source.is_file()]
+        if not items:
+            self.update_status("Error: No valid file to upload.")
+            messagebox.showerror("No File Selected", "No valid file selected for upload.")
+            return
+
+        lines = [line.strip() for line in self.multi_targets_text.get("1.0", "end").splitlines()]
+        targets, seen = [], set()
+        try:
+            for line in lines:
+                if line and not line.startswith("#"):
+                    target = parse_target(line)
+                    if target[1] not in seen:
+                        seen.add(target[1])
+                        targets.append(target)
+        except GitzillaError as e:
+            messagebox.showerror(e.title, e.message, parent=self.multi_window)
+            return
+        if not targets:
+            messagebox.showerror("No Targets", "Enter at least one repository.", parent=self.multi_window)
+            return
+        if not self._ensure_idle():
+            return
+
+        self.config["multi_targets"] = [line for line in lines if line]
+        try:
+            save_config(self.config)
+        except OSError as e:
+            print(f"Error saving config file: {str(e)}")
+
+        table = self.multi_table
+        table.delete(*table.get_children())
+        for _, key, _ in targets:
+            table.insert("", "end", iid=key, text=key, values=("queued", "", ""))
+
+        def on_status(key, msg):
+            if table.winfo_exists() and table.exists(key):
+                table.set(key, "status", msg)
+
+        def on_result(result):
+            if table.winfo_exists() and table.exists(result["repo"]):
+                status = result["status"] if not result["error"] else f"failed: {result['error'].splitlines()[-1]}"
+                table.item(result["repo"], values=(status, f"{result['seconds']:.1f}", format_size(result["bytes"])))
+
+        sync = MultiRepoSync(self.cache, self.config, env=self._git_env(), journal=self.journal,
+                             index=self.index)
+        target_rel = self.new_path_var.get().strip().strip("/")
+        self.progress_bar["value"] = 0
+        self.update_status(f"Uploading to {len(targets)} repositories...")
+
+        def done(results):
+            counts = {}
+            for result in results:
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+            summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+            self.update_status(f"Multi-repo upload finished: {summary}.")
+
+        self._start_job(
+            "multi",
+            lambda job: sync.run(job, targets, items, target_rel, on_status=on_status, on_result=on_result),
+            done,
+            lambda exc: self._job_failed(exc, "Multi-Repo Error", "Unexpected error during multi-repo upload")
+        )
+
+    #   6) Timings
+    def open_timings_window(self):
+        """Window with rolling percentiles of each phase's duration, refreshed every second."""
+        if self.timings_window is not None and self.timings_window.winfo_exists():
+            self.timings_window.lift()
+            return
+        win = self.timings_window = tk.Toplevel(self.master)
+        win.title("Gitzilla - Timings")
+        win.configure(bg=BG_COLOR)
+        win.geometry("560x360")
+
+        columns = ("count", "p50", "p90", "p99", "max")
+        table = ttk.Treeview(win, columns=columns, height=12)
+        table.heading("#0", text="Phase")
+        table.column("#0", width=160)
+        for column in columns:
+            table.heading(column, text=column)
+            table.column(column, width=70, anchor="e")
+        table.pack(fill="both", expand=True, padx=10, pady=10)
+
+        note = f"Last {self.tracer.window} runs per phase, in seconds."
+        if self.tracer.chrome_path:
+            note += f" Trace: {self.tracer.chrome_path}"
+        tk.Label(win, text=note, bg=BG_COLOR, fg=FG_COLOR, anchor="w", wraplength=540,
+                 justify="left").pack(fill="x", padx=10, pady=(0, 10))
+
+        def refresh():
+            if not table.winfo_exists():
+                return
+            for phase, stats in sorted(self.tracer.stats().items()):
+                values = (stats["count"],) + tuple(f"{stats[k]:.3f}" for k in columns[1:])
+                if table.exists(phase):
+                    table.item(phase, values=values)
+                else:
+                    table.insert("", "end", iid=phase, text=phase, values=values)
+            win.after(1000, refresh)
+
+        refresh()
+
+    #   7) Watch folder
+    def toggle_watch(self):
+        """
+        Start watching a local folder, uploading new and changed files into the
+        selected target folder in windowed batches; or stop the running watch.
+        """
+        if self.watch_job is not None:
+            self.watch_job.cancel()
+            self.update_status("Stopping folder watch...")
+            return
+        if not self.repo_target or (self.clone_dir and not Path(self.clone_dir).exists()):
+            self.update_status("Error: Repository not cloned. Connect first.")
+            messagebox.showerror("Clone Required", "Repository not cloned. Please connect to GitHub first.")
+            return
+        if self.pending_uploads:
+            # A watch holds the job slot until stopped, so queued uploads would never get their turn
+            self.flush_uploads()
+            self.update_status("Pushing the queued uploads first; start the watch once they are done.")
+            return
+        if not self._ensure_idle():
+            return
+        folder = filedialog.askdirectory(title="Folder to Watch", initialdir=self.config.get("watch_folder") or None)
+        if not folder:
+            return
+
+        self.config["watch_folder"] = folder
+        try:
+            save_config(self.config)
+        except OSError as e:
+            print(f"Error saving config file: {str(e)}")
+        target_rel = "/".join(part for part in (self.folders_var.get().strip(), self.new_path_var.get().strip())
+                              if part)
+        key, url = self.repo_target
+        sync = FolderSync(self.cache, key, url, folder, target_rel, self.config, env=self._git_env(),
+                          journal=self.journal, index=self.index, trees=self.trees)
+
+        def on_batch(result):
+            if result["error"]:
+                self.update_status(f"Watch: upload of {result['files']} file(s) failed, will retry: "
+                                   f"{result['error'].splitlines()[-1]}")
+            else:
+                self.update_status(f"Watch: {result['files']} file(s) {result['status']}; "
+                                   f"{result['pending']} waiting.")
+
+        def stopped(exc):
+            self.watch_job = None
+            self.watch_btn.config(text="Watch Folder...")
+            if isinstance(exc, JobCancelled):
+                self.update_status(f"Stopped watching {folder}.")
+            else:
+                self._job_failed(exc, "Watch Error", "Unexpected error while watching the folder")
+
+        self.watch_job = self._start_job("watch", lambda job: sync.run(job, on_batch=on_batch), stopped, stopped)
+        self.watch_btn.config(text="Stop Watching")
 
     #   Helpers
+    def _key_name(self):
+        """Keys are named after the GitHub account they are registered with."""
+        name = self.username_var.get().strip()
+        return DEFAULT_KEY_NAME if name in ("", USERNAME_PLACEHOLDER) else name
+
+    def _load_key(self):
+        """
+        Use the saved key for the entered account if none was generated or loaded
+        yet, or else the only saved key there is.
+        """
+        if self.generated_priv_key is None or not self.generated_priv_key.exists():
+            try:
+                found = self.keys.get(self._key_name())
+            except GitzillaError:
+                found = None
+            if found is None:
+                only = self.keys.only()
+                found = only[1:] if only is not None else None
+            if found is None:
+                return False
+            self.generated_priv_key, self.current_pub_key_full = found
+            self.pubkey_snippet_var.set(self.current_pub_key_full[:30] + "...")
+        return True
+
+    def _git_env(self):
+        """Environment for git subprocesses: GIT_SSH_COMMAND uses the generated key over the shared connection."""
+        return self.ssh.env(self.generated_priv_key)
+
     def update_status(self, msg):
         self.status_var.set(msg)
-        self.master.update_idletasks()
 
-    def quit_app(self):
-        """Cleanup clone directory and SSH keys before exiting."""
-        # Cleanup clone directory if needed
-        if self.clone_dir and Path(self.clone_dir).exists():
-            try:
-                shutil.rmtree(self.clone_dir)
-            except Exception as e:
-                print(f"Error removing clone directory: {str(e)}")
+    def set_progress(self, value):
+        self.progress_bar["value"] = value
 
-        # Cleanup generated SSH keys
-        if self.generated_priv_key and self.generated_priv_key.exists():
-            try:
-                self.generated_priv_key.unlink()
-            except Exception as e:
-                print(f"Error removing private key: {str(e)}")
-        if self.generated_pub_key and self.generated_pub_key.exists():
+    def _ensure_idle(self):
+        """Only one git job runs at a time; they all share the same clone."""
+        if self.jobs.busy():
+            self.update_status("Busy: wait for the current operation to finish or cancel it.")
+            return False
+        return True
+
+    def _start_job(self, name, work, on_success, on_error):
+        self.cancel_btn.config(state="normal")
+
+        def finish(callback):
+            def wrapper(value):
+                if not self.jobs.busy():
+                    self.cancel_btn.config(state="disabled")
+                callback(value)
+            return wrapper
+
+        return self.jobs.submit(name, work, finish(on_success), finish(on_error))
+
+    def _job_failed(self, exc, title="Error", prefix="Unexpected error"):
+        """Report a worker exception on the UI thread."""
+        if isinstance(exc, JobCancelled):
+            self.update_status("Operation cancelled.")
+            return
+        if isinstance(exc, GitzillaError):
+            title, msg = exc.title, exc.message
+        else:
+            msg = f"{prefix}:\n{str(exc)}"
+        self.update_status(msg)
+        messagebox.showerror(title, msg)
+
+    def cancel_operation(self):
+        """Cancel the running git/ssh operation."""
+        if self.jobs.busy():
+            self.jobs.cancel_all()
+            self.update_status("Cancelling...")
+
+    def quit_app(self):
+        """
+        Hide the window at once, then cancel running jobs (giving them at most
+        quit_timeout_s to stop) and close shared SSH connections. Keys and
+        clones are kept; clones being deleted are finished by the next start.
+        Uploads still waiting for their push are journaled, so the next
+        Connect offers to resume them.
+        """
+        self.master.withdraw()
+        self.master.update_idletasks()
+        if self.flush_after_id is not None:
+            self.master.after_cancel(self.flush_after_id)
+            self.flush_after_id = None
+        for target in dict.fromkeys(entry[2] for entry in self.pending_uploads):
+            key, url, clone_dir, mode = target
+            items = [upload for _, upload, queued_for in self.pending_uploads if queued_for == target]
             try:
-                self.generated_pub_key.unlink()
-            except Exception as e:
-                print(f"Error removing public key: {str(e)}")
+                self.journal.start(key, url, mode, clone_dir or self.cache.path_for(key + ".git"), items, "",
+                                   default_commit_message(items))
+            except OSError as e:
+                print(f"Error saving queued uploads: {str(e)}")
+        self.pending_uploads = []
+        self.jobs_stopped = self.jobs.shutdown(timeout=float(self.config["quit_timeout_s"]))
+        self.ssh.close()
+        self.tracer.close()
 
         self.master.destroy()
 
@@ -568,6 +1230,11 @@ def main():
     root = tk.Tk()
     app = GitzillaApp(root)
     root.mainloop()
+    if not app.jobs_stopped:
+        # A worker stuck outside a subprocess would keep the interpreter alive; an
+        # upload it was in the middle of is in the journal, so don't wait for it.
+        sys.stdout.flush()
+        os._exit(0)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Timings of the connect/upload pipeline against synthetic local repositories.
+
+    python benchmarks/pipeline.py                                # small + medium, all modes
+    python benchmarks/pipeline.py --scale large --mode browse -r 5
+    python benchmarks/pipeline.py -o results.json                # save results
+    python benchmarks/pipeline.py --baseline results.json        # compare; exit 1 on regressions
+
+Fixture repositories are generated once per scale (file count, folder count,
+history depth, blob size) with git fast-import and kept in the work directory.
+Each repetition runs on a fresh copy of the fixture and an empty clone cache.
+Targets are ordinary "git@github.com:bench/<scale>.git" SSH URLs. A
+url.insteadOf override in the environment points them at the fixture, so
+parse_target, the clone cache and the upload code run exactly as they would
+against GitHub, minus the network.
+
+Timed steps per scale and clone mode: connect (first clone or browse fetch),
+list (top level and every top-level folder through a TreeCache), upload_one
+(one file), upload_batch (--batch files in one commit) and reconnect.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gitzilla_core.api import connect_repo, open_cache, upload_batch  # noqa: E402
+from gitzilla_core.cache import BROWSE_MODE, parse_target  # noqa: E402
+from gitzilla_core.config import DEFAULT_CONFIG  # noqa: E402
+from gitzilla_core.jobs import run_job  # noqa: E402
+from gitzilla_core.tree import TreeCache  # noqa: E402
+from gitzilla_core.upload import collect_upload_items  # noqa: E402
+
+SCALES = {
+    "small": {"files": 200, "folders": 10, "depth": 20, "blob_kb": 4},
+    "medium": {"files": 3000, "folders": 40, "depth": 100, "blob_kb": 16},
+    "large": {"files": 20000, "folders": 150, "depth": 400, "blob_kb": 32},
+}
+MODES = ["full", "blobless", BROWSE_MODE]
+STEPS = ["connect", "list", "upload_one", "upload_batch", "reconnect"]
+BENCH_URL = "git@github.com:bench/"
+
+
+def bench_env(work):
+    """Environment sending BENCH_URL to the fixture directory, with a fixed commit identity."""
+    env = dict(os.environ)
+    count = int(env.get("GIT_CONFIG_COUNT") or 0)
+    env.update({
+        f"GIT_CONFIG_KEY_{count}": f"url.file://{work}/remotes/.insteadOf",
+        f"GIT_CONFIG_VALUE_{count}": BENCH_URL,
+        "GIT_CONFIG_COUNT": str(count + 1),
+        "GIT_AUTHOR_NAME": "Gitzilla Bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+        "GIT_COMMITTER_NAME": "Gitzilla Bench", "GIT_COMMITTER_EMAIL": "bench@example.com",
+    })
+    return env
+
+
+def make_fixture(path, files, folders, depth, blob_kb, seed=1):
+    """Bare repository with files spread over folders/subfolders and depth commits, built with fast-import."""
+    rng = random.Random(seed)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    subprocess.run(["git", "init", "-q", "--bare", "-b", "main", str(tmp)], check=True)
+    paths = [f"dir{n % folders:03d}/sub{n % 7}/file{n:05d}.bin" for n in range(files)]
+    proc = subprocess.Popen(["git", "fast-import", "--quiet"], stdin=subprocess.PIPE, cwd=tmp)
+
+    def blob(size):
+        return rng.randbytes(max(1, int(size * rng.uniform(0.5, 1.5))))
+
+    for c in range(depth):
+        changed = paths if c == 0 else rng.sample(paths, max(1, files // depth))
+        out = [b"commit refs/heads/main\n", b"mark :%d\n" % (c + 1),
+               b"committer Bench <bench@example.com> %d +0000\n" % (1700000000 + c * 60),
+               b"data 10\ncommit %03d\n" % (c % 1000)]
+        if c:
+            out.append(b"from :%d\n" % c)
+        for p in changed:
+            data = blob(blob_kb * 1024)
+            out.append(b"M 100644 inline %s\ndata %d\n" % (p.encode(), len(data)))
+            out.append(data + b"\n")
+        proc.stdin.write(b"".join(out))
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError("git fast-import failed")
+    for name, value in (("uploadpack.allowFilter", "true"), ("uploadpack.allowAnySHA1InWant", "true"),
+                        ("receive.denyCurrentBranch", "ignore")):
+        subprocess.run(["git", "config", name, value], check=True, cwd=tmp)
+    subprocess.run(["git", "gc", "-q"], check=True, cwd=tmp)
+    os.replace(tmp, path)
+
+
+def make_upload_files(folder, count, size, seed):
+    rng = random.Random(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    for n in range(count):
+        (folder / f"upload{n:04d}.bin").write_bytes(rng.randbytes(size))
+    return sorted(folder.iterdir())
+
+
+def list_tree(job, repo_dir, env):
+    """The top-level folders and those of each top-level folder, as the folder browser reads them."""
+    trees = TreeCache()
+    root = trees.root(job, repo_dir, env=env)
+    for _, sha in trees.folders(job, repo_dir, root, env=env):
+        trees.folders(job, repo_dir, sha, env=env)
+
+
+def timed(samples, step, fn):
+    start = time.perf_counter()
+    result = fn()
+    samples.setdefault(step, []).append(time.perf_counter() - start)
+    return result
+
+
+def run_scale(work, scale, modes, repeat, batch, env):
+    params = SCALES[scale]
+    fixture = work / "fixtures" / f"{scale}-{params['files']}-{params['folders']}-{params['depth']}-{params['blob_kb']}.git"
+    if not fixture.exists():
+        print(f"Generating {scale} fixture ({params['files']} files, {params['depth']} commits)...", file=sys.stderr)
+        fixture.parent.mkdir(parents=True, exist_ok=True)
+        make_fixture(fixture, **params)
+    _, key, url = parse_target(f"{BENCH_URL}{scale}.git")
+    results = {}
+    for mode in modes:
+        samples = {}
+        for rep in range(repeat):
+            remote = work / "remotes" / f"{scale}.git"
+            shutil.rmtree(remote.parent, ignore_errors=True)
+            remote.parent.mkdir(parents=True)
+            subprocess.run(["git", "clone", "-q", "--bare", "--local", str(fixture), str(remote)], check=True)
+            subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], check=True, cwd=remote)
+            subprocess.run(["git", "config", "uploadpack.allowAnySHA1InWant", "true"], check=True, cwd=remote)
+            cache_dir = work / "cache"
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            config = dict(DEFAULT_CONFIG, cache_dir=str(cache_dir), clone_mode=mode, dedup=False)
+            cache = open_cache(config)
+            uploads = work / "uploads"
+            shutil.rmtree(uploads, ignore_errors=True)
+            one = make_upload_files(uploads / "one", 1, 64 * 1024, seed=rep)
+            many = make_upload_files(uploads / "batch", batch, 16 * 1024, seed=1000 + rep)
+
+            def job(fn):
+                return run_job(fn, "bench")
+
+            repo_dir, _, _ = timed(samples, "connect", lambda: job(
+                lambda j: connect_repo(j, cache, key, url, config, env=env, trees=TreeCache())))
+
+            timed(samples, "list", lambda: job(lambda j: list_tree(j, repo_dir, env)))
+            timed(samples, "upload_one", lambda: job(lambda j: upload_batch(
+                j, cache, key, url, collect_upload_items(one), f"bench/one-{rep}", config, env=env)))
+            timed(samples, "upload_batch", lambda: job(lambda j: upload_batch(
+                j, cache, key, url, collect_upload_items(many), f"bench/batch-{rep}", config, env=env)))
+            timed(samples, "reconnect", lambda: job(
+                lambda j: connect_repo(j, cache, key, url, config, env=env, trees=TreeCache())))
+        for step in STEPS:
+            values = samples[step]
+            results[f"{scale}/{mode}/{step}"] = {
+                "median": statistics.median(values), "min": min(values), "max": max(values),
+                "samples": [round(v, 6) for v in values],
+            }
+            print(f"{scale:7} {mode:9} {step:13} median {statistics.median(values) * 1000:9.1f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance, floor):
+    """Print current against baseline medians; returns the keys that got slower beyond tolerance."""
+    regressions = []
+    print(f"{'benchmark':40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, result in sorted(results.items()):
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            print(f"{key:40} {'-':>10} {result['median'] * 1000:8.1f}ms {'new':>8}")
+            continue
+        change = result["median"] / old["median"] - 1 if old["median"] else 0.0
+        slower = result["median"] - old["median"] > floor and change > tolerance
+        if slower:
+            regressions.append(key)
+        print(f"{key:40} {old['median'] * 1000:8.1f}ms {result['median'] * 1000:8.1f}ms {change:+7.0%}"
+              + ("  REGRESSION" if slower else ""))
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", action="append", choices=list(SCALES), help="fixture size (repeatable; default small, medium)")
+    parser.add_argument("--mode", action="append", choices=MODES, help="clone mode (repeatable; default all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="repetitions per benchmark (default 3)")
+    parser.add_argument("--batch", type=int, default=50, help="files in the batch upload (default 50)")
+    parser.add_argument("--work", type=Path, help="work directory; fixtures are kept here between runs (default: a temp dir)")
+    parser.add_argument("-o", "--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--baseline", type=Path, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown of a median (default 0.25 = 25%%)")
+    parser.add_argument("--floor", type=float, default=0.02, help="ignore slowdowns below this many seconds (default 0.02)")
+    args = parser.parse_args()
+
+    work = args.work.resolve() if args.work else Path(tempfile.mkdtemp(prefix="gitzilla_bench_"))
+    work.mkdir(parents=True, exist_ok=True)
+    env = bench_env(work)
+    os.environ.update({k: v for k, v in env.items() if k.startswith(("GIT_AUTHOR", "GIT_COMMITTER"))})
+    results = {}
+    try:
+        for scale in args.scale or ["small", "medium"]:
+            results.update(run_scale(work, scale, args.mode or MODES, args.repeat, args.batch, env))
+    finally:
+        if args.work is None:
+            shutil.rmtree(work, ignore_errors=True)
+
+    git_version = subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+    report = {
+        "meta": {"revision": git_revision(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": git_version,
+                 "python": platform.python_version(), "platform": platform.platform(), "repeat": args.repeat,
+                 "batch": args.batch, "scales": {s: SCALES[s] for s in args.scale or ["small", "medium"]}},
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance, args.floor)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: " + ", ".join(regressions),
+                  file=sys.stderr)
+            sys.exit(1)
+    elif not args.output:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Per-operation latency of repeated git operations over SSH, with and without a
+shared ControlMaster connection (gitzilla_core.ssh.SshSession).
+
+    python benchmarks/ssh_multiplex.py git@github.com:owner/repo.git -n 10
+    python benchmarks/ssh_multiplex.py git@github.com:owner/repo.git --push-from ~/.gitzilla/cache/owner/repo
+
+Each run times "git ls-remote", or with --push-from a no-op "git push" from an
+existing clone, which pays the same handshake as a real push.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from gitzilla_core.keys import DEFAULT_KEY_NAME, KeyStore  # noqa: E402
+from gitzilla_core.ssh import SshSession, git_ssh_env  # noqa: E402
+
+
+def time_runs(cmd, env, count, cwd=None):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, cwd=cwd, check=True, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def describe(samples):
+    return f"mean {statistics.mean(samples) * 1000:7.1f} ms  median {statistics.median(samples) * 1000:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", help="SSH URL of a repository the key can access")
+    parser.add_argument("-n", "--count", type=int, default=10, help="operations per variant (default 10)")
+    parser.add_argument("--key", type=Path, help="SSH private key (default: the saved Gitzilla key)")
+    parser.add_argument("--push-from", type=Path, metavar="CLONE", help="time no-op pushes from this clone")
+    args = parser.parse_args()
+    if args.key is None:
+        found = KeyStore().get(DEFAULT_KEY_NAME)
+        if found is None:
+            sys.exit("No saved key: run 'gitzilla keygen' or pass --key.")
+        args.key = found[0]
+
+    if args.push_from:
+        cmd, cwd = ["git", "push", "--quiet", args.url, "HEAD"], args.push_from
+    else:
+        cmd, cwd = ["git", "ls-remote", "--heads", args.url], None
+
+    plain = time_runs(cmd, git_ssh_env(args.key), args.count, cwd)
+    session = SshSession()
+    try:
+        if session.control_dir is None:
+            sys.exit("SSH multiplexing is not available on this platform.")
+        shared = time_runs(cmd, session.env(args.key), args.count + 1, cwd)
+    finally:
+        session.close()
+    first, reused = shared[0], shared[1:]
+
+    print(f"{' '.join(cmd[:2])} x{args.count}")
+    print(f"  separate connections: {describe(plain)}")
+    print(f"  shared connection:    {describe(reused)}  (first, opening the master: {first * 1000:.1f} ms)")
+    saved = statistics.mean(plain) - statistics.mean(reused)
+    print(f"  saved per operation:  {saved * 1000:7.1f} ms ({100 * saved / statistics.mean(plain):.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+GUI-free core of Gitzilla: configuration, jobs, the clone cache and the
+upload pipeline. Gitzilla.py (Tk) and cli.py (command line) are front ends.
+"""
+
+__version__ = "1.0.0"
+
+from .api import connect_repo, open_cache, resume_upload, upload_batch, upload_files, upload_to_repo
+from .cache import BROWSE_MODE, CLONE_MODES, CloneCache, list_folders, parse_target, repo_key, sparse_add
+from .config import DEFAULT_CONFIG, load_config, save_config
+from .dedup import ContentIndex, hash_file
+from .jobs import DirectExecutor, GitzillaError, Job, JobCancelled, JobExecutor, run_job
+from .journal import UploadJournal
+from .keys import KeyStore, key_fingerprint
+from .multi import MultiRepoSync
+from .plumbing import upload_plumbing
+from .progress import format_progress, format_size, parse_git_progress
+from .push import push_with_retry
+from .ssh import SshSession, git_ssh_env
+from .trace import Tracer, command_phase
+from .tree import TreeCache, TreeEntry
+from .upload import UploadItem, collect_upload_items, default_commit_message, parse_dropped_paths, upload_to_clone
+from .watch import FolderSync, open_watcher
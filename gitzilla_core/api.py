@@ -0,0 +1,203 @@
+"""
+High-level operations shared by the Tk front end and the command line. Every
+function takes a Job (see jobs.py) as its first argument; use run_job() to
+call them without a GUI.
+"""
+
+import os
+import subprocess
+import time
+
+from .cache import BROWSE_MODE, CloneCache, list_folders
+from .config import DEFAULT_CONFIG
+from .dedup import ContentIndex
+from .jobs import GitzillaError, JobCancelled
+from .plumbing import replay_commit, upload_plumbing
+from .push import push_with_retry, rebase_clone
+from .tree import replay_changes
+from .upload import UploadItem, collect_upload_items, default_commit_message, upload_to_clone
+
+
+def open_cache(config):
+    """The clone cache described by config."""
+    return CloneCache(config["cache_dir"], int(float(config["cache_max_gb"]) * 1024 ** 3))
+
+
+def upload_to_repo(job, repo_dir, items, target_rel="", config=None, env=None, commit_msg=None, on_state=None,
+                   trees=None, journal=None, target=None, entry_id=None, index=None):
+    """
+    Upload items in one commit and push from repo_dir, which is up to date:
+    through the plumbing engine for a browse-mode bare repository, else
+    through the working clone. With an UploadJournal, the batch for target
+    (key, url) stays recorded until it is pushed, so an interrupted upload can
+    be picked up with resume_upload(). Files the target already has are
+    skipped using the dedup ContentIndex index, opened from its default place
+    if not given; config["dedup"] turns this off. Returns True if pushed.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    commit_msg = commit_msg or default_commit_message(items)
+    if not config["dedup"]:
+        index = None
+    elif index is None:
+        index = ContentIndex()
+    on_commit = None
+    if journal is not None:
+        entry_id = journal.start(target[0], target[1], config["clone_mode"], repo_dir, items, target_rel,
+                                 commit_msg, entry_id)
+        on_commit = lambda commit, branch: journal.committed(entry_id, commit, branch)
+    try:
+        if config["clone_mode"] == BROWSE_MODE:
+            pushed = upload_plumbing(job, repo_dir, items, target_rel, config, env=env, commit_msg=commit_msg,
+                                     on_state=on_state, trees=trees, on_commit=on_commit, index=index)
+        else:
+            pushed = upload_to_clone(job, repo_dir, items, target_rel, config, env=env, commit_msg=commit_msg,
+                                     on_state=on_state, on_commit=on_commit, index=index)
+    except (JobCancelled, KeyboardInterrupt):
+        raise  # interrupted: keep the entry to resume
+    except Exception:
+        if journal is not None and (journal.get(entry_id) or {}).get("state") == "started":
+            journal.finish(entry_id)  # failed before there was anything to push
+        raise
+    finally:
+        if index is not None:
+            index.save()  # digests are worth keeping even if the upload failed
+    if journal is not None:
+        journal.finish(entry_id)
+    if index is not None and target is not None:
+        for item in items:
+            rel = "/".join(part for part in (target_rel, item.dest) if part)
+            index.record(target[0], rel, *index.hashes(item.source))
+        index.save()
+    return pushed
+
+
+def upload_batch(job, cache, key, url, items, target_rel="", config=None, env=None, commit_msg=None,
+                 on_state=None, trees=None, journal=None, entry_id=None, index=None):
+    """
+    Bring the cached repository up to date and upload items in one commit and
+    push (see upload_to_repo). In browse mode this goes through the plumbing
+    engine on the bare repository, with no working tree at all. Returns
+    (repo_dir, pushed).
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    try:
+        if config["clone_mode"] == BROWSE_MODE:
+            repo_dir, _ = cache.browse(job, key, url, env=env)
+        else:
+            repo_dir, _ = cache.checkout(job, key, url, env=env, mode=config["clone_mode"],
+                                         sparse=config["sparse_checkout"], sparse_paths=[target_rel])
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Clone Error", f"Error cloning repository:\n{error_output}")
+    pushed = upload_to_repo(job, repo_dir, items, target_rel, config, env=env, commit_msg=commit_msg,
+                            on_state=on_state, trees=trees, journal=journal, target=(key, url), entry_id=entry_id,
+                            index=index)
+    return repo_dir, pushed
+
+
+def resume_upload(job, cache, journal, entry_id, config=None, env=None, on_state=None, trees=None):
+    """
+    Finish an upload left in the journal. If its commit is still in the
+    repository, only the push is redone (after replaying the commit onto a
+    clone's current HEAD), with the usual rebase and retries; otherwise the
+    files are uploaded again from their sources. Returns {"repo", "status", "files", "commit"}.
+    """
+    entry = journal.get(entry_id)
+    if entry is None:
+        raise GitzillaError("Resume Error", f"No interrupted upload {entry_id!r}.")
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    config["clone_mode"] = entry["mode"]
+    key, url, repo_dir = entry["repo"], entry["url"], entry["repo_dir"]
+    commit, branch = entry.get("commit"), entry.get("branch")
+    result = {"repo": key, "status": "pushed", "files": len(entry["items"]), "commit": commit}
+
+    if commit and os.path.isdir(repo_dir):
+        browse = entry["mode"] == BROWSE_MODE
+        try:
+            job.run(["git", "cat-file", "-e", f"{commit}^{{commit}}"], env=env, cwd=repo_dir)
+            head = None if browse else job.run(["git", "rev-parse", "HEAD"], env=env, cwd=repo_dir).stdout.strip()
+            if head is not None and head != commit:
+                # The clone was reset to the remote since (CloneCache._fast_forward), but the
+                # commit is still in its object store: replay it onto the clone's HEAD
+                commit = replay_changes(job, repo_dir, commit, head, env=env, trees=trees)
+                job.run(["git", "reset", "-q", "--keep", commit], env=env, cwd=repo_dir)
+        except subprocess.CalledProcessError:
+            commit = None
+        if commit:
+            job.status(f"Resuming push to {key}...")
+            if browse:
+                rebase = lambda: replay_commit(job, repo_dir, commit, branch, env=env, trees=trees)
+            else:
+                rebase = lambda: rebase_clone(job, repo_dir, branch, env=env)
+            try:
+                result["commit"] = push_with_retry(job, repo_dir, commit, branch, rebase, config, env=env)
+                if browse:
+                    job.run(["git", "update-ref", branch, result["commit"]], env=env, cwd=repo_dir)
+            except subprocess.CalledProcessError as e:
+                error_output = e.stderr.strip() if e.stderr else "No error output."
+                raise GitzillaError("Git Error", f"Error during Git operations:\n{error_output}")
+            journal.finish(entry_id)
+            for n in range(len(entry["items"])):
+                if on_state:
+                    on_state(n, "pushed")
+            return result
+
+    # Nothing usable was committed: upload the files again from their sources
+    missing = [source for source, _ in entry["items"] if not os.path.isfile(source)]
+    if missing:
+        raise GitzillaError("Resume Error", "Source file(s) no longer exist:\n" + "\n".join(missing[:10]))
+    items = [UploadItem(source, dest) for source, dest in entry["items"]]
+    repo_dir, pushed = upload_batch(job, cache, key, url, items, entry["target"], config, env=env,
+                                    commit_msg=entry["message"], on_state=on_state, trees=trees,
+                                    journal=journal, entry_id=entry_id)
+    result["status"] = "pushed" if pushed else "unchanged"
+    result["commit"] = job.run(["git", "rev-parse", "HEAD"], env=env, cwd=repo_dir).stdout.strip()
+    return result
+
+
+def connect_repo(job, cache, key, url, config=None, env=None, trees=None):
+    """
+    Clone url into the cache (or fetch into the existing clone) and read its
+    top-level folders, through the TreeCache trees if given. In browse mode
+    only the commit and trees are fetched, into a bare repository. Returns
+    (repo_dir, reused, folders); repo_dir is a working clone unless browsing.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    try:
+        if config["clone_mode"] == BROWSE_MODE:
+            repo_dir, reused = cache.browse(job, key, url, env=env)
+        else:
+            repo_dir, reused = cache.checkout(job, key, url, env=env, mode=config["clone_mode"],
+                                              sparse=config["sparse_checkout"])
+    except subprocess.CalledProcessError as e:
+        # Capture and display stderr
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Clone Error", f"Error cloning repository:\n{error_output}")
+    try:
+        folders = list_folders(job, repo_dir, env=env, trees=trees)
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Folder Read Error", f"Error reading repository folders:\n{error_output}")
+    return repo_dir, reused, folders
+
+
+def upload_files(job, cache, key, url, paths, target_rel="", config=None, env=None, commit_msg=None, journal=None):
+    """
+    Connect to a repository and upload files/directories in one commit and push.
+    Returns {"repo", "status" ("pushed"/"unchanged"), "files", "seconds", "bytes", "commit"}.
+    """
+    start = time.monotonic()
+    items = collect_upload_items(paths)
+    if not items:
+        raise GitzillaError("No File Selected", "No valid file selected for upload.")
+    repo_dir, pushed = upload_batch(job, cache, key, url, items, target_rel.strip("/"), config, env=env,
+                                    commit_msg=commit_msg, journal=journal)
+    commit = job.run(["git", "rev-parse", "HEAD"], env=env, cwd=repo_dir).stdout.strip()
+    return {
+        "repo": key,
+        "status": "pushed" if pushed else "unchanged",
+        "files": len(items),
+        "seconds": round(time.monotonic() - start, 3),
+        "bytes": job.bytes_transferred,
+        "commit": commit,
+    }
@@ -0,0 +1,352 @@
+"""
+Persistent clone cache and clone strategies. Clones persist under
+cache_dir/<owner>/<repo> between sessions. Reconnecting fetches and
+fast-forwards instead of cloning again; total size is capped and the least
+recently used clones are evicted first.
+"""
+
+import os
+import re
+import json
+import threading
+import time
+import subprocess
+from pathlib import Path
+
+from .config import write_json_atomic
+from .jobs import GitzillaError
+from .reaper import Reaper
+from .tree import TreeCache
+
+
+REPO_PART_RE = re.compile(r"[A-Za-z0-9_.-]+")
+DEFAULT_HOST = "github.com"
+
+
+def repo_key(owner, repo, host=DEFAULT_HOST):
+    """
+    Validate owner and repo names and return the cache key: "owner/repo" for
+    GitHub, "host/owner/repo" for any other host.
+    """
+    for part in (owner, repo, host):
+        if not REPO_PART_RE.fullmatch(part) or part in (".", ".."):
+            raise GitzillaError("Invalid Name", f"Invalid GitHub owner or repository name: {part!r}")
+    if host == DEFAULT_HOST:
+        return f"{owner}/{repo}"
+    return f"{host}/{owner}/{repo}"
+
+
+def parse_target(text):
+    """
+    Parse "owner/repo" (GitHub) or an SSH URL ("git@host:owner/repo.git",
+    "ssh://git@host[:port]/owner/repo.git") into (host, cache key, clone URL).
+    """
+    text = text.strip()
+    m = re.fullmatch(r"([^/\s:@]+)/([^/\s:@]+?)(?:\.git)?", text)
+    if m:
+        owner, repo = m.groups()
+        return DEFAULT_HOST, repo_key(owner, repo), f"git@{DEFAULT_HOST}:{owner}/{repo}.git"
+    m = re.fullmatch(r"(?:ssh://)?[^@/\s]+@([^:/\s]+)(?::\d+/|[:/])([^/\s]+)/([^/\s]+?)(?:\.git)?/?", text)
+    if m:
+        host, owner, repo = m.groups()
+        return host, repo_key(owner, repo, host), text
+    raise GitzillaError("Invalid Target", f"Not an owner/repo name or SSH URL: {text!r}")
+
+
+def dir_size(path):
+    """Total size in bytes of the files under path (symlinks are not followed)."""
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
+def object_store_size(job, repo_dir, env=None):
+    """
+    Bytes in repo_dir's object store (packs, loose objects and garbage), from
+    "git count-objects -v": a few stat calls rather than a walk of the clone.
+    """
+    proc = job.run(["git", "count-objects", "-v"], env=env, cwd=repo_dir)
+    fields = dict(line.split(": ", 1) for line in proc.stdout.splitlines() if ": " in line)
+    return 1024 * sum(int(fields.get(name, 0)) for name in ("size", "size-pack", "size-garbage"))
+
+
+# Connect mode that only fetches commits and trees into a bare repository, to
+# browse folders; a working clone is made only when an upload needs one.
+BROWSE_MODE = "browse"
+
+# Extra "git clone" arguments per clone mode. Gitzilla only needs the folder list
+# and one target path, so the reduced modes trade history/blobs for speed.
+CLONE_MODES = {
+    "full": [],
+    "shallow": ["--depth", "1"],
+    "blobless": ["--filter=blob:none"],
+    "treeless": ["--filter=tree:0"],
+}
+
+
+def sparse_add(job, clone_dir, paths, env=None):
+    """Widen the sparse checkout of clone_dir to include paths (no-op for non-sparse clones)."""
+    paths = [p.strip("/") for p in paths if p and p.strip("/")]
+    if not paths:
+        return
+    try:
+        proc = job.run(["git", "config", "--bool", "core.sparseCheckout"], env=env, cwd=clone_dir)
+    except subprocess.CalledProcessError:
+        return  # not set: full checkout
+    if proc.stdout.strip() == "true":
+        job.run(["git", "sparse-checkout", "add", "--"] + paths, env=env, cwd=clone_dir)
+
+
+def list_folders(job, clone_dir, env=None, trees=None):
+    """
+    Top-level folders at HEAD, read from git rather than the working tree so
+    sparse and partial clones list everything. Empty repositories give [].
+    trees is a TreeCache to read through.
+    """
+    trees = trees or TreeCache()
+    root = trees.root(job, clone_dir, env=env)
+    if root is None:
+        return []
+    return [name for name, _ in trees.folders(job, clone_dir, root, env=env)]
+
+
+class CloneCache:
+    """Persistent clones keyed by owner/repo with LRU eviction by total size."""
+
+    INDEX_FILE = "index.json"
+    TRASH_DIR = ".trash"  # removed clones wait here for the reaper; no GitHub owner starts with "."
+    VERIFY_INTERVAL = 7 * 24 * 3600  # seconds between automatic integrity checks
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root).expanduser()
+        self.max_bytes = max_bytes
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.reaper = Reaper(self.root / self.TRASH_DIR)
+
+    def _load(self):
+        try:
+            with open(self.root / self.INDEX_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, key, **fields):
+        with self._lock:
+            entries = self._load()
+            if fields.pop("remove", False):
+                entries.pop(key, None)
+            else:
+                entries.setdefault(key, {}).update(fields)
+            write_json_atomic(self.root / self.INDEX_FILE, entries)
+
+    def entries(self):
+        """
+        Return {key: {"url", "mode", "sparse", "size", "worktree_size", "last_used",
+        "verified"}} for every cached clone.
+        """
+        with self._lock:
+            return self._load()
+
+    def path_for(self, key):
+        parts = key.split("/")
+        if len(parts) == 3:
+            # Other hosts live under "@host", which can't clash with a GitHub owner name
+            return self.root / ("@" + parts[0]) / parts[1] / parts[2]
+        return self.root / parts[0] / parts[1]
+
+    def pin(self, key):
+        """Protect key from eviction while it is in use (e.g. by a parallel sync)."""
+        with self._lock:
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned[key] -= 1
+            if not self._pinned[key]:
+                del self._pinned[key]
+
+    def _is_clone_of(self, job, path, url, env):
+        if not (path / ".git").is_dir():
+            return False
+        try:
+            proc = job.run(["git", "config", "--get", "remote.origin.url"], env=env, cwd=path)
+        except subprocess.CalledProcessError:
+            return False
+        return proc.stdout.strip() == url
+
+    def verify(self, job, key, env=None):
+        """Check the object graph of a cached clone. Returns True if it is intact."""
+        path = self.path_for(key)
+        try:
+            job.run(["git", "fsck", "--connectivity-only", "--no-progress"], env=env, cwd=path)
+        except subprocess.CalledProcessError:
+            return False
+        self._update(key, verified=time.time())
+        return True
+
+    def remove(self, key):
+        """Forget a cached clone; its files are deleted in the background."""
+        self.reaper.discard(self.path_for(key))
+        self._update(key, remove=True)
+
+    def checkout(self, job, key, url, env=None, mode="full", sparse=False, sparse_paths=()):
+        """
+        Return (path, reused): an up-to-date working clone of url, fetched into the
+        existing cache entry when there is a healthy one, otherwise cloned fresh.
+        mode is a CLONE_MODES key; a cached clone made with another mode is
+        re-cloned. sparse limits the checkout to top-level files plus sparse_paths.
+        """
+        if mode not in CLONE_MODES:
+            raise GitzillaError("Invalid Clone Mode", f"Unknown clone mode: {mode!r}")
+        path = self.path_for(key)
+        entry = self.entries().get(key, {})
+
+        reused = self._is_clone_of(job, path, url, env) and entry.get("mode", "full") == mode
+        if reused and time.time() - entry.get("verified", 0) > self.VERIFY_INTERVAL:
+            job.status(f"Checking cached clone of {key}...")
+            reused = self.verify(job, key, env)
+
+        worktree_size = entry.get("worktree_size") if reused else None
+        if reused:
+            job.status(f"Fetching updates for {key}...")
+            fetch_cmd = ["git", "fetch", "--progress", "--prune"]
+            if mode == "shallow":
+                fetch_cmd += ["--depth", "1"]
+            job.stream(fetch_cmd + ["origin"], "fetch", env=env, cwd=path)
+            self._fast_forward(job, path, env, shallow=(mode == "shallow"))
+            if sparse != entry.get("sparse", False):
+                if sparse:
+                    job.run(["git", "sparse-checkout", "set", "--cone"], env=env, cwd=path)
+                else:
+                    job.run(["git", "sparse-checkout", "disable"], env=env, cwd=path)
+                worktree_size = None
+        else:
+            self.reaper.discard(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            clone_cmd = ["git", "clone", "--progress"] + CLONE_MODES[mode]
+            if sparse:
+                clone_cmd.append("--sparse")
+            try:
+                job.stream(clone_cmd + [url, str(path)], "clone", env=env)
+            except BaseException:
+                self.reaper.discard(path)
+                raise
+            entry["verified"] = time.time()
+
+        if sparse:
+            sparse_add(job, path, sparse_paths, env)
+
+        # The object store is re-measured each time (it grows with every fetch);
+        # the working tree is walked only after a clone or a sparse change, and
+        # its size is then carried over between reconnects
+        objects = object_store_size(job, path, env)
+        if worktree_size is None:
+            worktree_size = max(0, dir_size(path) - objects)
+        self._update(key, url=url, mode=mode, sparse=bool(sparse), last_used=time.time(),
+                     size=objects + worktree_size, worktree_size=worktree_size,
+                     verified=entry.get("verified", time.time()))
+        self.evict(keep=key)
+        return path, reused
+
+    def browse(self, job, key, url, env=None):
+        """
+        Return (path, reused): a bare repository under key + ".git" whose HEAD is
+        the remote's default branch, holding its tip commit and trees but no
+        file contents. reused is True when that commit was already there.
+        """
+        bare_key = key + ".git"
+        path = self.path_for(bare_key)
+        job.status(f"Looking up the default branch of {key}...")
+        proc = job.run(["git", "ls-remote", "--symref", url, "HEAD"], env=env)
+        branch = head = None
+        for line in proc.stdout.splitlines():
+            if line.startswith("ref: ") and line.endswith("\tHEAD"):
+                branch = line[len("ref: "):-len("\tHEAD")]
+            elif line.endswith("\tHEAD"):
+                head = line.split("\t", 1)[0]
+
+        if not (path / "HEAD").is_file():
+            path.mkdir(parents=True, exist_ok=True)
+            job.run(["git", "init", "--bare", "-q", str(path)], env=env)
+            for name, value in (("remote.origin.url", url),
+                                ("remote.origin.promisor", "true"),
+                                ("remote.origin.partialclonefilter", "blob:none")):
+                job.run(["git", "config", name, value], env=env, cwd=path)
+        elif job.run(["git", "config", "--get", "remote.origin.url"], env=env, cwd=path).stdout.strip() != url:
+            job.run(["git", "config", "remote.origin.url", url], env=env, cwd=path)
+
+        reused = True
+        if head is not None and branch is not None:
+            job.run(["git", "symbolic-ref", "HEAD", branch], env=env, cwd=path)
+            # Compare refs rather than probing for the commit: a lookup of a
+            # missing object would itself fetch it from the promisor remote
+            try:
+                local = job.run(["git", "rev-parse", "--verify", "-q", branch], env=env, cwd=path).stdout.strip()
+            except subprocess.CalledProcessError:
+                local = None
+            if local != head:
+                reused = False
+                job.status(f"Fetching folders of {key}...")
+                # Tip commit and all its trees, no blobs and no history
+                job.stream(["git", "fetch", "--progress", "--filter=blob:none", "--depth", "1", "origin",
+                            f"+{branch}:{branch}"], "fetch", env=env, cwd=path)
+
+        self._update(bare_key, url=url, mode=BROWSE_MODE, sparse=False, last_used=time.time(),
+                     size=object_store_size(job, path, env), verified=time.time())
+        self.evict(keep=bare_key)
+        return path, reused
+
+    def _fast_forward(self, job, path, env, shallow=False):
+        if shallow:
+            # A depth-1 fetch cuts the new tip off from the old history, so it can
+            # never fast-forward; just move to it.
+            try:
+                job.run(["git", "rev-parse", "--verify", "-q", "@{u}"], env=env, cwd=path)
+            except subprocess.CalledProcessError:
+                return
+            job.run(["git", "reset", "--hard", "@{u}"], env=env, cwd=path)
+            return
+        try:
+            job.run(["git", "merge", "--ff-only", "@{u}"], env=env, cwd=path)
+            ahead = job.run(["git", "rev-list", "--count", "@{u}..HEAD"], env=env, cwd=path).stdout.strip()
+            if ahead != "0":
+                # A commit whose push failed: drop it, or its files would look uploaded already.
+                # It stays in the object store, where resume_upload finds a journaled one.
+                job.status("Cached clone has commits the remote doesn't; resetting it.")
+                job.run(["git", "reset", "--hard", "@{u}"], env=env, cwd=path)
+        except subprocess.CalledProcessError:
+            # Leftovers from an interrupted upload; the remote is authoritative.
+            try:
+                job.run(["git", "rev-parse", "--verify", "-q", "@{u}"], env=env, cwd=path)
+            except subprocess.CalledProcessError:
+                return  # empty remote, nothing to fast-forward to
+            job.status("Cached clone diverged from the remote; resetting it.")
+            job.run(["git", "reset", "--hard", "@{u}"], env=env, cwd=path)
+
+    def evict(self, keep=None):
+        """Remove least recently used clones until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(e.get("size", 0) for e in entries.values())
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            with self._lock:
+                pinned = key in self._pinned
+            if key == keep or pinned:
+                continue
+            self.remove(key)
+            total -= entry.get("size", 0)
@@ -0,0 +1,354 @@
+"""
+Command-line front end: "python -m gitzilla_core" or the gitzilla script.
+
+    gitzilla keygen [--key-name NAME] [--type ed25519|rsa] [--force]
+    gitzilla keys
+    gitzilla connect owner/repo [--path dir]
+    gitzilla upload owner/repo FILE... [--to path/in/repo] [-m message]
+    gitzilla multi FILE... --repo owner/a --repo git@host:owner/b.git
+    gitzilla cache list | verify [REPO...] | remove REPO...
+    gitzilla resume [ID...] [--list | --discard]
+    gitzilla watch owner/repo FOLDER [--to path/in/repo]
+
+Exit status is 0 on success, 1 if anything failed and 130 when interrupted.
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+from pathlib import Path
+
+from . import __version__
+from .api import connect_repo, open_cache, resume_upload, upload_files
+from .cache import BROWSE_MODE, CLONE_MODES, parse_target
+from .config import load_config
+from .jobs import GitzillaError, JobCancelled, run_job
+from .journal import UploadJournal
+from .keys import DEFAULT_KEY_NAME, KEY_TYPES, KeyStore
+from .multi import MultiRepoSync
+from .progress import format_size
+from .ssh import SshSession
+from .trace import Tracer
+from .tree import TreeCache
+from .upload import collect_upload_items
+from .watch import FolderSync
+
+
+class Reporter:
+    """
+    Status messages go to stderr: redrawn on one line on a terminal, one per line
+    with --verbose otherwise. Results go to stdout, as text or JSON.
+    """
+
+    def __init__(self, args):
+        self.as_json = args.json
+        self.tty = sys.stderr.isatty()
+        self.show_status = not args.quiet and (args.verbose or self.tty)
+        self._last = ""
+
+    def status(self, msg):
+        if not self.show_status or msg == self._last:
+            return
+        self._last = msg
+        if self.tty:
+            print("\r" + msg.splitlines()[-1][:self._width()] + "\033[K", end="", file=sys.stderr, flush=True)
+        else:
+            print(msg, file=sys.stderr, flush=True)
+
+    def _width(self):
+        return shutil.get_terminal_size().columns - 1
+
+    def clear(self):
+        """Erase the status line before printing something else."""
+        if self.tty and self._last:
+            print("\r\033[K", end="", file=sys.stderr, flush=True)
+            self._last = ""
+
+    def result(self, data, text):
+        self.clear()
+        if self.as_json:
+            print(json.dumps(data, indent=2, sort_keys=True))
+        elif text:
+            print(text)
+
+
+def _config(args):
+    config = load_config()
+    for name in ("clone_mode", "ingest_mode"):
+        if getattr(args, name, None):
+            config[name] = getattr(args, name)
+    if getattr(args, "sparse", False):
+        config["sparse_checkout"] = True
+    return config
+
+
+def _key_env(args):
+    key = args.key
+    if key is None:
+        found = KeyStore().get(args.key_name)
+        if found is None:
+            raise GitzillaError("No SSH Key", f"No SSH key named {args.key_name!r}. Run 'gitzilla keygen' first or pass --key.")
+        key = found[0]
+    elif not key.exists():
+        raise GitzillaError("No SSH Key", f"No SSH key at {key}.")
+    return args.ssh.env(key)
+
+
+def cmd_keygen(args, out):
+    keys = KeyStore()
+    key_type = args.type or load_config()["ssh_key_type"]
+    if args.force:
+        priv_key, pub_key = run_job(lambda job: keys.generate(job, args.key_name, key_type), "keygen",
+                                    on_status=out.status, tracer=args.tracer)
+        created = True
+    else:
+        priv_key, pub_key, created = run_job(lambda job: keys.ensure(job, args.key_name, key_type), "keygen",
+                                             on_status=out.status, tracer=args.tracer)
+    out.result({"name": args.key_name, "private_key": str(priv_key), "public_key": pub_key, "created": created}, pub_key)
+    return 0
+
+
+def cmd_keys(args, out):
+    entries = KeyStore().entries()
+    out.result(entries, "\n".join(f"{name}\t{entry['type']}\t{entry['fingerprint']}"
+                                   for name, entry in sorted(entries.items())))
+    return 0
+
+
+def cmd_connect(args, out):
+    config = _config(args)
+    _, key, url = parse_target(args.repo)
+    env = _key_env(args)
+    trees = TreeCache()
+
+    def work(job):
+        clone_dir, reused, folders = connect_repo(job, open_cache(config), key, url, config, env=env, trees=trees)
+        if args.path.strip("/"):
+            root = trees.root(job, clone_dir, env=env)
+            tree_sha = root and trees.lookup(job, clone_dir, root, args.path, env=env)
+            if not tree_sha:
+                raise GitzillaError("Folder Read Error", f"No folder {args.path!r} in {key}.")
+            folders = [name for name, _ in trees.folders(job, clone_dir, tree_sha, env=env)]
+        return clone_dir, reused, folders
+
+    clone_dir, reused, folders = run_job(work, "clone", on_status=out.status, tracer=args.tracer)
+    out.result(
+        {"repo": key, "clone_dir": str(clone_dir), "reused": reused, "folders": folders},
+        "\n".join(folders)
+    )
+    return 0
+
+
+def cmd_upload(args, out):
+    config = _config(args)
+    _, key, url = parse_target(args.repo)
+    result = run_job(
+        lambda job: upload_files(job, open_cache(config), key, url, args.paths, args.to, config,
+                                 env=_key_env(args), commit_msg=args.message, journal=UploadJournal()),
+        "upload", on_status=out.status, tracer=args.tracer
+    )
+    out.result(result, f"{key}: {result['status']} ({result['files']} files, {result['seconds']:.1f}s)")
+    return 0
+
+
+def cmd_multi(args, out):
+    config = _config(args)
+    targets, seen = [], set()
+    for text in args.repos:
+        target = parse_target(text)
+        if target[1] not in seen:
+            seen.add(target[1])
+            targets.append(target)
+    items = collect_upload_items(args.paths)
+    if not items:
+        raise GitzillaError("No File Selected", "No valid file selected for upload.")
+    sync = MultiRepoSync(open_cache(config), config, env=_key_env(args), journal=UploadJournal())
+
+    def on_result(result):
+        if not out.as_json:
+            out.clear()
+            detail = result["error"].splitlines()[-1] if result["error"] else format_size(result["bytes"])
+            print(f"{result['repo']}: {result['status']} ({result['seconds']:.1f}s, {detail})", flush=True)
+
+    results = run_job(
+        lambda job: sync.run(job, targets, items, args.to.strip("/"), commit_msg=args.message,
+                             on_status=lambda key, msg: out.status(f"{key}: {msg}"), on_result=on_result),
+        "multi", tracer=args.tracer
+    )
+    out.result(results, None)
+    return 0 if all(r["status"] in ("pushed", "unchanged") for r in results) else 1
+
+
+def cmd_cache(args, out):
+    cache = open_cache(_config(args))
+    entries = cache.entries()
+    if args.action == "list":
+        lines = [f"{key}\t{entry.get('mode', 'full')}\t{format_size(entry.get('size', 0))}"
+                 for key, entry in sorted(entries.items())]
+        out.result(entries, "\n".join(lines))
+        return 0
+    keys = [text if text in entries else parse_target(text)[1] for text in args.repos]
+    if args.action == "remove":
+        if not keys:
+            raise GitzillaError("No Targets", "Name the cached repositories to remove.")
+        for key in keys:
+            cache.remove(key)
+        cache.reaper.sweep()  # also whatever GUI sessions left in the trash
+        cache.reaper.wait()
+        out.result({"removed": keys}, "\n".join(keys))
+        return 0
+    keys = keys or sorted(entries)
+    results = run_job(lambda job: {key: cache.verify(job, key) for key in keys}, "verify", on_status=out.status,
+                      tracer=args.tracer)
+    out.result(results, "\n".join(f"{key}\t{'ok' if ok else 'damaged'}" for key, ok in results.items()))
+    return 0 if all(results.values()) else 1
+
+
+def cmd_resume(args, out):
+    journal = UploadJournal()
+    entries = journal.pending()
+    if args.ids:
+        unknown = set(args.ids) - {entry["id"] for entry in entries}
+        if unknown:
+            raise GitzillaError("Resume Error", f"No interrupted upload {sorted(unknown)[0]!r}.")
+        entries = [entry for entry in entries if entry["id"] in args.ids]
+    if args.list or not entries:
+        out.result(entries, "\n".join(f"{e['id']}\t{e['repo']}\t{e['state']}\t{len(e['items'])} files"
+                                       for e in entries))
+        return 0
+    if args.discard:
+        for entry in entries:
+            journal.finish(entry["id"])
+        out.result({"discarded": [e["id"] for e in entries]}, "\n".join(e["id"] for e in entries))
+        return 0
+    config = _config(args)
+    env = _key_env(args)
+    cache = open_cache(config)
+    results, failed = [], False
+    for entry in entries:
+        try:
+            result = run_job(lambda job: resume_upload(job, cache, journal, entry["id"], config, env=env),
+                             "resume", on_status=lambda msg: out.status(f"{entry['repo']}: {msg}"),
+                             tracer=args.tracer)
+        except GitzillaError as e:
+            result = {"repo": entry["repo"], "status": "failed", "files": len(entry["items"]), "error": e.message}
+            failed = True
+        result["id"] = entry["id"]
+        results.append(result)
+        if not out.as_json:
+            out.clear()
+            detail = result["error"].splitlines()[-1] if "error" in result else f"{result['files']} files"
+            print(f"{entry['id']} {result['repo']}: {result['status']} ({detail})", flush=True)
+    out.result(results, None)
+    return 1 if failed else 0
+
+
+def cmd_watch(args, out):
+    config = _config(args)
+    _, key, url = parse_target(args.repo)
+    sync = FolderSync(open_cache(config), key, url, args.folder, args.to, config, env=_key_env(args),
+                      journal=UploadJournal(), trees=TreeCache())
+
+    def on_batch(result):
+        out.clear()
+        if out.as_json:
+            print(json.dumps(result, sort_keys=True), flush=True)
+            return
+        detail = result["error"].splitlines()[-1] if result["error"] else f"{result['seconds']:.1f}s"
+        print(f"{time.strftime('%H:%M:%S')} {key}: {result['status']} {result['files']} files "
+              f"({detail}, {result['pending']} waiting)", flush=True)
+
+    run_job(lambda job: sync.run(job, commit_msg=args.message, on_batch=on_batch), "watch",
+            on_status=out.status, tracer=args.tracer)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gitzilla", description="Upload files to GitHub repositories over SSH.")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", help="print results as JSON")
+    common.add_argument("-q", "--quiet", action="store_true", help="no status messages")
+    common.add_argument("-v", "--verbose", action="store_true", help="status messages even when stderr is not a terminal")
+    common.add_argument("--key-name", default=DEFAULT_KEY_NAME, metavar="NAME",
+                        help=f"saved SSH key to use (default: {DEFAULT_KEY_NAME})")
+    common.add_argument("--key", type=lambda p: Path(p).expanduser(), metavar="PATH",
+                        help="use this SSH private key file instead of a saved key")
+    common.add_argument("--trace", action="store_true",
+                        help="write timing spans to a JSON-lines log and a Chrome trace file (see trace_dir)")
+    repo_opts = argparse.ArgumentParser(add_help=False)
+    repo_opts.add_argument("--mode", dest="clone_mode", choices=list(CLONE_MODES) + [BROWSE_MODE],
+                           help="clone mode (default: from config)")
+    repo_opts.add_argument("--sparse", action="store_true", help="sparse checkout")
+    upload_opts = argparse.ArgumentParser(add_help=False)
+    upload_opts.add_argument("--to", default="", metavar="DIR", help="target folder in the repository")
+    upload_opts.add_argument("-m", "--message", help="commit message")
+    upload_opts.add_argument("--in-place", dest="ingest_mode", action="store_const", const="in_place",
+                             help="hash files from where they are instead of copying them")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("keygen", parents=[common], help="print the saved SSH key's public key, generating it if needed")
+    p.add_argument("--type", choices=list(KEY_TYPES), help="type of a new key (default: from config)")
+    p.add_argument("--force", action="store_true", help="replace the key with a new one")
+    p.set_defaults(func=cmd_keygen)
+    p = sub.add_parser("keys", parents=[common], help="list saved SSH keys and their fingerprints")
+    p.set_defaults(func=cmd_keys)
+    p = sub.add_parser("connect", parents=[common, repo_opts], help="clone or update a repository and list its folders")
+    p.add_argument("repo", help="owner/repo or SSH URL")
+    p.add_argument("--path", default="", metavar="DIR", help="list the folders inside DIR instead of the top level")
+    p.set_defaults(func=cmd_connect)
+    p = sub.add_parser("upload", parents=[common, repo_opts, upload_opts], help="upload files in one commit and push")
+    p.add_argument("repo", help="owner/repo or SSH URL")
+    p.add_argument("paths", nargs="+", metavar="PATH", help="files or folders to upload")
+    p.set_defaults(func=cmd_upload)
+    p = sub.add_parser("multi", parents=[common, repo_opts, upload_opts], help="upload files into many repositories")
+    p.add_argument("paths", nargs="+", metavar="PATH", help="files or folders to upload")
+    p.add_argument("--repo", dest="repos", action="append", required=True, help="target repository (repeatable)")
+    p.set_defaults(func=cmd_multi)
+    p = sub.add_parser("cache", parents=[common], help="inspect or prune the clone cache")
+    p.add_argument("action", choices=["list", "verify", "remove"])
+    p.add_argument("repos", nargs="*", metavar="REPO")
+    p.set_defaults(func=cmd_cache)
+    p = sub.add_parser("resume", parents=[common], help="finish uploads that were interrupted or failed to push")
+    p.add_argument("ids", nargs="*", metavar="ID", help="journal entries to resume (default: all)")
+    action = p.add_mutually_exclusive_group()
+    action.add_argument("--list", action="store_true", help="only list interrupted uploads")
+    action.add_argument("--discard", action="store_true", help="forget interrupted uploads instead of resuming them")
+    p.set_defaults(func=cmd_resume)
+    p = sub.add_parser("watch", parents=[common, repo_opts, upload_opts],
+                       help="keep uploading files written to a folder, until interrupted")
+    p.add_argument("repo", help="owner/repo or SSH URL")
+    p.add_argument("folder", metavar="FOLDER", help="local folder to watch")
+    p.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    out = Reporter(args)
+    config = load_config()
+    args.ssh = SshSession(config["ssh_multiplex"], config["ssh_control_persist"])
+    args.tracer = Tracer.from_config(dict(config, trace=True)) if args.trace or config["trace"] else None
+    try:
+        return args.func(args, out)
+    except KeyboardInterrupt:
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    except JobCancelled:
+        print("Cancelled.", file=sys.stderr)
+        return 130
+    except GitzillaError as e:
+        print(f"{e.title}: {e.message}", file=sys.stderr)
+        return 1
+    except subprocess.CalledProcessError as e:
+        print((e.stderr or "").strip() or str(e), file=sys.stderr)
+        return 1
+    finally:
+        args.ssh.close()
+        if args.tracer is not None:
+            args.tracer.close()
+            if not args.quiet:
+                print(f"Trace written to {args.tracer.chrome_path} and {args.tracer.log_path.name}", file=sys.stderr)
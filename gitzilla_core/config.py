@@ -0,0 +1,72 @@
+"""
+Gitzilla settings. They live in ~/.gitzilla/config.json (or
+$GITZILLA_HOME/config.json); keys missing from the file fall back to
+DEFAULT_CONFIG.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+
+
+GITZILLA_HOME = Path(os.environ.get("GITZILLA_HOME") or Path.home() / ".gitzilla")
+CONFIG_FILE = GITZILLA_HOME / "config.json"
+DEFAULT_CONFIG = {
+    "cache_dir": str(GITZILLA_HOME / "cache"),
+    "cache_max_gb": 20,
+    "clone_mode": "full",
+    "sparse_checkout": False,
+    "ingest_mode": "copy",
+    "lfs_threshold_mb": 50,    # files at least this big go to LFS (0 disables the size rule)
+    "lfs_extensions": [],      # e.g. [".pt", ".onnx"]: always LFS
+    "lfs_endpoint": "",        # override: LFS server URL or a local object directory
+    "lfs_concurrency": 4,
+    "multi_workers": 8,        # repositories processed at once in multi-repo mode
+    "multi_per_host": 4,       # ... of which at most this many against the same host
+    "multi_targets": [],
+    "ssh_key_type": "ed25519",  # for new keys: "ed25519" or "rsa"
+    "ssh_multiplex": True,     # share one SSH connection per host between git commands
+    "ssh_control_persist": 600,  # seconds an idle shared connection stays open
+    "push_retries": 5,         # retries of a push that was rejected or dropped
+    "push_backoff_s": 1.0,     # first retry delay; doubles on each retry, with jitter
+    "push_backoff_max_s": 30,
+    "dedup": True,             # skip files the target already has, using cached file hashes
+    "trace": False,            # write timing spans of every operation to trace_dir
+    "trace_dir": str(GITZILLA_HOME / "traces"),
+    "watch_debounce_s": 1.0,   # watch mode: quiet time after the last write before a file is looked at
+    "watch_stable_s": 2.0,     # ... then its size and mtime must hold this long
+    "watch_window_s": 30,      # ready files are collected this long into one commit
+    "watch_batch_max": 500,    # ... or until there are this many
+    "watch_poll_s": 2.0,       # rescan interval where inotify is not available
+    "watch_ignore": [".*", "*~", "*.tmp", "*.part", "*.crdownload", "*.swp"],
+    "watch_folder": "",        # last folder watched from the GUI
+    "upload_coalesce_s": 5,    # GUI uploads requested within this many seconds share one commit and push
+    "quit_timeout_s": 10,      # on exit, how long running jobs get to stop before they are killed
+}
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file next to path and rename it into place."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_config():
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(CONFIG_FILE, "r") as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Error reading config file: {str(e)}")
+    return config
+
+
+def save_config(config):
+    write_json_atomic(CONFIG_FILE, config)
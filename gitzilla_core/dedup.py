@@ -0,0 +1,155 @@
+"""
+Skipping uploads of content the target already has. Every source file is read
+once, in fixed-size chunks, into both its SHA-256 (the LFS object id) and its
+git blob SHA; the digests are kept in ~/.gitzilla/dedup.json under the file's
+path, size, mtime and inode, so an unchanged file is never read again. The
+index also remembers which repository paths each content was uploaded to.
+
+Whether a file can be skipped is always decided against the target's tree:
+the index only saves the hashing, so a stale entry can never hide a change.
+"""
+
+import os
+import time
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from .config import GITZILLA_HOME, write_json_atomic
+from .lfs import LFS_POINTER
+from .tree import TreeCache
+
+DEDUP_INDEX = GITZILLA_HOME / "dedup.json"
+HASH_CHUNK = 1024 * 1024  # bytes read at a time; memory use doesn't grow with file size
+
+
+def git_blob_sha(data):
+    """Git blob SHA-1 of bytes held in memory (e.g. an LFS pointer)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def hash_file(path, on_progress=None, chunk=HASH_CHUNK):
+    """
+    Stream path once through SHA-256 and git's blob SHA-1; returns
+    (sha256, blob_sha). on_progress(bytes) is called after every chunk.
+    """
+    size = os.path.getsize(path)
+    sha256 = hashlib.sha256()
+    blob = hashlib.sha1(b"blob %d\0" % size)
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk)
+            if not buf:
+                break
+            sha256.update(buf)
+            blob.update(buf)
+            done += len(buf)
+            if on_progress:
+                on_progress(done)
+    return sha256.hexdigest(), blob.hexdigest()
+
+
+def _stamp(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class ContentIndex:
+    """
+    Persistent index of file digests ("files": path -> stamp and digests) and
+    of where content was uploaded ("content": sha256 -> blob SHA and
+    "repo:path" locations). Thread-safe; call save() to write it out.
+    """
+
+    MAX_FILES = 50000
+    MAX_LOCATIONS = 20  # per content
+
+    def __init__(self, path=DEDUP_INDEX):
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self._files = data.get("files", {})
+        self._content = data.get("content", {})
+
+    def hashes(self, source, on_progress=None):
+        """(sha256, blob_sha) of source, read from disk only if it changed since it was last hashed."""
+        path = os.path.realpath(source)
+        stamp = _stamp(os.stat(path))
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and entry["stamp"] == stamp:
+                entry["seen"] = time.time()
+                return entry["sha256"], entry["blob"]
+        sha256, blob = hash_file(path, on_progress)
+        if _stamp(os.stat(path)) != stamp:
+            return sha256, blob  # modified while being read: don't trust it next time
+        with self._lock:
+            self._files[path] = {"stamp": stamp, "sha256": sha256, "blob": blob, "seen": time.time()}
+            self._dirty = True
+        return sha256, blob
+
+    def record(self, key, rel_path, sha256, blob):
+        """Note that content sha256 (git blob blob) is now at rel_path in repository key."""
+        location = f"{key}:{rel_path}"
+        with self._lock:
+            entry = self._content.setdefault(sha256, {"blob": blob, "locations": []})
+            if location in entry["locations"]:
+                entry["locations"].remove(location)
+            entry["locations"].append(location)
+            del entry["locations"][:-self.MAX_LOCATIONS]
+            self._dirty = True
+
+    def locations(self, sha256):
+        """["repo:path", ...] the content was uploaded to, most recent last."""
+        with self._lock:
+            return list(self._content.get(sha256, {}).get("locations", []))
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            if len(self._files) > self.MAX_FILES:
+                newest = sorted(self._files.items(), key=lambda kv: kv[1].get("seen", 0))[-self.MAX_FILES:]
+                self._files = dict(newest)
+            write_json_atomic(self.path, {"files": self._files, "content": self._content})
+            self._dirty = False
+
+
+def unchanged_items(job, repo_dir, items, rel_paths, lfs, index, env=None, trees=None):
+    """
+    Indexes of items whose content is already committed at their path in
+    repo_dir's HEAD, with the same mode; LFS-routed items (indexes in lfs)
+    are compared by their pointer. Also returns {n: (sha256, blob_sha)} for
+    every item, so LFS uploads can reuse the digests.
+    """
+    trees = trees or TreeCache()
+    root = trees.root(job, repo_dir, env=env)
+    total = len(items)
+    digests, same = {}, set()
+    for n, item in enumerate(items):
+        job.status(f"Checking {n + 1}/{total} against the repository: {item.dest}")
+        with job.span("hash", bytes=item.size):
+            digests[n] = index.hashes(item.source, on_progress=lambda done: job.check_cancelled())
+        if root is None:
+            continue
+        folder, _, name = rel_paths[n].rpartition("/")
+        tree_sha = trees.lookup(job, repo_dir, root, folder, env=env)
+        if tree_sha is None:
+            continue
+        if n in lfs:
+            expected = ("100644", git_blob_sha(LFS_POINTER.format(oid=digests[n][0], size=item.size).encode()))
+        else:
+            mode = "100755" if os.name != "nt" and os.access(item.source, os.X_OK) else "100644"
+            expected = (mode, digests[n][1])
+        for entry in trees.entries(job, repo_dir, tree_sha, env=env):
+            if entry.name == name:
+                if (entry.mode, entry.sha) == expected:
+                    same.add(n)
+                break
+    return same, digests
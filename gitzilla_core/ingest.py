@@ -0,0 +1,144 @@
+"""
+Getting uploaded files into a clone's object store and index. "copy" puts
+the file in the working tree using the cheapest copy the platform offers;
+"in_place" hashes the source straight into the object store and never writes
+a working-tree copy at all. Staging only ever names the uploaded paths.
+"""
+
+import os
+import sys
+import subprocess
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Above this many files, paths are written straight into the index instead of
+# going through "git add" pathspec matching.
+STAGE_INDEX_THRESHOLD = 256
+
+
+def stage_paths(job, clone_dir, rel_paths, env=None):
+    """
+    Stage exactly rel_paths (repo-relative, "/"-separated) and nothing else, so
+    the cost follows the number of uploaded files rather than the size of the
+    working tree. Small sets use "git add" with a literal pathspec file; large
+    ones are hashed and recorded by "git update-index --stdin". Either way the
+    paths are staged even if .gitignore matches them: they were picked for upload.
+    """
+    if not rel_paths:
+        return
+    paths = "\0".join(rel_paths) + "\0"
+    if len(rel_paths) < STAGE_INDEX_THRESHOLD:
+        job.run(["git", "--literal-pathspecs", "add", "-f", "--pathspec-from-file=-", "--pathspec-file-nul"],
+                env=env, cwd=clone_dir, input=paths)
+    else:
+        job.run(["git", "update-index", "--add", "-z", "--stdin"], env=env, cwd=clone_dir, input=paths)
+
+
+INGEST_MODES = ("copy", "in_place")
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+def fast_copy(src, dst, on_progress=None):
+    """
+    Copy src to dst and return the method used: "reflink" (copy-on-write clone,
+    no data written), "copy_file_range" / "sendfile" (in-kernel copy, no user
+    space buffers) or "buffered" as the portable fallback. on_progress(bytes)
+    is called with the running total.
+    """
+    size = os.path.getsize(src)
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        if fcntl is not None and sys.platform.startswith("linux"):
+            try:
+                fcntl.ioctl(outfd, FICLONE, infd)
+                if on_progress:
+                    on_progress(size)
+                return "reflink"
+            except OSError:
+                pass
+
+        kernel_copies = []
+        if hasattr(os, "copy_file_range"):
+            kernel_copies.append(("copy_file_range", lambda n, off: os.copy_file_range(infd, outfd, n, off, off)))
+        if sys.platform.startswith("linux"):
+            kernel_copies.append(("sendfile", lambda n, off: os.sendfile(outfd, infd, off, n)))
+        for method, copy_chunk in kernel_copies:
+            copied = 0
+            try:
+                while copied < size:
+                    n = copy_chunk(min(COPY_CHUNK, size - copied), copied)
+                    if n == 0:
+                        break
+                    copied += n
+                    if on_progress:
+                        on_progress(copied)
+            except OSError:
+                if copied:
+                    raise
+                continue  # unsupported here (e.g. cross-device); try the next method
+            if size == 0 and on_progress:
+                on_progress(0)
+            return method
+
+        copied = 0
+        while True:
+            buf = fsrc.read(COPY_CHUNK)
+            if not buf:
+                break
+            fdst.write(buf)
+            copied += len(buf)
+            if on_progress:
+                on_progress(copied)
+        return "buffered"
+
+
+def index_in_place(job, clone_dir, entries, env=None, on_file=None):
+    """
+    Hash each (rel_path, source) pair straight from the source file into the
+    object store and record it in the index; nothing is written to the working
+    tree. --path makes .gitattributes filters apply as if the file were at
+    rel_path. on_file(n) is called after each file is hashed.
+    """
+    if not entries:
+        return  # e.g. every file went to LFS; an empty --index-info line is malformed
+    lines = []
+    for n, (rel, source) in enumerate(entries, 1):
+        proc = job.run(["git", "hash-object", "-w", f"--path={rel}", "--", str(source)], env=env, cwd=clone_dir)
+        mode = "100755" if os.name != "nt" and os.access(source, os.X_OK) else "100644"
+        lines.append(f"{mode} {proc.stdout.strip()}\t{rel}")
+        if on_file:
+            on_file(n)
+    job.run(["git", "update-index", "--add", "-z", "--index-info"], env=env, cwd=clone_dir,
+            input="\0".join(lines) + "\0")
+
+
+def index_blobs(job, clone_dir, entries, env=None):
+    """Store each (rel_path, bytes) verbatim as a blob and record it in the index."""
+    lines = []
+    for rel, content in entries:
+        proc = job.run(["git", "hash-object", "-w", "--stdin", "--no-filters"], env=env, cwd=clone_dir,
+                       input=content, text=False)
+        lines.append(f"100644 {proc.stdout.decode().strip()}\t{rel}")
+    job.run(["git", "update-index", "--add", "-z", "--index-info"], env=env, cwd=clone_dir,
+            input="\0".join(lines) + "\0")
+
+
+def has_staged_changes(job, clone_dir, env=None):
+    """True if the index differs from HEAD (or HEAD does not exist yet)."""
+    try:
+        job.run(["git", "rev-parse", "--verify", "-q", "HEAD"], env=env, cwd=clone_dir)
+    except subprocess.CalledProcessError:
+        proc = job.run(["git", "ls-files", "-z"], env=env, cwd=clone_dir)
+        return bool(proc.stdout)
+    try:
+        job.run(["git", "diff", "--cached", "--quiet"], env=env, cwd=clone_dir)
+    except subprocess.CalledProcessError as e:
+        if e.returncode == 1:
+            return True
+        raise
+    return False
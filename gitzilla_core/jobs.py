@@ -0,0 +1,351 @@
+"""
+Cancellable jobs that run git/ssh subprocesses, and the executors that run
+them. In the GUI every job runs on a worker thread; workers never touch Tk and
+instead post callbacks to a queue that the UI thread drains via master.after.
+Headless callers run jobs directly with run_job().
+"""
+
+import re
+import queue
+import threading
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .progress import format_progress, overall_percent, parse_git_progress
+from .trace import NO_SPAN, command_name, command_phase
+
+
+class GitzillaError(Exception):
+    """Error raised by worker code, carrying the dialog title to show on the UI thread."""
+
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+        self.message = message
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker once its job has been cancelled."""
+
+
+KILL_AFTER_S = 5  # a cancelled subprocess that ignores SIGTERM this long is killed
+
+
+class Job:
+    """Handle for one background operation; owns the subprocess it is running."""
+
+    def __init__(self, executor, name, on_status=None, on_progress=None):
+        self.executor = executor
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.bytes_transferred = 0  # network bytes reported by git and LFS transfers
+        self.tracer = getattr(executor, "tracer", None)
+        self._on_status = on_status
+        self._on_progress = on_progress
+        self._proc = None
+        self._children = []
+        self._lock = threading.Lock()
+
+    def child(self, name, on_status=None, on_progress=None):
+        """
+        A job sharing this job's cancellation but running its own subprocesses,
+        for parallel work inside one job. on_status/on_progress are UI-thread
+        callbacks replacing the executor's status label and progress bar.
+        """
+        child = Job(self.executor, name, on_status=on_status, on_progress=on_progress or (lambda value: None))
+        child.cancel_event = self.cancel_event
+        with self._lock:
+            self._children.append(child)
+        return child
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self, force=False):
+        """Request cancellation and terminate (with force: kill) the running subprocesses, if any."""
+        self.cancel_event.set()
+        with self._lock:
+            procs = [self._proc] + [child._proc for child in self._children]
+        for proc in procs:
+            if proc is not None and proc.poll() is None:
+                if force:
+                    proc.kill()
+                else:
+                    proc.terminate()
+
+    def span(self, name, phase=None, **attrs):
+        """Time a block as a trace span (see trace.Tracer.span); a no-op without a tracer."""
+        if self.tracer is None:
+            return NO_SPAN
+        return self.tracer.span(name, phase, **attrs)
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the UI thread (thread-safe)."""
+        self.executor.post(callback, *args)
+
+    def status(self, msg):
+        """Show a status message (thread-safe)."""
+        self.executor.post(self._on_status or self.executor.on_status, msg)
+
+    def progress(self, value):
+        """Set the progress bar, 0-100 (thread-safe)."""
+        self.executor.post(self._on_progress or self.executor.on_progress, value)
+
+    def run(self, cmd, env=None, cwd=None, input=None, text=True):
+        """
+        Cancellable equivalent of subprocess.run(cmd, check=True, capture_output=True, text=text).
+        Raises CalledProcessError on a non-zero exit and JobCancelled if cancelled meanwhile.
+        """
+        with self.span(command_name(cmd), command_phase(cmd)) as span:
+            result = self._run(cmd, env, cwd, input, text)
+            span.set(exit_code=result.returncode)
+            return result
+
+    def _run(self, cmd, env, cwd, input, text):
+        self.check_cancelled()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+            env=env,
+            cwd=cwd
+        )
+        with self._lock:
+            self._proc = proc
+        try:
+            while True:
+                try:
+                    stdout, stderr = proc.communicate(input=input, timeout=0.1)
+                    break
+                except subprocess.TimeoutExpired:
+                    input = None  # already handed over; communicate() resumes writing it
+                    if self.cancelled:
+                        proc.terminate()
+                        try:
+                            # Not communicate(): a grandchild could hold the pipes open long after
+                            proc.wait(timeout=KILL_AFTER_S)
+                        except subprocess.TimeoutExpired:
+                            proc.kill()
+                            proc.wait()
+                        raise JobCancelled(self.name)
+        finally:
+            with self._lock:
+                self._proc = None
+        if self.cancelled:
+            raise JobCancelled(self.name)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def stream(self, cmd, operation, env=None, cwd=None, on_progress=None):
+        """
+        Run a git command that reports --progress, reading stderr as it arrives.
+        Each progress update drives the progress bar and status label; on_progress,
+        if given, also receives every GitProgress. Non-progress stderr lines are
+        kept for error reporting. Same return/raise contract as run().
+        """
+        before = self.bytes_transferred
+        with self.span(command_name(cmd), command_phase(cmd)) as span:
+            try:
+                result = self._stream(cmd, operation, env, cwd, on_progress)
+            finally:
+                span.set(bytes=self.bytes_transferred - before)
+            span.set(exit_code=result.returncode)
+            return result
+
+    def _stream(self, cmd, operation, env, cwd, on_progress):
+        self.check_cancelled()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=cwd
+        )
+        with self._lock:
+            self._proc = proc
+
+        # stdout is drained on its own thread so neither pipe can fill up and block git.
+        stdout_chunks = []
+        stdout_reader = threading.Thread(target=lambda: stdout_chunks.append(proc.stdout.read()), daemon=True)
+        stdout_reader.start()
+
+        messages = []
+        last_post = 0.0
+        last_key = None
+        transferred = {}
+        buf = b""
+        try:
+            while True:
+                chunk = proc.stderr.read1(65536)
+                if not chunk:
+                    break
+                buf += chunk
+                *lines, buf = re.split(rb"[\r\n]", buf)
+                for raw in lines:
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if not line:
+                        continue
+                    progress = parse_git_progress(line)
+                    if progress is None:
+                        messages.append(line)
+                        continue
+                    if on_progress is not None:
+                        on_progress(progress)
+                    if progress.bytes is not None:
+                        transferred[progress.phase] = progress.bytes
+                    # Throttle UI updates: on every percent change, at most every 100 ms otherwise.
+                    now = time.monotonic()
+                    key = (progress.phase, progress.percent)
+                    if key != last_key or now - last_post >= 0.1:
+                        last_key, last_post = key, now
+                        self.status(format_progress(progress))
+                        value = overall_percent(operation, progress)
+                        if value is not None:
+                            self.progress(value)
+            if buf.strip():
+                messages.append(buf.decode("utf-8", errors="replace").strip())
+            proc.wait()
+            stdout_reader.join()
+        finally:
+            with self._lock:
+                self._proc = None
+            self.bytes_transferred += sum(transferred.values())
+        if self.cancelled:
+            raise JobCancelled(self.name)
+        stdout = b"".join(c for c in stdout_chunks if c).decode("utf-8", errors="replace")
+        stderr = "\n".join(messages[-200:])
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class JobExecutor:
+    """Thread pool for jobs plus a queue polled from the Tk mainloop."""
+
+    POLL_MS = 30          # idle polling interval
+    FRAME_BUDGET = 0.008  # max seconds spent draining the queue per tick
+
+    def __init__(self, master, on_status=None, on_progress=None, max_workers=2, tracer=None):
+        self.master = master
+        self.tracer = tracer
+        self.on_status = on_status or (lambda msg: None)
+        self.on_progress = on_progress or (lambda value: None)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gitzilla")
+        self.events = queue.Queue()
+        self.jobs = set()
+        self._closed = False
+        self._after_id = self.master.after(self.POLL_MS, self._poll)
+
+    def submit(self, name, fn, on_success=None, on_error=None):
+        """
+        Run fn(job) on a worker. on_success(result) or on_error(exc) is then
+        called on the UI thread. Must be called from the UI thread.
+        """
+        job = Job(self, name)
+        self.jobs.add(job)
+
+        def runner():
+            try:
+                job.check_cancelled()
+                with job.span(name, f"{name} job"):
+                    result = fn(job)
+            except BaseException as e:
+                self.post(self._finish, job, on_error, e)
+            else:
+                self.post(self._finish, job, on_success, result)
+
+        job.future = self.pool.submit(runner)
+        return job
+
+    def post(self, callback, *args):
+        """Queue callback(*args) for the UI thread. Safe from any thread."""
+        self.events.put((callback, args))
+
+    def busy(self):
+        return bool(self.jobs)
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def shutdown(self, timeout=0):
+        """
+        Stop polling and cancel every job, then wait up to timeout seconds for
+        the workers to wind down, killing subprocesses that are still running
+        halfway through. Returns True if no job is left running.
+        """
+        self._closed = True
+        if self._after_id is not None:
+            try:
+                self.master.after_cancel(self._after_id)
+            except Exception:
+                pass  # the window is already gone
+            self._after_id = None
+        self.cancel_all()
+        running = {job.future for job in self.jobs if job.future is not None}
+        if running and timeout > 0:
+            _, running = wait(running, timeout / 2)
+            if running:
+                for job in list(self.jobs):
+                    job.cancel(force=True)
+                _, running = wait(running, timeout / 2)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        return not {future for future in running if not future.done()}
+
+    def _finish(self, job, callback, value):
+        self.jobs.discard(job)
+        if callback is not None:
+            callback(value)
+
+    def _poll(self):
+        # Drain within a fixed time budget so a flood of events never stalls the UI.
+        deadline = time.perf_counter() + self.FRAME_BUDGET
+        while time.perf_counter() < deadline:
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback: {str(e)}")
+        if not self._closed:
+            delay = 1 if not self.events.empty() else self.POLL_MS
+            self._after_id = self.master.after(delay, self._poll)
+
+
+class DirectExecutor:
+    """
+    Executor for headless use: posted callbacks run immediately on the calling
+    thread, so callbacks from parallel work must be thread-safe.
+    """
+
+    def __init__(self, on_status=None, on_progress=None, tracer=None):
+        self.on_status = on_status or (lambda msg: None)
+        self.on_progress = on_progress or (lambda value: None)
+        self.tracer = tracer
+
+    def post(self, callback, *args):
+        callback(*args)
+
+
+def run_job(fn, name="job", on_status=None, on_progress=None, tracer=None):
+    """Run fn(job) on the current thread, timed as a span if tracer is given. Ctrl-C cancels the job's subprocesses."""
+    job = Job(DirectExecutor(on_status, on_progress, tracer), name)
+    try:
+        with job.span(name, f"{name} job"):
+            return fn(job)
+    except KeyboardInterrupt:
+        job.cancel()
+        raise
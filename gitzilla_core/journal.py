@@ -0,0 +1,92 @@
+"""
+Journal of uploads in flight, one JSON file per batch under
+~/.gitzilla/journal. An entry is written before anything is committed and
+removed once the batch is pushed (or turned out to be unchanged), so entries
+left over after a crash, a cancel or a failed push are uploads that can be
+resumed: by pushing the recorded commit if the repository still has it, or
+by uploading the same files again.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from pathlib import Path
+
+from .config import GITZILLA_HOME, write_json_atomic
+
+JOURNAL_DIR = GITZILLA_HOME / "journal"
+
+
+class UploadJournal:
+    """Persisted upload entries keyed by a random id."""
+
+    def __init__(self, root=JOURNAL_DIR):
+        self.root = Path(root).expanduser()
+        self._lock = threading.Lock()
+
+    def _path(self, entry_id):
+        return self.root / f"{entry_id}.json"
+
+    def get(self, entry_id):
+        try:
+            with open(self._path(entry_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def start(self, key, url, mode, repo_dir, items, target_rel, commit_msg, entry_id=None):
+        """Record a batch about to be uploaded; returns its id. entry_id reuses an existing entry."""
+        entry_id = entry_id or uuid.uuid4().hex[:12]
+        now = time.time()
+        entry = {
+            "id": entry_id,
+            "repo": key,
+            "url": url,
+            "mode": mode,
+            "repo_dir": str(repo_dir),
+            "target": target_rel,
+            "message": commit_msg,
+            "items": [[os.path.abspath(item.source), item.dest] for item in items],
+            "state": "started",
+            "commit": None,
+            "branch": None,
+            "created": (self.get(entry_id) or {}).get("created", now),
+            "updated": now,
+        }
+        with self._lock:
+            write_json_atomic(self._path(entry_id), entry)
+        return entry_id
+
+    def committed(self, entry_id, commit, branch):
+        """Note the commit made for an entry, so a resume can push it as it is."""
+        with self._lock:
+            entry = self.get(entry_id)
+            if entry is None:
+                return
+            entry.update(state="committed", commit=commit, branch=branch, updated=time.time())
+            write_json_atomic(self._path(entry_id), entry)
+
+    def finish(self, entry_id):
+        """Drop an entry: pushed, unchanged or given up."""
+        with self._lock:
+            try:
+                self._path(entry_id).unlink()
+            except FileNotFoundError:
+                pass
+
+    def pending(self, key=None):
+        """Entries left behind by interrupted uploads (only those for repository key, if given), oldest first."""
+        entries = []
+        with self._lock:
+            try:
+                names = sorted(os.listdir(self.root))
+            except FileNotFoundError:
+                return []
+            for name in names:
+                if name.endswith(".json") and not name.startswith("."):
+                    entry = self.get(name[:-len(".json")])
+                    if entry is not None and (key is None or entry.get("repo") == key):
+                        entries.append(entry)
+        return sorted(entries, key=lambda e: e.get("created", 0))
@@ -0,0 +1,189 @@
+"""
+SSH keys used by Gitzilla to authenticate git over SSH. Keys are named (one
+per GitHub account by default) and kept in ~/.gitzilla_keys across sessions,
+so a key registered with GitHub once keeps working. keys.json indexes each
+key's type, public key and fingerprint.
+"""
+
+import re
+import json
+import time
+import base64
+import hashlib
+import threading
+import subprocess
+from pathlib import Path
+
+from .config import write_json_atomic
+from .jobs import GitzillaError
+
+# Define a persistent directory for SSH keys for easier debugging
+KEYS_DIR = Path.home() / ".gitzilla_keys"
+DEFAULT_KEY_NAME = "default"
+KEY_NAME_RE = re.compile(r"[A-Za-z0-9_.-]+")
+
+# Extra "ssh-keygen" arguments per key type. Ed25519 keys take milliseconds to
+# generate and sign with; RSA is kept for servers that still require it.
+KEY_TYPES = {
+    "ed25519": ["-t", "ed25519"],
+    "rsa": ["-t", "rsa", "-b", "4096"],
+}
+
+
+def key_fingerprint(pub_key):
+    """SHA256 fingerprint of an OpenSSH public key line, as printed by "ssh-keygen -l"."""
+    try:
+        blob = base64.b64decode(pub_key.split()[1], validate=True)
+    except (IndexError, ValueError):
+        raise GitzillaError("Public Key Error", "Not an OpenSSH public key.")
+    return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode("ascii").rstrip("=")
+
+
+def _stamp(path):
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+class KeyStore:
+    """Named SSH key pairs in one directory, indexed by keys.json."""
+
+    INDEX_FILE = "keys.json"
+
+    def __init__(self, root=KEYS_DIR):
+        self.root = Path(root).expanduser()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.root / self.INDEX_FILE, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update(self, name, entry):
+        with self._lock:
+            entries = self._load()
+            if entry is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = entry
+            write_json_atomic(self.root / self.INDEX_FILE, entries)
+
+    def entries(self):
+        """Return {name: {"type", "public_key", "fingerprint", "created", "stamp"}} for every indexed key."""
+        with self._lock:
+            return self._load()
+
+    def path_for(self, name):
+        if not KEY_NAME_RE.fullmatch(name) or name in (".", ".."):
+            raise GitzillaError("Invalid Key Name", f"Invalid SSH key name: {name!r}")
+        return self.root / f"gitzilla_{name}"
+
+    def get(self, name):
+        """
+        Return (private key path, public key) for a usable key, or None. The index
+        answers as long as the key file is unchanged since it was recorded; a key
+        file the index doesn't know (or that changed) is re-read and re-indexed.
+        """
+        priv_key = self.path_for(name)
+        if not priv_key.is_file():
+            return None
+        entry = self.entries().get(name)
+        if entry and entry.get("stamp") == _stamp(priv_key):
+            return priv_key, entry["public_key"]
+        return self._adopt(name, priv_key)
+
+    def _adopt(self, name, priv_key):
+        try:
+            # Derive the public key from the private one: the .pub file may be missing or stale
+            proc = subprocess.run(["ssh-keygen", "-y", "-P", "", "-f", str(priv_key)], capture_output=True, text=True,
+                                  stdin=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        pub_key = proc.stdout.strip()
+        if proc.returncode != 0 or not pub_key:
+            return None  # unreadable, or protected by a passphrase
+        key_type = "rsa" if pub_key.startswith("ssh-rsa") else pub_key.split()[0].replace("ssh-", "")
+        self._record(name, priv_key, key_type, pub_key)
+        return priv_key, pub_key
+
+    def _record(self, name, priv_key, key_type, pub_key):
+        self._update(name, {
+            "type": key_type,
+            "public_key": pub_key,
+            "fingerprint": key_fingerprint(pub_key),
+            "created": time.time(),
+            "stamp": _stamp(priv_key),
+        })
+
+    def only(self):
+        """(name, private key path, public key) of the saved key if there is exactly one usable key, else None."""
+        try:
+            names = [path.name[len("gitzilla_"):] for path in self.root.glob("gitzilla_*")
+                     if path.is_file() and path.suffix != ".pub"]
+        except OSError:
+            return None
+        found = []
+        for name in names:
+            try:
+                key = self.get(name)
+            except GitzillaError:
+                continue  # a file named like a key, but not a valid key name
+            if key is not None:
+                found.append((name,) + key)
+        return found[0] if len(found) == 1 else None
+
+    def find(self, fingerprint):
+        """Name of the indexed key with this fingerprint, or None."""
+        for name, entry in self.entries().items():
+            if entry.get("fingerprint") == fingerprint:
+                return name
+        return None
+
+    def ensure(self, job, name=DEFAULT_KEY_NAME, key_type="ed25519", comment=None):
+        """Return (private key path, public key, created): the existing key named name, or a new one."""
+        existing = self.get(name)
+        if existing is not None:
+            return existing + (False,)
+        return self.generate(job, name, key_type, comment) + (True,)
+
+    def generate(self, job, name=DEFAULT_KEY_NAME, key_type="ed25519", comment=None):
+        """Replace the key named name with a new key pair; returns (private key path, public key)."""
+        if key_type not in KEY_TYPES:
+            raise GitzillaError("SSH Key Generation Error", f"Unsupported key type: {key_type!r}")
+        priv_key = self.path_for(name)
+        pub_key_path = Path(f"{priv_key}.pub")
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # Cleanup old keys if they exist
+        if priv_key.exists():
+            priv_key.unlink()
+        if pub_key_path.exists():
+            pub_key_path.unlink()
+
+        job.status(f"Generating {key_type} SSH key pair...")
+        try:
+            job.run(["ssh-keygen"] + KEY_TYPES[key_type] + [
+                "-C", comment or f"gitzilla_{name}",
+                "-f", str(priv_key),
+                "-N", ""
+            ])
+        except subprocess.CalledProcessError as e:
+            error_msg = e.stderr.strip() if e.stderr else "Unknown error."
+            raise GitzillaError("SSH Key Generation Error", f"Error generating key:\n{error_msg}")
+
+        # Read the public key
+        try:
+            with open(pub_key_path, "r") as f:
+                pub_key = f.read().strip()
+        except Exception as e:
+            raise GitzillaError("Public Key Error", f"Error reading public key:\n{str(e)}")
+        self._record(name, priv_key, key_type, pub_key)
+        return priv_key, pub_key
+
+    def remove(self, name):
+        priv_key = self.path_for(name)
+        for path in (priv_key, Path(f"{priv_key}.pub")):
+            if path.exists():
+                path.unlink()
+        self._update(name, None)
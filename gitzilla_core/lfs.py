@@ -0,0 +1,285 @@
+"""
+Git LFS routing and uploads. Files over the size threshold, with a listed
+extension, or already covered by an LFS rule in .gitattributes are committed
+as LFS pointers and their content goes to the LFS store. This talks the LFS
+batch API directly, so the git-lfs client is not needed to upload.
+"""
+
+import os
+import re
+import json
+import shlex
+import hashlib
+import threading
+import subprocess
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from .ingest import COPY_CHUNK, fast_copy
+from .jobs import GitzillaError, JobCancelled
+
+
+LFS_POINTER = "version https://git-lfs.github.com/spec/v1\noid sha256:{oid}\nsize {size}\n"
+LFS_MEDIA_TYPE = "application/vnd.git-lfs+json"
+
+
+def sha256_file(path, on_progress=None, chunk=COPY_CHUNK // 16):
+    """Stream path through SHA-256 in fixed-size chunks; returns the hex digest."""
+    h = hashlib.sha256()
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            buf = f.read(chunk)
+            if not buf:
+                break
+            h.update(buf)
+            done += len(buf)
+            if on_progress:
+                on_progress(done)
+    return h.hexdigest()
+
+
+def lfs_attr_pattern(rel_path):
+    """Anchored .gitattributes pattern matching exactly rel_path (escaped like git-lfs does)."""
+    escaped = re.sub(r"([\\*?\[])", r"\\\1", rel_path).replace(" ", "[[:space:]]")
+    return "/" + escaped
+
+
+def lfs_routes(job, clone_dir, items, rel_paths, config, env=None):
+    """Return the set of indexes of items that should go through LFS."""
+    threshold = float(config.get("lfs_threshold_mb") or 0) * 1024 * 1024
+    extensions = {e.lower() if e.startswith(".") else "." + e.lower() for e in config.get("lfs_extensions") or []}
+    routed = set()
+    for n, item in enumerate(items):
+        if (threshold and item.size >= threshold) or item.source.suffix.lower() in extensions:
+            routed.add(n)
+    # Paths the repository itself already tracks with LFS
+    proc = job.run(["git", "check-attr", "-z", "--stdin", "filter"], env=env, cwd=clone_dir,
+                   input="\0".join(rel_paths) + "\0")
+    fields = proc.stdout.split("\0")
+    tracked = {fields[i] for i in range(0, len(fields) - 2, 3) if fields[i + 2] == "lfs"}
+    routed.update(n for n, rel in enumerate(rel_paths) if rel in tracked)
+    return routed
+
+
+def _lfs_rule_patterns(text):
+    return [line.split()[0] for line in text.splitlines() if line.strip() and "filter=lfs" in line]
+
+
+def add_lfs_rules(text, patterns):
+    """.gitattributes text with "filter=lfs" rules appended for the patterns it doesn't track yet."""
+    existing = set(_lfs_rule_patterns(text))
+    missing = [p for p in patterns if p not in existing]
+    if not missing:
+        return text
+    if text and not text.endswith("\n"):
+        text += "\n"
+    return text + "".join(f"{p} filter=lfs diff=lfs merge=lfs -text\n" for p in missing)
+
+
+def added_lfs_rules(old, new):
+    """
+    The patterns of the LFS rules add_lfs_rules appended to old to give new, or
+    None if new is not old plus such rules (e.g. a .gitattributes the user uploaded).
+    """
+    if old and not old.endswith("\n"):
+        old += "\n"
+    if not new.startswith(old):
+        return None
+    patterns = _lfs_rule_patterns(new[len(old):])
+    return patterns if add_lfs_rules(old, patterns) == new else None
+
+
+def ensure_lfs_attributes(clone_dir, patterns):
+    """Add "filter=lfs" rules for patterns to the root .gitattributes; returns True if it changed."""
+    path = Path(clone_dir) / ".gitattributes"
+    try:
+        text = path.read_text()
+    except FileNotFoundError:
+        text = ""
+    new_text = add_lfs_rules(text, patterns)
+    if new_text == text:
+        return False
+    path.write_text(new_text)
+    return True
+
+
+class LocalLfsStore:
+    """
+    File-based LFS store using git-lfs's own layout (<root>/ab/cd/<oid>). This
+    is what git-lfs uses for local/file:// remotes (<gitdir>/lfs/objects), and
+    doubles as a stand-in server for testing.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, oid):
+        return self.root / oid[0:2] / oid[2:4] / oid
+
+    def missing(self, objects):
+        return [obj for obj in objects if not self._path(obj["oid"]).is_file()]
+
+    def upload(self, obj, source, on_progress, cancelled):
+        dest = self._path(obj["oid"])
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(dest.name + ".tmp")
+        fast_copy(source, tmp, on_progress=on_progress)
+        if cancelled():
+            tmp.unlink()
+            raise JobCancelled("lfs")
+        os.replace(tmp, dest)
+
+
+class _ProgressReader:
+    """File wrapper reporting bytes read, used as an HTTP request body."""
+
+    def __init__(self, f, on_progress, cancelled):
+        self.f = f
+        self.done = 0
+        self.on_progress = on_progress
+        self.cancelled = cancelled
+
+    def read(self, n=-1):
+        if self.cancelled():
+            raise JobCancelled("lfs")
+        buf = self.f.read(n if n and n > 0 else COPY_CHUNK // 64)
+        self.done += len(buf)
+        self.on_progress(self.done)
+        return buf
+
+
+class HttpLfsStore:
+    """LFS server speaking the batch API with the "basic" transfer adapter."""
+
+    def __init__(self, href, header=None):
+        self.href = href.rstrip("/")
+        self.header = dict(header or {})
+
+    def _json(self, url, payload, header):
+        req = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode(),
+            method="POST",
+            headers=dict(header, **{"Accept": LFS_MEDIA_TYPE, "Content-Type": LFS_MEDIA_TYPE})
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                body = resp.read()
+        except urllib.error.HTTPError as e:
+            raise GitzillaError("LFS Error", f"LFS server error {e.code}:\n{e.read().decode(errors='replace')}")
+        except urllib.error.URLError as e:
+            raise GitzillaError("LFS Error", f"Cannot reach LFS server:\n{e.reason}")
+        return json.loads(body) if body else {}
+
+    def missing(self, objects):
+        response = self._json(f"{self.href}/objects/batch", {
+            "operation": "upload",
+            "transfers": ["basic"],
+            "objects": [{"oid": o["oid"], "size": o["size"]} for o in objects],
+        }, self.header)
+        needed = []
+        for obj in response.get("objects", []):
+            if obj.get("error"):
+                raise GitzillaError("LFS Error", f"LFS rejected {obj['oid']}: {obj['error'].get('message')}")
+            if "upload" in obj.get("actions", {}):
+                needed.append(obj)  # objects without an upload action are already stored
+        return needed
+
+    def upload(self, obj, source, on_progress, cancelled):
+        action = obj["actions"]["upload"]
+        with open(source, "rb") as f:
+            req = urllib.request.Request(
+                action["href"],
+                data=_ProgressReader(f, on_progress, cancelled),
+                method="PUT",
+                headers=dict(action.get("header", {}), **{
+                    "Content-Type": "application/octet-stream",
+                    "Content-Length": str(obj["size"]),
+                })
+            )
+            try:
+                urllib.request.urlopen(req, timeout=300).close()
+            except urllib.error.HTTPError as e:
+                raise GitzillaError("LFS Error", f"LFS upload failed ({e.code}) for {obj['oid']}")
+            except urllib.error.URLError as e:
+                raise GitzillaError("LFS Error", f"LFS upload failed for {obj['oid']}:\n{e.reason}")
+        verify = obj["actions"].get("verify")
+        if verify:
+            self._json(verify["href"], {"oid": obj["oid"], "size": obj["size"]}, verify.get("header", {}))
+
+
+def lfs_store_for(job, remote_url, config, env=None):
+    """Pick the LFS store for a remote: config override, local repo, SSH (git-lfs-authenticate) or HTTPS."""
+    endpoint = config.get("lfs_endpoint")
+    if endpoint:
+        if endpoint.startswith(("http://", "https://")):
+            return HttpLfsStore(endpoint)
+        return LocalLfsStore(Path(unquote(urlparse(endpoint).path) if endpoint.startswith("file:") else endpoint))
+
+    if remote_url.startswith(("http://", "https://")):
+        base = remote_url.rstrip("/")
+        return HttpLfsStore((base if base.endswith(".git") else base + ".git") + "/info/lfs")
+
+    ssh_match = re.match(r"^(?:ssh://)?(?P<host>[^/:@]+@[^/:]+)(?::(?P<port>\d+)/|[:/])(?P<path>.+)$", remote_url)
+    if ssh_match and not remote_url.startswith("file:"):
+        ssh_cmd = shlex.split((env or os.environ).get("GIT_SSH_COMMAND") or "ssh", posix=(os.name != "nt"))
+        if ssh_match.group("port"):
+            ssh_cmd += ["-p", ssh_match.group("port")]
+        ssh_cmd += [ssh_match.group("host"), f"git-lfs-authenticate {shlex.quote(ssh_match.group('path'))} upload"]
+        try:
+            proc = job.run(ssh_cmd, env=env)
+        except subprocess.CalledProcessError as e:
+            raise GitzillaError("LFS Error", f"git-lfs-authenticate failed:\n{(e.stderr or '').strip()}")
+        auth = json.loads(proc.stdout)
+        return HttpLfsStore(auth["href"], auth.get("header"))
+
+    # Local remote (path or file://): git-lfs keeps objects in <gitdir>/lfs/objects
+    path = Path(unquote(urlparse(remote_url).path) if remote_url.startswith("file:") else remote_url)
+    gitdir = path if (path / "objects").is_dir() else path / ".git"
+    return LocalLfsStore(gitdir / "lfs" / "objects")
+
+
+def upload_lfs_objects(job, store, objects, concurrency=4, on_progress=None):
+    """
+    Upload LFS objects ({"oid", "size", "source"}) the store does not have yet,
+    several at a time. on_progress(done_bytes, total_bytes, done_count, total_count)
+    reports the aggregate. Returns the number of bytes uploaded.
+    """
+    sources = {obj["oid"]: obj["source"] for obj in objects}
+    needed = store.missing([{"oid": o["oid"], "size": o["size"]} for o in objects])
+    if not needed:
+        return 0
+    total = sum(obj["size"] for obj in needed)
+    lock = threading.Lock()
+    per_object = {}
+    finished = [0]
+    failed = threading.Event()
+
+    def report(oid, done):
+        with lock:
+            per_object[oid] = done
+            done_bytes = sum(per_object.values())
+        if on_progress:
+            on_progress(done_bytes, total, finished[0], len(needed))
+
+    def transfer(obj):
+        store.upload(obj, sources[obj["oid"]], lambda done: report(obj["oid"], done),
+                     lambda: job.cancelled or failed.is_set())
+        with lock:
+            finished[0] += 1
+        report(obj["oid"], obj["size"])
+
+    with job.span("lfs upload", "lfs", bytes=total, objects=len(needed)), \
+            ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="gitzilla-lfs") as pool:
+        futures = [pool.submit(transfer, obj) for obj in needed]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            failed.set()
+            raise
+    return total
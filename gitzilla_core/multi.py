@@ -0,0 +1,81 @@
+"""Pushing one file set into many repositories in parallel."""
+
+import threading
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import upload_batch
+from .config import DEFAULT_CONFIG
+from .dedup import ContentIndex
+from .jobs import GitzillaError, JobCancelled
+
+
+class MultiRepoSync:
+    """
+    Push one file set into many repositories at once. Each target is cloned or
+    fetched through the clone cache and then goes through upload_batch, on
+    a bounded worker pool with a per-host limit on concurrent operations.
+    """
+
+    def __init__(self, cache, config=None, env=None, journal=None, index=None):
+        self.cache = cache
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.env = env
+        self.journal = journal
+        # One dedup index for all targets, so each file is hashed once
+        self.index = index if index is not None or not self.config["dedup"] else ContentIndex()
+
+    def run(self, job, targets, items, target_rel="", commit_msg=None, on_status=None, on_result=None):
+        """
+        Sync every (host, key, url) target; returns one result per target, in
+        order: {"repo", "status", "seconds", "bytes", "error"} where status is
+        "pushed", "unchanged", "failed" or "cancelled". on_status(repo, msg) and
+        on_result(result) are called on the UI thread as work progresses.
+        """
+        config = self.config
+        host_limits = {}
+        for host, _, _ in targets:
+            host_limits.setdefault(host, threading.BoundedSemaphore(max(1, int(config["multi_per_host"]))))
+        results = [None] * len(targets)
+        finished = [0]
+        lock = threading.Lock()
+
+        def sync_one(index, host, key, url):
+            result = {"repo": key, "status": "failed", "seconds": 0.0, "bytes": 0, "error": ""}
+            child = job.child(key, on_status=(lambda msg: on_status(key, msg)) if on_status else (lambda msg: None))
+            start = time.monotonic()
+            with host_limits[host]:
+                self.cache.pin(key)
+                try:
+                    child.check_cancelled()
+                    job.post(on_status or (lambda *a: None), key, "connecting")
+                    with child.span(key, "repo sync", repo=key):
+                        _, pushed = upload_batch(child, self.cache, key, url, items, target_rel, config,
+                                                 env=self.env, commit_msg=commit_msg, journal=self.journal,
+                                                 index=self.index)
+                    result["status"] = "pushed" if pushed else "unchanged"
+                except JobCancelled:
+                    result["status"] = "cancelled"
+                except GitzillaError as e:
+                    result["error"] = e.message
+                except subprocess.CalledProcessError as e:
+                    result["error"] = (e.stderr or "").strip() or str(e)
+                except Exception as e:
+                    result["error"] = str(e)
+                finally:
+                    self.cache.unpin(key)
+            result["seconds"] = round(time.monotonic() - start, 3)
+            result["bytes"] = child.bytes_transferred
+            results[index] = result
+            with lock:
+                finished[0] += 1
+                job.progress(100.0 * finished[0] / len(targets))
+            if on_result:
+                job.post(on_result, result)
+
+        workers = max(1, min(int(config["multi_workers"]), len(targets)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gitzilla-multi") as pool:
+            for future in [pool.submit(sync_one, i, *target) for i, target in enumerate(targets)]:
+                future.result()
+        return results
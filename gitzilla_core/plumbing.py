@@ -0,0 +1,278 @@
+"""
+Upload engine built on git plumbing, for bare and partial repositories. New
+blobs are hashed straight from the source files, only the trees along the
+target paths are rewritten (mktree), the commit is made with commit-tree and
+pushed by SHA. There is no working tree and no index, so the cost grows with
+the depth of the target path rather than the size of the repository. Files
+that .gitattributes text/eol rules convert are hashed against a scratch
+work tree holding just those .gitattributes files.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from .config import DEFAULT_CONFIG
+from .dedup import unchanged_items
+from .jobs import GitzillaError
+from .lfs import LFS_POINTER, add_lfs_rules, lfs_attr_pattern, lfs_store_for, sha256_file, upload_lfs_objects
+from .progress import format_size
+from .push import current_branch, push_with_retry
+from .tree import TreeCache, build_tree, nest_changes, replay_changes
+from .upload import default_commit_message
+
+
+def _check_rel_path(rel):
+    parts = rel.split("/")
+    if not rel or any(part in ("", ".", "..", ".git") for part in parts):
+        raise GitzillaError("Invalid Path", f"Invalid path in repository: {rel!r}")
+    return parts
+
+
+def _attribute_files(job, repo_dir, trees, root, rel_paths, env):
+    """(repo-relative path, mode, blob SHA) of the .gitattributes files that apply to rel_paths."""
+    found = []
+    folders = {""}
+    for rel in rel_paths:
+        parts = rel.split("/")[:-1]
+        folders.update("/".join(parts[:k]) for k in range(1, len(parts) + 1))
+    for folder in sorted(folders):
+        tree_sha = trees.lookup(job, repo_dir, root, folder, env=env) if root else None
+        if tree_sha is None:
+            continue
+        for entry in trees.entries(job, repo_dir, tree_sha, env=env):
+            if entry.name == ".gitattributes" and entry.type == "blob":
+                found.append((f"{folder + '/' if folder else ''}.gitattributes", entry.mode, entry.sha))
+    return found
+
+
+def _attributes_index(job, repo_dir, trees, root, rel_paths, env, index_file):
+    """
+    Write a temporary index holding only the .gitattributes files that apply to
+    rel_paths, so "check-attr --cached" can answer without a full index.
+    """
+    lines = [f"{mode} {sha}\t{rel}" for rel, mode, sha in _attribute_files(job, repo_dir, trees, root, rel_paths, env)]
+    env = dict(env or os.environ, GIT_INDEX_FILE=str(index_file))
+    job.run(["git", "update-index", "--add", "-z", "--index-info"], env=env, cwd=repo_dir,
+            input="\0".join(lines) + "\0" if lines else "")
+    return env
+
+
+# Attributes that make "git add" convert a file's content on the way in
+CONVERT_ATTRS = ["text", "eol", "crlf", "ident", "working-tree-encoding"]
+
+
+def _hash_files(job, repo_dir, trees, root, entries, env):
+    """
+    Hash each (rel_path, source) into the object store as "git add" would at
+    rel_path, so text/eol rules in .gitattributes (and core.autocrlf) convert
+    it the same way as in a working clone. Returns the blob SHAs in order.
+    Files no rule converts are hashed as they are in one batch; the others
+    one by one against a scratch work tree that holds only the .gitattributes
+    files, since a bare repository reads attributes from nowhere else.
+    """
+    try:
+        autocrlf = job.run(["git", "config", "--get", "core.autocrlf"], env=env, cwd=repo_dir).stdout.strip()
+    except subprocess.CalledProcessError:
+        autocrlf = ""
+    rel_paths = [rel for rel, _ in entries]
+    attribute_files = _attribute_files(job, repo_dir, trees, root, rel_paths, env)
+    converted = set()
+    scratch = tempfile.mkdtemp(prefix="gitzilla_attr_")
+    try:
+        if attribute_files or autocrlf in ("true", "input"):
+            for rel, _, sha in attribute_files:
+                path = os.path.join(scratch, *rel.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(job.run(["git", "cat-file", "blob", sha], env=env, cwd=repo_dir, text=False).stdout)
+            work_env = dict(env or os.environ, GIT_DIR=os.path.abspath(repo_dir), GIT_WORK_TREE=scratch)
+            if autocrlf in ("true", "input"):
+                converted = set(range(len(entries)))
+            else:
+                proc = job.run(["git", "check-attr", "-z", "--stdin"] + CONVERT_ATTRS, env=work_env, cwd=scratch,
+                               input="\0".join(rel_paths) + "\0")
+                fields = proc.stdout.split("\0")
+                marked = {fields[i] for i in range(0, len(fields) - 2, 3) if fields[i + 2] != "unspecified"}
+                converted = {k for k, rel in enumerate(rel_paths) if rel in marked}
+        shas = [None] * len(entries)
+        plain = [k for k in range(len(entries)) if k not in converted]
+        if plain:
+            proc = job.run(["git", "hash-object", "-w", "--no-filters", "--stdin-paths"], env=env, cwd=repo_dir,
+                           input="".join(f"{os.path.abspath(entries[k][1])}\n" for k in plain))
+            for k, sha in zip(plain, proc.stdout.split()):
+                shas[k] = sha
+        for k in sorted(converted):
+            rel, source = entries[k]
+            shas[k] = job.run(["git", "hash-object", "-w", f"--path={rel}", "--", os.path.abspath(source)],
+                              env=work_env, cwd=scratch).stdout.strip()
+        return shas
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _lfs_routes(job, repo_dir, trees, root, items, rel_paths, config, env):
+    """Like lfs.lfs_routes, reading .gitattributes from the commit instead of a checkout."""
+    threshold = float(config.get("lfs_threshold_mb") or 0) * 1024 * 1024
+    extensions = {e.lower() if e.startswith(".") else "." + e.lower() for e in config.get("lfs_extensions") or []}
+    routed = set()
+    for n, item in enumerate(items):
+        if (threshold and item.size >= threshold) or item.source.suffix.lower() in extensions:
+            routed.add(n)
+    index_file = os.path.join(repo_dir, f"gitzilla-attr-{os.getpid()}.index")
+    try:
+        attr_env = _attributes_index(job, repo_dir, trees, root, rel_paths, env, index_file)
+        proc = job.run(["git", "check-attr", "--cached", "-z", "--stdin", "filter"], env=attr_env, cwd=repo_dir,
+                       input="\0".join(rel_paths) + "\0")
+    finally:
+        if os.path.exists(index_file):
+            os.unlink(index_file)
+    fields = proc.stdout.split("\0")
+    tracked = {fields[i] for i in range(0, len(fields) - 2, 3) if fields[i + 2] == "lfs"}
+    routed.update(n for n, rel in enumerate(rel_paths) if rel in tracked)
+    return routed
+
+
+def replay_commit(job, repo_dir, commit, branch, env=None, trees=None):
+    """
+    Fetch the remote tip of branch into repo_dir and re-apply the changes of
+    commit on top of it, the way upload_plumbing would have built it there.
+    Returns the new commit. Used when a push is rejected as non-fast-forward.
+    """
+    job.status("Remote branch moved on; fetching the new tip...")
+    job.stream(["git", "fetch", "--progress", "--filter=blob:none", "--depth", "1", "origin", f"+{branch}:{branch}"],
+               "fetch", env=env, cwd=repo_dir)
+    parent = job.run(["git", "rev-parse", "--verify", "-q", branch], env=env, cwd=repo_dir).stdout.strip()
+    return replay_changes(job, repo_dir, commit, parent, env=env, trees=trees)
+
+
+def upload_plumbing(job, repo_dir, items, target_rel="", config=None, env=None, commit_msg=None, on_state=None,
+                    trees=None, on_commit=None, index=None):
+    """
+    Commit items under target_rel on top of repo_dir's HEAD and push the commit
+    to the same branch of origin. repo_dir is usually the bare repository from
+    CloneCache.browse(). Same contract as upload.upload_to_clone: returns
+    True once pushed, False if nothing changed, and on_commit(commit, branch)
+    is called right before the push. A push that loses a race is replayed onto the
+    new remote tip and retried (push.push_with_retry). With a ContentIndex,
+    files already committed with the same content are skipped unhashed.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    on_state = on_state or (lambda n, state: None)
+    commit_msg = commit_msg or default_commit_message(items)
+    trees = trees or TreeCache()
+    total_bytes = sum(item.size for item in items) or 1
+    rel_paths = ["/".join(part for part in (target_rel, item.dest) if part) for item in items]
+    for rel in rel_paths:
+        _check_rel_path(rel)
+
+    try:
+        branch = current_branch(job, repo_dir, env=env)
+        try:
+            parent = job.run(["git", "rev-parse", "--verify", "-q", "HEAD"], env=env, cwd=repo_dir).stdout.strip()
+        except subprocess.CalledProcessError:
+            parent = None  # empty repository: this is the first commit
+        root = trees.root(job, repo_dir, env=env) if parent else None
+
+        # Decide which files go through LFS
+        lfs = _lfs_routes(job, repo_dir, trees, root, items, rel_paths, config, env)
+        same, digests = set(), {}
+        if index is not None:
+            same, digests = unchanged_items(job, repo_dir, items, rel_paths, lfs, index, env=env, trees=trees)
+            for n in sorted(same):
+                on_state(n, "unchanged")
+            if len(same) == len(items):
+                return False
+            lfs -= same
+        todo = [n for n in range(len(items)) if n not in same]
+        plain = [n for n in todo if n not in lfs]
+        blobs = {}
+
+        # Hash plain files straight from their source (0-20% of the bar, by bytes)
+        if plain:
+            job.status(f"Hashing {len(plain)} file(s)...")
+            shas = _hash_files(job, repo_dir, trees, root, [(rel_paths[n], items[n].source) for n in plain], env)
+            done = 0
+            for n, sha in zip(plain, shas):
+                source = items[n].source
+                mode = "100755" if os.name != "nt" and os.access(source, os.X_OK) else "100644"
+                blobs[rel_paths[n]] = (mode, sha)
+                done += items[n].size
+                on_state(n, "hashed")
+            job.progress(20 * done / total_bytes)
+
+        # LFS files: commit pointers in their place and track them in .gitattributes
+        lfs_objects = []
+        if lfs:
+            patterns = []
+            for n in sorted(lfs):
+                item = items[n]
+                job.status(f"Hashing for LFS: {item.dest}")
+                if n in digests:
+                    oid = digests[n][0]
+                else:
+                    oid = sha256_file(item.source, on_progress=lambda done: job.progress(20 * done / total_bytes))
+                lfs_objects.append({"oid": oid, "size": item.size, "source": item.source})
+                pointer = LFS_POINTER.format(oid=oid, size=item.size).encode()
+                sha = job.run(["git", "hash-object", "-w", "--stdin", "--no-filters"], env=env, cwd=repo_dir,
+                              input=pointer, text=False).stdout.decode().strip()
+                blobs[rel_paths[n]] = ("100644", sha)
+                patterns.append(lfs_attr_pattern(rel_paths[n]))
+                on_state(n, "lfs")
+            attributes = ""
+            if root is not None:
+                for entry in trees.entries(job, repo_dir, root, env=env):
+                    if entry.name == ".gitattributes" and entry.type == "blob":
+                        attributes = job.run(["git", "cat-file", "blob", entry.sha], env=env, cwd=repo_dir).stdout
+            new_attributes = add_lfs_rules(attributes, patterns)
+            if new_attributes != attributes:
+                sha = job.run(["git", "hash-object", "-w", "--stdin", "--no-filters"], env=env, cwd=repo_dir,
+                              input=new_attributes).stdout.strip()
+                blobs[".gitattributes"] = ("100644", sha)
+
+        # Rewrite only the trees along the changed paths
+        job.status("Building commit...")
+        new_root = build_tree(job, repo_dir, trees, root, nest_changes(blobs), env)
+        job.progress(25)
+        if new_root == root:
+            return False
+
+        commit_cmd = ["git", "commit-tree", new_root, "-m", commit_msg]
+        if parent:
+            commit_cmd += ["-p", parent]
+        commit = job.run(commit_cmd, env=env, cwd=repo_dir).stdout.strip()
+        for n in todo:
+            on_state(n, "committed")
+        job.progress(30)
+
+        # LFS content has to be on the server before the pointers are pushed
+        if lfs_objects:
+            remote_url = job.run(["git", "config", "--get", "remote.origin.url"],
+                                 env=env, cwd=repo_dir).stdout.strip()
+            store = lfs_store_for(job, remote_url, config, env=env)
+
+            def on_lfs_progress(done_bytes, total, done_count, total_count):
+                job.status(f"Uploading LFS objects: {done_count}/{total_count}, "
+                           f"{format_size(done_bytes)} of {format_size(total)}")
+                job.progress(30 + 60 * done_bytes / (total or 1))
+
+            job.bytes_transferred += upload_lfs_objects(
+                job, store, lfs_objects, config["lfs_concurrency"], on_progress=on_lfs_progress
+            )
+
+        if on_commit:
+            on_commit(commit, branch)
+
+        # Push the commit by SHA, then move the local branch to it
+        commit = push_with_retry(job, repo_dir, commit, branch,
+                                 lambda: replay_commit(job, repo_dir, commit, branch, env=env, trees=trees),
+                                 config, env=env, operation="upload_lfs" if lfs_objects else "upload")
+        job.run(["git", "update-ref", branch, commit], env=env, cwd=repo_dir)
+        job.progress(100)
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Git Error", f"Error during Git operations:\n{error_output}")
+    for n in todo:
+        on_state(n, "pushed")
+    return True
@@ -0,0 +1,78 @@
+"""
+Parsing and formatting of git --progress output. git writes progress to
+stderr, separated by \\r while a phase is running and \\n when it finishes:
+
+    Receiving objects:  45% (450/1000), 1.20 MiB | 2.40 MiB/s
+    Resolving deltas: 100% (10/10), done.
+"""
+
+import re
+from collections import namedtuple
+
+
+GitProgress = namedtuple("GitProgress", "phase percent done total bytes rate eta")
+
+_PROGRESS_RE = re.compile(
+    r"^(?:remote:\s*)?(?P<phase>[A-Z][A-Za-z ]+?):\s+(?P<percent>\d+)%\s+\((?P<done>\d+)/(?P<total>\d+)\)"
+    r"(?:,\s+(?P<bytes>[\d.]+)\s+(?P<bunit>bytes|[KMGT]iB))?"
+    r"(?:\s+\|\s+(?P<rate>[\d.]+)\s+(?P<runit>bytes|[KMGT]iB)/s)?"
+)
+_UNITS = {"bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "TiB": 1024 ** 4}
+
+# Share of the overall progress bar taken by each phase, per operation.
+PROGRESS_PHASES = {
+    "clone": {"Receiving objects": (0, 85), "Resolving deltas": (85, 95), "Updating files": (95, 100)},
+    "fetch": {"Receiving objects": (0, 90), "Resolving deltas": (90, 100)},
+    "push": {"Compressing objects": (0, 10), "Writing objects": (10, 100)},
+    # Upload: copying takes 0-20%, add + commit 20-30%, then the push.
+    "upload": {"Compressing objects": (30, 40), "Writing objects": (40, 100)},
+    # Same with LFS objects, which are uploaded in 30-90% before the (small) push.
+    "upload_lfs": {"Compressing objects": (90, 92), "Writing objects": (92, 100)},
+}
+
+
+def parse_git_progress(line):
+    """Parse one git --progress line into a GitProgress, or None if it is not a progress line."""
+    m = _PROGRESS_RE.match(line.strip())
+    if not m:
+        return None
+    percent = int(m.group("percent"))
+    done, total = int(m.group("done")), int(m.group("total"))
+    nbytes = rate = eta = None
+    if m.group("bytes"):
+        nbytes = int(float(m.group("bytes")) * _UNITS[m.group("bunit")])
+    if m.group("rate"):
+        rate = float(m.group("rate")) * _UNITS[m.group("runit")]
+    if nbytes and rate and 0 < done < total:
+        # Assume the remaining objects average the same size as the ones received so far.
+        eta = (nbytes * total / done - nbytes) / rate
+    return GitProgress(m.group("phase"), percent, done, total, nbytes, rate, eta)
+
+
+def overall_percent(operation, progress):
+    """Map a phase-local GitProgress onto 0-100 for the whole operation, or None for untracked phases."""
+    span = PROGRESS_PHASES.get(operation, {}).get(progress.phase)
+    if span is None:
+        return None
+    start, end = span
+    return start + (end - start) * progress.percent / 100.0
+
+
+def format_size(nbytes):
+    for unit in ("bytes", "KiB", "MiB", "GiB"):
+        if nbytes < 1024 or unit == "GiB":
+            return f"{nbytes:.0f} {unit}" if unit == "bytes" else f"{nbytes:.2f} {unit}"
+        nbytes /= 1024.0
+
+
+def format_progress(progress):
+    """Human readable status line for a GitProgress."""
+    text = f"{progress.phase}: {progress.percent}% ({progress.done}/{progress.total})"
+    if progress.bytes is not None:
+        text += f", {format_size(progress.bytes)}"
+    if progress.rate is not None:
+        text += f" | {format_size(progress.rate)}/s"
+    if progress.eta is not None:
+        minutes, seconds = divmod(int(progress.eta), 60)
+        text += f", ETA {minutes}:{seconds:02d}"
+    return text
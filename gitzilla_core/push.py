@@ -0,0 +1,109 @@
+"""
+Pushing with retries. A push rejected because the branch moved on is replayed
+on top of the new tip (fetch + replay) and pushed again; a push that failed
+on the network is retried after an exponential backoff with jitter. Anything
+else (hooks, protected branches, permissions) fails straight away.
+"""
+
+import re
+import random
+import subprocess
+
+from .config import DEFAULT_CONFIG
+from .jobs import GitzillaError
+from .tree import replay_changes
+
+# git/ssh messages for a push that lost the race against another push
+REJECTED_RE = re.compile(
+    r"\[rejected\].*\((fetch first|non-fast-forward)\)|\[remote rejected\].*(cannot lock ref|incorrect old value)"
+)
+# ... and for failures that are worth another try as they are
+TRANSIENT_RE = re.compile(
+    r"Connection (reset|refused|closed|timed out)|Operation timed out|Could not resolve host(name)?|"
+    r"Network is unreachable|Temporary failure in name resolution|early EOF|unexpected disconnect|"
+    r"remote end hung up unexpectedly|Broken pipe|kex_exchange_identification|ssh_exchange_identification|"
+    r"RPC failed",
+    re.IGNORECASE
+)
+
+
+def classify_push_error(e):
+    """"rejected", "transient" or None (permanent) for a failed push or fetch."""
+    stderr = e.stderr or ""
+    if REJECTED_RE.search(stderr):
+        return "rejected"
+    if TRANSIENT_RE.search(stderr):
+        return "transient"
+    return None
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def current_branch(job, repo_dir, env=None):
+    """Full ref name of the branch HEAD points to, e.g. refs/heads/main."""
+    return job.run(["git", "symbolic-ref", "HEAD"], env=env, cwd=repo_dir).stdout.strip()
+
+
+def rebase_clone(job, clone_dir, branch, env=None, trees=None):
+    """
+    Fetch branch and replay the local commits onto it; the uploaded version of
+    a file wins where both sides changed it. Returns the new HEAD. The commits
+    are rebuilt from their trees (tree.replay_changes) rather than with
+    "git rebase", which refuses to run while files uploaded in place or as LFS
+    pointers exist only in the index and so look deleted in the working tree.
+    """
+    name = branch[len("refs/heads/"):] if branch.startswith("refs/heads/") else branch
+    upstream = f"refs/remotes/origin/{name}"
+    job.status("Remote branch moved on; fetching and replaying the upload...")
+    job.stream(["git", "fetch", "--progress", "origin", f"+{branch}:{upstream}"], "fetch", env=env, cwd=clone_dir)
+    tip = job.run(["git", "rev-parse", "--verify", "-q", upstream], env=env, cwd=clone_dir).stdout.strip()
+    local = job.run(["git", "rev-list", "--reverse", "--no-merges", f"{upstream}..HEAD"],
+                    env=env, cwd=clone_dir).stdout.split()
+    head = tip
+    for commit in local:
+        head = replay_changes(job, clone_dir, commit, head, env=env, trees=trees)
+    try:
+        # --keep: move index and working tree to the new commit, updating only the
+        # files that differ; files missing from the working tree are left missing
+        job.run(["git", "reset", "-q", "--keep", head], env=env, cwd=clone_dir)
+    except subprocess.CalledProcessError as e:
+        error_output = (e.stderr or e.stdout or "").strip() or "No error output."
+        raise GitzillaError("Push Rejected",
+                            f"The remote branch changed and the upload could not be replayed onto it:\n{error_output}")
+    return head
+
+
+def push_with_retry(job, repo_dir, commit, branch, rebase, config=None, env=None, operation="upload"):
+    """
+    Push commit to branch (a full ref name) of origin. When the push is
+    rejected as non-fast-forward, rebase() must replay the commit onto the
+    fetched remote tip and return the new commit to push. Transient failures
+    are retried after a backoff. Returns the commit that was pushed; raises
+    the last CalledProcessError once config["push_retries"] retries are used up.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    retries = max(0, int(config["push_retries"]))
+    attempt = 0
+    stale = False
+    while True:
+        try:
+            if stale:
+                commit = rebase()
+                stale = False
+            job.stream(["git", "push", "--progress", "origin", f"{commit}:{branch}"], operation, env=env, cwd=repo_dir)
+            return commit
+        except subprocess.CalledProcessError as e:
+            kind = classify_push_error(e)
+            if kind is None or attempt >= retries:
+                raise
+            attempt += 1
+            if kind == "rejected":
+                stale = True  # the branch moved on: replay the commit on top of it and push again
+                continue
+            delay = backoff_delay(attempt - 1, float(config["push_backoff_s"]), float(config["push_backoff_max_s"]))
+            job.status(f"{TRANSIENT_RE.search(e.stderr).group(0)}; retry {attempt}/{retries} in {delay:.1f}s...")
+            if job.cancel_event.wait(delay):
+                job.check_cancelled()
@@ -0,0 +1,101 @@
+"""
+Deleting large directories without waiting for it. A directory to delete is
+first renamed into a trash folder on the same filesystem, which is instant,
+and then removed by a background thread. Whatever is still in the trash when
+the process exits (or crashes) is picked up by the next session's sweep().
+"""
+
+import os
+import time
+import uuid
+import queue
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+# Temp clones made by Gitzilla versions before the clone cache; any still
+# around are leftovers of a session that crashed before it could remove them.
+STALE_TEMP_PREFIXES = ("gitzilla_clone_",)
+STALE_TEMP_AGE = 3600  # seconds; younger ones may belong to a session still running
+
+
+class Reaper:
+    """Moves directories into trash_dir and deletes them on a daemon thread."""
+
+    def __init__(self, trash_dir):
+        self.trash_dir = Path(trash_dir)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def discard(self, path):
+        """
+        Get path out of the way at once and delete it in the background. Falls
+        back to deleting it in place (still in the background) if it can't be
+        renamed, e.g. across filesystems.
+        """
+        path = Path(path)
+        if not os.path.lexists(path):
+            return
+        try:
+            self.trash_dir.mkdir(parents=True, exist_ok=True)
+            target = self.trash_dir / f"{path.name}-{uuid.uuid4().hex[:8]}"
+            os.replace(path, target)
+        except OSError:
+            target = path
+        self._put(target)
+
+    def sweep(self, temp_dir=None):
+        """Queue what earlier sessions left behind: the trash and stale temp clones."""
+        try:
+            for entry in os.scandir(self.trash_dir):
+                self._put(Path(entry.path))
+        except OSError:
+            pass
+        temp_dir = temp_dir or tempfile.gettempdir()
+        try:
+            entries = list(os.scandir(temp_dir))
+        except OSError:
+            return
+        now = time.time()
+        for entry in entries:
+            try:
+                if (entry.name.startswith(STALE_TEMP_PREFIXES) and entry.is_dir(follow_symlinks=False)
+                        and now - entry.stat(follow_symlinks=False).st_mtime > STALE_TEMP_AGE):
+                    self.discard(entry.path)
+            except OSError:
+                pass
+
+    def wait(self, timeout=None):
+        """Wait until everything queued is deleted, at most timeout seconds. Returns True if it all went."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _put(self, path):
+        self._queue.put(path)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="gitzilla-reaper", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass  # queued twice, e.g. by remove() and then sweep()
+            except OSError as e:
+                print(f"Error deleting {path}: {str(e)}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,72 @@
+"""
+SSH settings for git subprocesses. A session shares one multiplexed
+connection per host (OpenSSH ControlMaster) between every clone, fetch, push
+and git-lfs-authenticate call, so only the first one pays for the TCP and SSH
+handshake and the key signature.
+"""
+
+import os
+import shutil
+import time
+import tempfile
+import subprocess
+from pathlib import Path
+
+
+def git_ssh_env(priv_key, base=None, control_dir=None, control_persist=600):
+    """
+    Environment for git subprocesses: GIT_SSH_COMMAND uses priv_key and, given
+    control_dir, multiplexes connections through sockets in that directory.
+    """
+    git_env = dict(os.environ if base is None else base)
+    ssh_cmd = f'ssh -i "{priv_key}" -o IdentitiesOnly=yes -o StrictHostKeyChecking=no'
+    if control_dir is not None:
+        # %C hashes host, port and user, keeping the socket path short
+        ssh_cmd += (f' -o ControlMaster=auto -o ControlPersist={int(control_persist)}'
+                    f' -o ControlPath="{Path(control_dir) / "%C"}"')
+    git_env["GIT_SSH_COMMAND"] = ssh_cmd
+    return git_env
+
+
+class SshSession:
+    """
+    Per-session ControlMaster socket directory. Masters are started on demand by
+    the first connection to each host, idle out after control_persist seconds,
+    and are all shut down by close().
+    """
+
+    def __init__(self, enabled=True, control_persist=600):
+        self.control_persist = control_persist
+        self.control_dir = None
+        # The Windows OpenSSH port has no ControlMaster support
+        if enabled and os.name != "nt":
+            # Sockets live in the system temp dir: unix socket paths are limited to ~100 bytes
+            self.control_dir = Path(tempfile.mkdtemp(prefix="gitzilla_ssh_"))
+
+    def env(self, priv_key, base=None):
+        return git_ssh_env(priv_key, base, self.control_dir, self.control_persist)
+
+    def close(self):
+        """Stop every master connection of this session and remove the socket directory."""
+        if self.control_dir is None:
+            return
+        # All masters are asked to exit at once, so closing takes at most 5 seconds however many there are
+        procs = []
+        for socket_path in self.control_dir.iterdir():
+            try:
+                # The ControlPath names the socket itself, so the host argument is unused
+                procs.append(subprocess.Popen(
+                    ["ssh", "-o", f"ControlPath={socket_path}", "-O", "exit", "gitzilla"],
+                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                ))
+            except OSError as e:
+                print(f"Error closing SSH connection: {str(e)}")
+        deadline = time.monotonic() + 5
+        for proc in procs:
+            try:
+                proc.wait(timeout=max(0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                print("Error closing SSH connection: timed out")
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+        self.control_dir = None
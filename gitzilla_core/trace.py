@@ -0,0 +1,205 @@
+"""
+Timing spans for Gitzilla's phases. Every job is a span and so is every git/ssh
+subprocess it runs, labelled with the phase the command belongs to (clone,
+fetch, listdir, add, commit, push, ...) and carrying wall time, bytes moved
+and the exit code. Finished spans go to a JSON-lines log and a Chrome
+trace-event file (open it in chrome://tracing or https://ui.perfetto.dev),
+and a rolling window per phase answers percentile queries for the GUI.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from pathlib import Path
+
+from .config import DEFAULT_CONFIG
+
+# Phase of a git subcommand; anything else is "git"
+GIT_PHASES = {
+    "clone": "clone",
+    "fetch": "fetch",
+    "ls-remote": "ssh",
+    "ls-tree": "listdir",
+    "add": "add",
+    "update-index": "add",
+    "hash-object": "add",
+    "commit": "commit",
+    "commit-tree": "commit",
+    "mktree": "commit",
+    "push": "push",
+    "rebase": "rebase",
+}
+_GIT_OPTIONS_WITH_VALUE = ("-c", "-C", "--git-dir", "--work-tree")
+
+
+def command_name(cmd):
+    """Short name of a subprocess command line: "git push", "ssh-keygen"."""
+    program = os.path.basename(cmd[0]) if cmd else "process"
+    if program == "git":
+        args = iter(cmd[1:])
+        for arg in args:
+            if arg in _GIT_OPTIONS_WITH_VALUE:
+                next(args, None)
+            elif not arg.startswith("-"):
+                return f"git {arg}"
+    return program
+
+
+def command_phase(cmd):
+    """Phase a subprocess command line belongs to."""
+    name = command_name(cmd)
+    if name.startswith("git "):
+        return GIT_PHASES.get(name[len("git "):], "git")
+    return {"ssh-keygen": "keygen", "ssh": "ssh"}.get(name, name)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class Span:
+    """One timed operation; attrs holds bytes, exit_code, cmd, repo and the like."""
+
+    def __init__(self, tracer, name, phase, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.phase = phase
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._t0
+        if exc is not None:
+            self.attrs.setdefault("error", exc_type.__name__)
+            if getattr(exc, "returncode", None) is not None:
+                self.attrs.setdefault("exit_code", exc.returncode)
+        self.tracer._finish(self)
+        return False
+
+
+class _NoSpan:
+    """Stand-in when there is no tracer."""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Collects finished spans. log_path (JSON lines) and chrome_path (Chrome
+    trace events) are written as spans finish, so a crash loses nothing;
+    close() completes the Chrome file. window is the number of recent
+    durations kept per phase for percentiles.
+    """
+
+    def __init__(self, log_path=None, chrome_path=None, window=500):
+        self.window = window
+        self.log_path = Path(log_path) if log_path else None
+        self.chrome_path = Path(chrome_path) if chrome_path else None
+        self._durations = {}
+        self._lock = threading.Lock()
+        self._log = self._chrome = None
+        self._threads = set()
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+        if self.log_path:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.log_path, "a")
+        if self.chrome_path:
+            self.chrome_path.parent.mkdir(parents=True, exist_ok=True)
+            # The array form may be left unterminated, so a killed process still leaves a readable trace
+            self._chrome = open(self.chrome_path, "w")
+            self._chrome.write("[")
+            self._chrome_first = True
+
+    @classmethod
+    def from_config(cls, config, window=500):
+        """A tracer writing under trace_dir if config["trace"] is set, else one that only keeps percentiles."""
+        if not config.get("trace"):
+            return cls(window=window)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        trace_dir = Path(config.get("trace_dir") or DEFAULT_CONFIG["trace_dir"]).expanduser()
+        base = trace_dir / f"gitzilla-{stamp}-{os.getpid()}"
+        return cls(f"{base}.jsonl", f"{base}.trace.json", window=window)
+
+    def span(self, name, phase=None, **attrs):
+        """Context manager timing one operation: "with tracer.span("copy", bytes=n) as span: ..."."""
+        return Span(self, name, phase or name, attrs)
+
+    def _finish(self, span):
+        thread = threading.current_thread()
+        record = {
+            "name": span.name,
+            "phase": span.phase,
+            "start": round(span.start, 6),
+            "seconds": round(span.duration, 6),
+            "thread": thread.name,
+        }
+        record.update(span.attrs)
+        with self._lock:
+            durations = self._durations.get(span.phase)
+            if durations is None:
+                durations = self._durations[span.phase] = deque(maxlen=self.window)
+            durations.append(span.duration)
+            if self._log is not None:
+                self._log.write(json.dumps(record, default=str) + "\n")
+                self._log.flush()
+            if self._chrome is not None:
+                events = []
+                if thread.ident not in self._threads:
+                    self._threads.add(thread.ident)
+                    events.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": thread.ident,
+                                   "args": {"name": thread.name}})
+                end = time.perf_counter() - self._t0
+                events.append({
+                    "name": span.name, "cat": span.phase, "ph": "X", "pid": self._pid, "tid": thread.ident,
+                    "ts": round((end - span.duration) * 1e6), "dur": round(span.duration * 1e6),
+                    "args": span.attrs,
+                })
+                for event in events:
+                    self._chrome.write(("\n" if self._chrome_first else ",\n") + json.dumps(event, default=str))
+                    self._chrome_first = False
+                self._chrome.flush()
+
+    def stats(self):
+        """{phase: {"count", "p50", "p90", "p99", "max"}} over each phase's recent spans, in seconds."""
+        with self._lock:
+            snapshot = {phase: sorted(values) for phase, values in self._durations.items()}
+        return {
+            phase: {"count": len(values), "p50": percentile(values, 50), "p90": percentile(values, 90),
+                    "p99": percentile(values, 99), "max": values[-1]}
+            for phase, values in snapshot.items() if values
+        }
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if self._chrome is not None:
+                self._chrome.write("\n]\n")
+                self._chrome.close()
+                self._chrome = None
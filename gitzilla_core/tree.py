@@ -0,0 +1,177 @@
+"""
+Repository folder browsing straight from git objects. Listings come from
+"git ls-tree" one tree at a time, as folders are opened, so neither a checkout
+nor a walk of the whole repository is needed. Trees are content-addressed, so
+a listing cached under its tree SHA never goes stale. The same listings are
+used to write new trees with mktree, changing only the folders along the
+changed paths.
+"""
+
+import threading
+import subprocess
+from collections import OrderedDict, namedtuple
+
+from .jobs import GitzillaError
+from .lfs import add_lfs_rules, added_lfs_rules
+
+TreeEntry = namedtuple("TreeEntry", "mode type sha name")
+
+EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+
+class TreeCache:
+    """ls-tree listings keyed by tree SHA, least recently used dropped first."""
+
+    MAX_TREES = 4096
+
+    def __init__(self, max_trees=MAX_TREES):
+        self.max_trees = max_trees
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def root(self, job, repo_dir, rev="HEAD", env=None):
+        """SHA of the root tree of rev, or None if there is no such commit (e.g. an empty repository)."""
+        try:
+            proc = job.run(["git", "rev-parse", "--verify", "-q", f"{rev}^{{tree}}"], env=env, cwd=repo_dir)
+        except subprocess.CalledProcessError:
+            return None
+        return proc.stdout.strip()
+
+    def entries(self, job, repo_dir, tree_sha, env=None):
+        """Entries of one tree, as TreeEntry tuples in git order."""
+        with self._lock:
+            entries = self._trees.get(tree_sha)
+            if entries is not None:
+                self._trees.move_to_end(tree_sha)
+                return entries
+        proc = job.run(["git", "ls-tree", "-z", tree_sha], env=env, cwd=repo_dir)
+        entries = []
+        for record in proc.stdout.split("\0"):
+            if not record:
+                continue
+            info, name = record.split("\t", 1)
+            mode, obj_type, sha = info.split(" ")
+            entries.append(TreeEntry(mode, obj_type, sha, name))
+        entries = tuple(entries)
+        with self._lock:
+            self._trees[tree_sha] = entries
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return entries
+
+    def folders(self, job, repo_dir, tree_sha, env=None):
+        """Sub-folders of one tree as sorted (name, tree SHA) pairs."""
+        return sorted((e.name, e.sha) for e in self.entries(job, repo_dir, tree_sha, env) if e.type == "tree")
+
+    def lookup(self, job, repo_dir, tree_sha, rel_path, env=None):
+        """SHA of the tree at rel_path below tree_sha, or None if that folder doesn't exist."""
+        for part in [p for p in rel_path.split("/") if p]:
+            for entry in self.entries(job, repo_dir, tree_sha, env):
+                if entry.name == part and entry.type == "tree":
+                    tree_sha = entry.sha
+                    break
+            else:
+                return None
+        return tree_sha
+
+
+def nest_changes(blobs):
+    """{"a/b/c": change} -> {"a": {"b": {"c": change}}}"""
+    changes = {}
+    for rel, change in blobs.items():
+        *folders, name = rel.split("/")
+        level = changes
+        for folder in folders:
+            level = level.setdefault(folder, {})
+        level[name] = change
+    return changes
+
+
+def build_tree(job, repo_dir, trees, tree_sha, changes, env, prefix=""):
+    """
+    Return the SHA of tree_sha (None for a new folder) with changes applied.
+    changes maps a name to (mode, blob SHA) for a file, to None to delete it
+    or to a nested dict for a folder. Untouched entries are reused as they are.
+    """
+    entries = {}
+    if tree_sha is not None:
+        for entry in trees.entries(job, repo_dir, tree_sha, env=env):
+            entries[entry.name] = (entry.mode, entry.type, entry.sha)
+    for name, change in changes.items():
+        if change is None:
+            entries.pop(name, None)
+        elif isinstance(change, dict):
+            existing = entries.get(name)
+            if existing is not None and existing[1] != "tree":
+                raise GitzillaError("Folder Creation Error", f"'{prefix}{name}' is a file in the repository.")
+            sub_sha = build_tree(job, repo_dir, trees, existing[2] if existing else None, change, env,
+                                 prefix=f"{prefix}{name}/")
+            if sub_sha == EMPTY_TREE:
+                entries.pop(name, None)
+            else:
+                entries[name] = ("040000", "tree", sub_sha)
+        else:
+            existing = entries.get(name)
+            if existing is not None and existing[1] == "tree":
+                raise GitzillaError("File Copy Error", f"'{prefix}{name}' is a folder in the repository.")
+            entries[name] = (change[0], "blob", change[1])
+    lines = [f"{mode} {obj_type} {sha}\t{name}" for name, (mode, obj_type, sha) in entries.items()]
+    # --missing: unchanged entries may be blobs a partial clone never downloaded
+    proc = job.run(["git", "mktree", "-z", "--missing"], env=env, cwd=repo_dir,
+                   input="\0".join(lines) + "\0" if lines else "")
+    return proc.stdout.strip()
+
+
+def _blob_text(job, repo_dir, sha, env):
+    if sha is None or not sha.strip("0"):
+        return ""
+    return job.run(["git", "cat-file", "blob", sha], env=env, cwd=repo_dir).stdout
+
+
+def replay_changes(job, repo_dir, commit, parent, env=None, trees=None):
+    """
+    Re-apply the changes commit made to its own parent on top of parent, as a
+    new commit with the same message; returns it, or parent itself when parent
+    already has them. Only trees are read and written, so it works without a
+    working tree, an index or the blobs of a partial clone. Where commit only
+    appended LFS rules to a .gitattributes, those rules are appended to
+    parent's version instead, so rules added upstream meanwhile are kept.
+    """
+    trees = trees or TreeCache()
+    # Tree-level diff only: it needs no blobs, so nothing is downloaded for it
+    proc = job.run(["git", "diff-tree", "-r", "-z", "--no-renames", "--root", "--no-commit-id", commit],
+                   env=env, cwd=repo_dir)
+    fields = proc.stdout.split("\0")
+    changes, attributes = {}, {}
+    for i in range(0, len(fields) - 1, 2):
+        _, new_mode, old_sha, new_sha, status = fields[i].lstrip(":").split(" ")
+        path = fields[i + 1]
+        changes[path] = None if status == "D" else (new_mode, new_sha)
+        if status != "D" and path.rpartition("/")[2] == ".gitattributes":
+            attributes[path] = (old_sha, new_sha)
+    parent_root = trees.root(job, repo_dir, rev=parent, env=env)
+    for path, (old_sha, new_sha) in attributes.items():
+        patterns = added_lfs_rules(_blob_text(job, repo_dir, old_sha, env), _blob_text(job, repo_dir, new_sha, env))
+        if patterns is None:
+            continue  # not Gitzilla's edit: the uploaded file wins like any other
+        folder = path.rpartition("/")[0]
+        tree_sha = trees.lookup(job, repo_dir, parent_root, folder, env=env) if parent_root else None
+        current = None
+        if tree_sha is not None:
+            for entry in trees.entries(job, repo_dir, tree_sha, env=env):
+                if entry.name == ".gitattributes" and entry.type == "blob":
+                    current = entry.sha
+        text = _blob_text(job, repo_dir, current, env)
+        merged = add_lfs_rules(text, patterns)
+        if current is not None and merged == text:
+            del changes[path]
+        else:
+            sha = job.run(["git", "hash-object", "-w", "--stdin", "--no-filters"], env=env, cwd=repo_dir,
+                          input=merged).stdout.strip()
+            changes[path] = ("100644", sha)
+    message = job.run(["git", "show", "-s", "--format=%B", commit], env=env, cwd=repo_dir).stdout
+    new_root = build_tree(job, repo_dir, trees, parent_root, nest_changes(changes), env)
+    if new_root == parent_root:
+        return parent  # parent already has these files, e.g. the commit itself was pushed
+    return job.run(["git", "commit-tree", new_root, "-p", parent, "-F", "-"], env=env, cwd=repo_dir,
+                   input=message).stdout.strip()
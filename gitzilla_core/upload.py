@@ -0,0 +1,248 @@
+"""Upload batches and the copy/stage/commit/push pipeline."""
+
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from .config import DEFAULT_CONFIG
+from .ingest import fast_copy, has_staged_changes, index_blobs, index_in_place, stage_paths
+from .jobs import GitzillaError
+from .lfs import (LFS_POINTER, ensure_lfs_attributes, lfs_attr_pattern, lfs_routes, lfs_store_for,
+                  sha256_file, upload_lfs_objects)
+from .progress import format_size
+from .push import current_branch, push_with_retry, rebase_clone
+from .cache import sparse_add
+from .dedup import unchanged_items
+
+
+class UploadItem:
+    """One local file queued for upload, with its destination relative to the target folder."""
+
+    DONE_STATES = ("pushed", "unchanged", "replaced")
+
+    def __init__(self, source, dest):
+        self.source = Path(source)
+        self.dest = dest  # posix-style path under the target folder
+        self.size = self.source.stat().st_size
+        self.state = "selected"
+
+    def label(self):
+        return f"[{self.state}] {self.dest}"
+
+
+def collect_upload_items(paths):
+    """
+    Expand files and directories into UploadItems. A directory is imported
+    recursively under its own name; .git folders inside it are skipped.
+    """
+    items = []
+    for p in paths:
+        p = Path(p)
+        if p.is_file():
+            items.append(UploadItem(p, p.name))
+        elif p.is_dir():
+            for root, dirs, files in os.walk(p):
+                dirs[:] = sorted(d for d in dirs if d != ".git")
+                rel_root = Path(root).relative_to(p.parent).as_posix()
+                for name in sorted(files):
+                    full = Path(root) / name
+                    if full.is_file():
+                        items.append(UploadItem(full, f"{rel_root}/{name}"))
+    return items
+
+
+def parse_dropped_paths(pieces):
+    """Turn drag-and-drop entries (plain paths or file:// URIs) into local paths."""
+    paths = []
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        if piece.startswith("file:"):
+            piece = unquote(urlparse(piece).path)
+            # file:///C:/dir -> C:/dir on Windows
+            if re.match(r"^/[A-Za-z]:", piece):
+                piece = piece[1:]
+        paths.append(piece)
+    return paths
+
+
+def default_commit_message(items):
+    if len(items) == 1:
+        return "Add file via Gitzilla"
+    return f"Add {len(items)} files via Gitzilla"
+
+
+def upload_to_clone(job, clone_dir, items, target_rel="", config=None, env=None, commit_msg=None, on_state=None,
+                    on_commit=None, index=None):
+    """
+    Put items into clone_dir under target_rel (repo-relative folder), commit
+    them as one commit and push. Returns True once pushed, False if the files
+    were already identical to what is committed. on_state(n, state) reports
+    per-item progress: "copied"/"hashed"/"lfs", "committed", "pushed", "failed".
+    on_commit(commit, branch) is called once the commit (and its LFS content)
+    is ready to push. Uses the
+    copy/in-place ingest mode, LFS rules and push retry settings from config.
+    With a dedup.ContentIndex, files already committed at their path with the
+    same content are reported "unchanged" and skipped before any copying.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    on_state = on_state or (lambda n, state: None)
+    commit_msg = commit_msg or default_commit_message(items)
+    full_target_path = Path(clone_dir).joinpath(*target_rel.split("/")) if target_rel else Path(clone_dir)
+    total_bytes = sum(item.size for item in items) or 1
+    rel_paths = ["/".join(part for part in (target_rel, item.dest) if part) for item in items]
+
+    def lfs_pointers(selected):
+        # Hash LFS files (SHA-256), commit pointers in their place and track them in .gitattributes
+        objects, pointers = [], []
+        for n in selected:
+            item = items[n]
+            job.status(f"Hashing for LFS: {item.dest}")
+            if n in digests:
+                oid = digests[n][0]
+            else:
+                oid = sha256_file(item.source, on_progress=lambda done: job.progress(20 * done / total_bytes))
+            objects.append({"oid": oid, "size": item.size, "source": item.source})
+            pointers.append((rel_paths[n], LFS_POINTER.format(oid=oid, size=item.size).encode()))
+            on_state(n, "lfs")
+        try:
+            index_blobs(job, clone_dir, pointers, env=env)
+            patterns = [lfs_attr_pattern(rel) for rel, _ in pointers]
+            if ensure_lfs_attributes(clone_dir, patterns):
+                stage_paths(job, clone_dir, [".gitattributes"], env=env)
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.strip() if e.stderr else "No error output."
+            raise GitzillaError("Git Error", f"Error staging LFS pointers:\n{error_output}")
+        return objects
+
+    def ingest(selected):
+        # Hash sources where they are (0-20% of the bar, by bytes)
+        sizes = [0]
+        for n in selected:
+            sizes.append(sizes[-1] + items[n].size)
+
+        def on_file(k):
+            n = selected[k - 1]
+            on_state(n, "hashed")
+            job.status(f"Hashed {k}/{len(selected)}: {items[n].dest}")
+            job.progress(20 * sizes[k] / total_bytes)
+
+        try:
+            index_in_place(job, clone_dir, [(rel_paths[n], items[n].source) for n in selected],
+                           env=env, on_file=on_file)
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.strip() if e.stderr else "No error output."
+            raise GitzillaError("Git Error", f"Error hashing files:\n{error_output}")
+
+    def copy_in(selected):
+        if not selected:
+            return
+        try:
+            # Every folder written to, as items' dests may have folders of their own
+            sparse_add(job, clone_dir, sorted({rel_paths[n].rpartition("/")[0] for n in selected}), env=env)
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.strip() if e.stderr else "No error output."
+            raise GitzillaError("Sparse Checkout Error", f"Error widening sparse checkout:\n{error_output}")
+
+        # Copy every file into the target folder (0-20% of the bar, by bytes)
+        copied = 0
+        for k, n in enumerate(selected, 1):
+            item = items[n]
+            job.check_cancelled()
+            dest_file = full_target_path / item.dest
+            # Create the target directory if it doesn't exist
+            try:
+                dest_file.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise GitzillaError("Folder Creation Error", f"Error creating new folder(s):\n{str(e)}")
+            try:
+                with job.span("copy", bytes=item.size) as span:
+                    span.set(method=fast_copy(item.source, dest_file,
+                                              on_progress=lambda done: job.progress(20 * (copied + done) / total_bytes)))
+                    shutil.copymode(item.source, dest_file)  # keep the executable bit, as in_place does
+            except Exception as e:
+                on_state(n, "failed")
+                raise GitzillaError("File Copy Error", f"Error copying file:\n{str(e)}")
+            copied += item.size
+            on_state(n, "copied")
+            job.status(f"Copied {k}/{len(selected)}: {item.dest}")
+
+    # Decide which files go through LFS
+    try:
+        lfs = set(lfs_routes(job, clone_dir, items, rel_paths, config, env=env))
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Git Error", f"Error reading .gitattributes:\n{error_output}")
+
+    # Skip files whose content is already committed at their path
+    same, digests = set(), {}
+    if index is not None:
+        try:
+            same, digests = unchanged_items(job, clone_dir, items, rel_paths, lfs, index, env=env)
+        except subprocess.CalledProcessError as e:
+            error_output = e.stderr.strip() if e.stderr else "No error output."
+            raise GitzillaError("Git Error", f"Error reading the repository tree:\n{error_output}")
+        for n in sorted(same):
+            on_state(n, "unchanged")
+        if len(same) == len(items):
+            return False
+        lfs -= same
+    todo = [n for n in range(len(items)) if n not in same]
+    plain = [n for n in todo if n not in lfs]
+
+    lfs_objects = lfs_pointers(sorted(lfs)) if lfs else []
+    if config["ingest_mode"] == "in_place":
+        ingest(plain)
+    else:
+        copy_in(plain)
+
+    # Commit and push changes
+    try:
+        # Stage only the files written above (in-place files are already in the index)
+        if config["ingest_mode"] != "in_place":
+            stage_paths(job, clone_dir, [rel_paths[n] for n in plain], env=env)
+        job.progress(25)
+        if not has_staged_changes(job, clone_dir, env=env):
+            return False
+
+        # Git commit (-uno: no untracked-file scan of the working tree)
+        commit_cmd = ["git", "commit", "-uno", "-m", commit_msg]
+        job.run(commit_cmd, env=env, cwd=clone_dir)
+        commit = job.run(["git", "rev-parse", "HEAD"], env=env, cwd=clone_dir).stdout.strip()
+        branch = current_branch(job, clone_dir, env=env)
+        for n in todo:
+            on_state(n, "committed")
+        job.progress(30)
+
+        # LFS content has to be on the server before the pointers are pushed
+        if lfs_objects:
+            remote_url = job.run(["git", "config", "--get", "remote.origin.url"],
+                                 env=env, cwd=clone_dir).stdout.strip()
+            store = lfs_store_for(job, remote_url, config, env=env)
+
+            def on_lfs_progress(done_bytes, total, done_count, total_count):
+                job.status(f"Uploading LFS objects: {done_count}/{total_count}, "
+                           f"{format_size(done_bytes)} of {format_size(total)}")
+                job.progress(30 + 60 * done_bytes / (total or 1))
+
+            job.bytes_transferred += upload_lfs_objects(
+                job, store, lfs_objects, config["lfs_concurrency"], on_progress=on_lfs_progress
+            )
+
+        if on_commit:
+            on_commit(commit, branch)
+
+        # Git push, streaming transfer progress into the rest of the bar; rebase and retry if it loses a race
+        push_with_retry(job, clone_dir, commit, branch, lambda: rebase_clone(job, clone_dir, branch, env=env),
+                        config, env=env, operation="upload_lfs" if lfs_objects else "upload")
+        job.progress(100)
+    except subprocess.CalledProcessError as e:
+        error_output = e.stderr.strip() if e.stderr else "No error output."
+        raise GitzillaError("Git Error", f"Error during Git operations:\n{error_output}")
+    for n in todo:
+        on_state(n, "pushed")
+    return True
@@ -0,0 +1,331 @@
+"""
+Watching a local folder and uploading whatever lands in it. Changes are seen
+through inotify on Linux and by rescanning the folder elsewhere. A file is
+only picked up once writes to it have stopped (debounce) and its size and
+modification time have held still for a while (stability); ready files are
+then collected into windowed batches, each one commit and one push through
+the repository's clone. Only one batch is in flight at a time, so a flood of
+files makes bigger commits rather than more pushes.
+"""
+
+import os
+import sys
+import stat
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import fnmatch
+import subprocess
+
+from .api import upload_batch
+from .config import DEFAULT_CONFIG
+from .dedup import ContentIndex
+from .jobs import GitzillaError, JobCancelled
+from .upload import UploadItem
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_MOVE_SELF
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by len bytes of name
+
+TICK = 0.5               # seconds between checks of the pending files (and for cancellation)
+RETRY_MAX_S = 600        # longest wait before retrying a batch that failed to upload
+
+
+def _stamp(st):
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _ignored(name, patterns):
+    return name == ".git" or any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def scan_folder(root, ignore=()):
+    """{path: (size, mtime_ns)} of the regular files under root, skipping ignored names and .git."""
+    found = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not _ignored(d, ignore)]
+        for name in files:
+            if _ignored(name, ignore):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                found[path] = _stamp(st)
+    return found
+
+
+class InotifyWatcher:
+    """
+    Recursive watch of root through the inotify syscalls (via libc, no extra
+    package). wait() returns (changed paths, rescan); rescan is True when
+    the kernel queue overflowed and events were lost.
+    """
+
+    def __init__(self, root, ignore=()):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.root = root
+        self.ignore = ignore
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs = {}  # watch descriptor -> directory
+        try:
+            self._add_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, top):
+        """Watch top and the folders below it; returns the files already in them."""
+        files = set()
+        for dirpath, dirs, names in os.walk(top):
+            dirs[:] = [d for d in dirs if not _ignored(d, self.ignore)]
+            wd = self._add(self.fd, os.fsencode(dirpath), WATCH_MASK | IN_ONLYDIR)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached (fs.inotify.max_user_watches)")
+                continue  # removed meanwhile or not readable
+            self._dirs[wd] = dirpath
+            files.update(os.path.join(dirpath, n) for n in names if not _ignored(n, self.ignore))
+        return files
+
+    def _drop_tree(self, top):
+        prefix = top + os.sep
+        for wd, path in list(self._dirs.items()):
+            if path == top or path.startswith(prefix):
+                self._rm(self.fd, wd)
+                del self._dirs[wd]
+
+    def wait(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set(), False
+        changed, rescan = set(), False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                name = os.fsdecode(buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                folder = self._dirs.get(wd)
+                if folder is None or not name or _ignored(name, self.ignore):
+                    continue
+                path = os.path.join(folder, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        changed |= self._add_tree(path)  # files may have landed before the watch existed
+                    elif mask & IN_MOVED_FROM:
+                        self._drop_tree(path)
+                elif not mask & IN_MOVED_FROM:
+                    changed.add(path)
+        return changed, rescan
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher:
+    """Rescans root every interval seconds and reports files that appeared or changed."""
+
+    def __init__(self, root, ignore=(), interval=2.0):
+        self.root = root
+        self.ignore = ignore
+        self.interval = interval
+        self._files = scan_folder(root, ignore)
+        self._next = time.monotonic() + interval
+
+    def wait(self, timeout):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            time.sleep(min(delay, timeout))
+            return set(), False
+        files = scan_folder(self.root, self.ignore)
+        changed = {path for path, st in files.items() if self._files.get(path) != st}
+        self._files = files
+        self._next = time.monotonic() + self.interval
+        return changed, False
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, ignore=(), poll_s=2.0):
+    """An InotifyWatcher where the platform has inotify, else a PollingWatcher."""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, ignore)
+        except (OSError, AttributeError):
+            pass  # no inotify in this libc, or out of watches
+    return PollingWatcher(root, ignore, poll_s)
+
+
+class FolderSync:
+    """
+    Keep uploading the files written to folder into target_rel of one
+    repository, until the job is cancelled. Files already in the folder when
+    the watch starts are synced too; with dedup on, those the repository
+    already has are skipped without a commit. A file modified after it was
+    uploaded is uploaded again.
+    """
+
+    def __init__(self, cache, key, url, folder, target_rel="", config=None, env=None, journal=None, index=None,
+                 trees=None):
+        self.cache = cache
+        self.key = key
+        self.url = url
+        self.folder = os.path.abspath(folder)
+        self.target_rel = target_rel.strip("/")
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.env = env
+        self.journal = journal
+        # One dedup index for the whole watch, so each file is hashed once
+        self.index = index if index is not None or not self.config["dedup"] else ContentIndex()
+        self.trees = trees
+
+    def run(self, job, commit_msg=None, on_batch=None):
+        """
+        Watch and upload until cancelled (raises JobCancelled). on_batch(result)
+        is posted after every batch: {"files", "status", "seconds", "pending",
+        "error"} with status "pushed", "unchanged" or "failed".
+        """
+        if not os.path.isdir(self.folder):
+            raise GitzillaError("Watch Error", f"Not a folder: {self.folder}")
+        config = self.config
+        ignore = tuple(config["watch_ignore"])
+        debounce = float(config["watch_debounce_s"])
+        stable = float(config["watch_stable_s"])
+        window = float(config["watch_window_s"])
+        batch_max = max(1, int(config["watch_batch_max"]))
+
+        pending = {}  # path -> [stamp, stamp unchanged since, last event]
+        ready = {}    # path -> stamp, oldest first
+        synced = {}   # path -> stamp that was uploaded
+        window_start = None
+        retry_at, failures = 0.0, 0
+        watcher = open_watcher(self.folder, ignore, float(config["watch_poll_s"]))
+        mode = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+        self.cache.pin(self.key)
+        try:
+            changed, rescan = set(), True
+            while True:
+                job.check_cancelled()
+                now = time.monotonic()
+                if rescan:
+                    changed |= set(scan_folder(self.folder, ignore))
+                for path in changed:
+                    entry = pending.setdefault(path, [None, now, now])
+                    entry[2] = now
+                    ready.pop(path, None)  # written to again: wait for it to settle again
+
+                # Debounce, then wait for size and mtime to hold still
+                for path, entry in list(pending.items()):
+                    if now - entry[2] < debounce:
+                        continue
+                    try:
+                        st = os.lstat(path)
+                    except OSError:
+                        del pending[path]  # deleted or renamed away before it settled
+                        ready.pop(path, None)
+                        continue
+                    if not stat.S_ISREG(st.st_mode):
+                        del pending[path]
+                        continue
+                    if _stamp(st) != entry[0]:
+                        entry[0], entry[1] = _stamp(st), now
+                    elif now - entry[1] >= stable:
+                        del pending[path]
+                        if synced.get(path) != entry[0]:
+                            ready[path] = entry[0]
+                            window_start = window_start or now
+
+                job.status(f"Watching {self.folder} ({mode}): {len(ready)} ready, {len(pending)} settling")
+                if ready and now >= retry_at and (len(ready) >= batch_max or now - window_start >= window):
+                    batch = dict(list(ready.items())[:batch_max])
+                    result = self._upload(job, batch, commit_msg)
+                    if result["status"] == "failed":
+                        failures += 1
+                        retry_at = time.monotonic() + min(RETRY_MAX_S, window * 2 ** (failures - 1))
+                    else:
+                        failures, retry_at = 0, 0.0
+                        for path, st in batch.items():
+                            synced[path] = st
+                            if ready.get(path) == st:
+                                del ready[path]
+                        window_start = time.monotonic() if ready else None
+                    result["pending"] = len(ready) + len(pending)
+                    if on_batch:
+                        job.post(on_batch, result)
+                changed, rescan = watcher.wait(TICK)
+        finally:
+            watcher.close()
+            self.cache.unpin(self.key)
+            if self.index is not None:
+                self.index.save()
+
+    def _upload(self, job, batch, commit_msg):
+        """Upload one batch of {path: stamp}; returns its result instead of raising (except on cancel)."""
+        result = {"files": 0, "status": "failed", "seconds": 0.0, "error": ""}
+        start = time.monotonic()
+        items = []
+        for path in batch:
+            try:
+                items.append(UploadItem(path, os.path.relpath(path, self.folder).replace(os.sep, "/")))
+            except OSError:
+                pass  # gone since it settled
+        result["files"] = len(items)
+        if not items:
+            result["status"] = "unchanged"
+            return result
+        job.status(f"Uploading {len(items)} file(s) from {self.folder}...")
+        try:
+            with job.span("watch batch", "watch", files=len(items)):
+                _, pushed = upload_batch(job, self.cache, self.key, self.url, items, self.target_rel, self.config,
+                                         env=self.env, commit_msg=commit_msg, trees=self.trees,
+                                         journal=self.journal, index=self.index)
+            result["status"] = "pushed" if pushed else "unchanged"
+        except JobCancelled:
+            raise
+        except GitzillaError as e:
+            result["error"] = e.message
+        except subprocess.CalledProcessError as e:
+            result["error"] = (e.stderr or "").strip() or str(e)
+        except OSError as e:
+            result["error"] = str(e)
+        result["seconds"] = round(time.monotonic() - start, 3)
+        return result
@@ -0,0 +1,71 @@
+"""
+Staging uploaded files into a clone: paths matched by .gitignore are still
+uploaded, on both sides of STAGE_INDEX_THRESHOLD ("git add" below it,
+"git update-index" from it).
+
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitzilla_core.config import DEFAULT_CONFIG
+from gitzilla_core.ingest import STAGE_INDEX_THRESHOLD
+from gitzilla_core.jobs import run_job
+from gitzilla_core.upload import UploadItem, upload_to_clone
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Gitzilla Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Gitzilla Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True,
+                          env=dict(os.environ, **IDENTITY)).stdout.strip()
+
+
+class IgnoredPathsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="gitzilla_test_"))
+        self.remote = self.tmp / "remote.git"
+        self.clone = self.tmp / "clone"
+        git(self.tmp, "init", "-q", "--bare", "-b", "main", str(self.remote))
+        git(self.tmp, "clone", "-q", str(self.remote), str(self.clone))
+        (self.clone / ".gitignore").write_text("*.log\n")
+        git(self.clone, "add", ".gitignore")
+        git(self.clone, "commit", "-q", "-m", "initial")
+        git(self.clone, "push", "-q", "origin", "main")
+        self.env = dict(os.environ, **IDENTITY)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def check_uploaded(self, count):
+        src = self.tmp / "src"
+        src.mkdir()
+        items = []
+        for n in range(count):
+            (src / f"run{n}.log").write_text(f"line {n}\n")
+            items.append(UploadItem(src / f"run{n}.log", f"run{n}.log"))
+        config = dict(DEFAULT_CONFIG, ingest_mode="copy")
+        self.assertTrue(run_job(lambda job: upload_to_clone(job, str(self.clone), items, "logs", config,
+                                                            env=self.env)))
+        files = git(self.remote, "ls-tree", "-r", "--name-only", "main").split("\n")
+        self.assertEqual(len([f for f in files if f.startswith("logs/")]), count)
+        self.assertEqual(git(self.remote, "show", f"main:logs/run{count - 1}.log"), f"line {count - 1}")
+
+    def test_ignored_below_threshold(self):
+        self.check_uploaded(1)
+
+    def test_ignored_above_threshold(self):
+        self.check_uploaded(STAGE_INDEX_THRESHOLD + 44)
+
+
+if __name__ == "__main__":
+    unittest.main()
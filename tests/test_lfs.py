@@ -0,0 +1,92 @@
+"""
+LFS-routed uploads against local stores: the object lands in git-lfs's layout
+(<root>/ab/cd/<oid>) under its sha256 oid, and the commit records the pointer.
+
+    python -m unittest discover tests
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitzilla_core.cache import CloneCache
+from gitzilla_core.config import DEFAULT_CONFIG
+from gitzilla_core.jobs import run_job
+from gitzilla_core.plumbing import upload_plumbing
+from gitzilla_core.upload import UploadItem, upload_to_clone
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Gitzilla Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Gitzilla Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True,
+                          env=dict(os.environ, **IDENTITY)).stdout.strip()
+
+
+class LocalStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="gitzilla_test_"))
+        self.remote = self.tmp / "remote.git"
+        self.clone = self.tmp / "clone"
+        git(self.tmp, "init", "-q", "--bare", "-b", "main", str(self.remote))
+        git(self.tmp, "clone", "-q", str(self.remote), str(self.clone))
+        (self.clone / "README").write_text("seed\n")
+        git(self.clone, "add", "README")
+        git(self.clone, "commit", "-q", "-m", "initial")
+        git(self.clone, "push", "-q", "origin", "main")
+        self.env = dict(os.environ, **IDENTITY)
+        self.data = os.urandom(200 * 1024)
+        self.oid = hashlib.sha256(self.data).hexdigest()
+        self.source = self.tmp / "scan.bin"
+        self.source.write_bytes(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def upload(self, config, browse=False):
+        config = dict(DEFAULT_CONFIG, lfs_extensions=[".bin"], **config)
+        items = [UploadItem(self.source, "scan.bin")]
+        if browse:
+            cache = CloneCache(self.tmp / "cache", 1 << 30)
+            return run_job(lambda job: upload_plumbing(
+                job, str(cache.browse(job, "me/remote", self.remote.as_uri())[0]), items, "assets", config,
+                env=self.env))
+        return run_job(lambda job: upload_to_clone(job, str(self.clone), items, "assets", config, env=self.env))
+
+    def check_stored(self, root):
+        obj = root / self.oid[0:2] / self.oid[2:4] / self.oid
+        self.assertTrue(obj.is_file())
+        self.assertEqual(obj.read_bytes(), self.data)
+        pointer = git(self.remote, "show", "main:assets/scan.bin").splitlines()
+        self.assertEqual(pointer, ["version https://git-lfs.github.com/spec/v1",
+                                   f"oid sha256:{self.oid}", f"size {len(self.data)}"])
+        attributes = git(self.remote, "show", "main:.gitattributes").splitlines()
+        self.assertIn("/assets/scan.bin filter=lfs diff=lfs merge=lfs -text", attributes)
+
+    def test_local_remote(self):
+        # No endpoint configured: a local remote keeps objects in <gitdir>/lfs/objects
+        self.assertTrue(self.upload({"ingest_mode": "copy"}))
+        self.check_stored(self.remote / "lfs" / "objects")
+
+    def test_endpoint_directory(self):
+        store = self.tmp / "lfs-store"
+        self.assertTrue(self.upload({"ingest_mode": "in_place", "lfs_endpoint": store.as_uri()}))
+        self.check_stored(store)
+        self.assertFalse((self.remote / "lfs").exists())
+
+    def test_endpoint_directory_browse(self):
+        store = self.tmp / "lfs-store"
+        self.assertTrue(self.upload({"lfs_endpoint": str(store)}, browse=True))
+        self.check_stored(store)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+The plumbing (browse mode) upload engine against a local bare remote: the same
+files must give the same repository content as an upload through a clone.
+
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitzilla_core.cache import CloneCache
+from gitzilla_core.config import DEFAULT_CONFIG
+from gitzilla_core.jobs import run_job
+from gitzilla_core.plumbing import upload_plumbing
+from gitzilla_core.upload import UploadItem, upload_to_clone
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Gitzilla Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Gitzilla Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True,
+                          env=dict(os.environ, **IDENTITY)).stdout.strip()
+
+
+class AttributesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="gitzilla_test_"))
+        self.remote = self.tmp / "remote.git"
+        self.clone = self.tmp / "clone"
+        git(self.tmp, "init", "-q", "--bare", "-b", "main", str(self.remote))
+        seed = self.tmp / "seed"
+        git(self.tmp, "clone", "-q", str(self.remote), str(seed))
+        (seed / ".gitattributes").write_text("*.txt text eol=lf\n")
+        (seed / "nested").mkdir()
+        (seed / "nested" / ".gitattributes").write_text("*.cfg text\n")
+        git(seed, "add", "-A")
+        git(seed, "commit", "-q", "-m", "initial")
+        git(seed, "push", "-q", "origin", "main")
+        git(self.tmp, "clone", "-q", str(self.remote), str(self.clone))
+        self.env = dict(os.environ, **IDENTITY)
+        self.sources = self.tmp / "src"
+        self.sources.mkdir()
+        self.files = {"notes.txt": b"one\r\ntwo\r\n", "app.cfg": b"a=1\r\n", "raw.bin": b"\x00\r\n\xff"}
+        for name, data in self.files.items():
+            (self.sources / name).write_bytes(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def items(self):
+        return [UploadItem(self.sources / name, name) for name in self.files]
+
+    def blobs(self, folder):
+        return {name: git(self.remote, "rev-parse", f"main:{folder}/{name}") for name in self.files}
+
+    def test_browse_matches_clone(self):
+        for mode in ("copy", "in_place"):
+            git(self.clone, "pull", "-q", "--ff-only")
+            config = dict(DEFAULT_CONFIG, ingest_mode=mode)
+            self.assertTrue(run_job(lambda job: upload_to_clone(
+                job, str(self.clone), self.items(), f"nested/{mode}", config, env=self.env)))
+        cache = CloneCache(self.tmp / "cache", 1 << 30)
+        self.assertTrue(run_job(lambda job: upload_plumbing(
+            job, str(cache.browse(job, "me/remote", self.remote.as_uri())[0]), self.items(), "nested/browse",
+            DEFAULT_CONFIG, env=self.env)))
+
+        browse = self.blobs("nested/browse")
+        self.assertEqual(browse, self.blobs("nested/copy"))
+        self.assertEqual(browse, self.blobs("nested/in_place"))
+        self.assertEqual(git(self.remote, "show", "main:nested/browse/notes.txt"), "one\ntwo")
+        self.assertEqual(git(self.remote, "cat-file", "-s", browse["raw.bin"]), "4")
+
+
+if __name__ == "__main__":
+    unittest.main()
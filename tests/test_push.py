@@ -0,0 +1,186 @@
+"""
+Rejected pushes from a working clone, against a local bare remote: the upload
+is replayed onto the new remote tip and pushed again, also when the clone's
+working tree is missing files that were uploaded straight into the index,
+and without losing .gitattributes rules added upstream in the meantime.
+
+    python -m unittest discover tests
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+from gitzilla_core.api import connect_repo, resume_upload, upload_batch
+from gitzilla_core.cache import BROWSE_MODE, CloneCache
+from gitzilla_core.config import DEFAULT_CONFIG
+from gitzilla_core.jobs import GitzillaError, run_job
+from gitzilla_core.journal import UploadJournal
+from gitzilla_core.plumbing import upload_plumbing
+from gitzilla_core.upload import UploadItem, upload_to_clone
+
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Gitzilla Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Gitzilla Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=cwd, check=True, capture_output=True, text=True,
+                          env=dict(os.environ, **IDENTITY)).stdout.strip()
+
+
+class RejectedPushTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="gitzilla_test_"))
+        self.remote = self.tmp / "remote.git"
+        self.clone = self.tmp / "clone"
+        self.other = self.tmp / "other"
+        git(self.tmp, "init", "-q", "--bare", "-b", "main", str(self.remote))
+        git(self.tmp, "clone", "-q", str(self.remote), str(self.other))
+        (self.other / "docs" / "a").mkdir(parents=True)
+        (self.other / "docs" / "a" / "notes.txt").write_text("first\n")
+        git(self.other, "add", "-A")
+        git(self.other, "commit", "-q", "-m", "initial")
+        git(self.other, "push", "-q", "origin", "main")
+        git(self.tmp, "clone", "-q", str(self.remote), str(self.clone))
+        self.env = dict(os.environ, **IDENTITY)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def source(self, name, data):
+        path = self.tmp / "src" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def push_upstream(self, path="docs/a/notes.txt", text="changed upstream\n"):
+        git(self.other, "pull", "-q", "--ff-only")
+        (self.other / path).write_text(text)
+        git(self.other, "add", path)
+        git(self.other, "commit", "-q", "-m", "upstream change")
+        git(self.other, "push", "-q", "origin", "main")
+
+    def upload(self, config, name, data, race=None, browse=False):
+        # race: someone else pushes between our commit and our push
+        on_commit = (lambda commit, branch: self.push_upstream(**race)) if race is not None else None
+        items = [UploadItem(self.source(name, data), name)]
+        if browse:
+            cache = CloneCache(self.tmp / "cache", 1 << 30)
+            return run_job(lambda job: upload_plumbing(
+                job, str(cache.browse(job, "me/remote", self.remote.as_uri())[0]), items, "docs/a/up", config,
+                env=self.env, on_commit=on_commit))
+        return run_job(lambda job: upload_to_clone(job, str(self.clone), items, "docs/a/up", config, env=self.env,
+                                                   on_commit=on_commit))
+
+    def check_replayed(self):
+        head = git(self.clone, "rev-parse", "HEAD")
+        self.assertEqual(head, git(self.remote, "rev-parse", "main"))
+        files = git(self.remote, "ls-tree", "-r", "--name-only", "main").split("\n")
+        self.assertIn("docs/a/up/first.dat", files)
+        self.assertIn("docs/a/up/second.dat", files)
+        self.assertEqual(git(self.remote, "show", "main:docs/a/notes.txt"), "changed upstream")
+        # The upstream change reached the working tree, and nothing is left staged
+        self.assertEqual((self.clone / "docs" / "a" / "notes.txt").read_text(), "changed upstream\n")
+        self.assertEqual(git(self.clone, "diff", "--cached", "--name-only"), "")
+
+    def test_in_place_upload_is_replayed(self):
+        config = dict(DEFAULT_CONFIG, ingest_mode="in_place")
+        self.assertTrue(self.upload(config, "first.dat", b"one"))
+        self.assertIn("D docs/a/up/first.dat", git(self.clone, "status", "--porcelain"))
+        self.assertTrue(self.upload(config, "second.dat", b"two", race={}))
+        self.check_replayed()
+
+    def test_lfs_upload_is_replayed(self):
+        config = dict(DEFAULT_CONFIG, ingest_mode="copy", lfs_extensions=[".dat"])
+        self.assertTrue(self.upload(config, "first.dat", b"one"))
+        self.assertTrue(self.upload(config, "second.dat", b"two", race={}))
+        self.check_replayed()
+        pointer = git(self.remote, "show", "main:docs/a/up/second.dat")
+        self.assertTrue(pointer.startswith("version https://git-lfs.github.com/spec/v1"))
+
+    def check_attributes_merged(self, browse):
+        config = dict(DEFAULT_CONFIG, ingest_mode="copy", lfs_extensions=[".dat"])
+        self.assertTrue(self.upload(config, "first.dat", b"one", browse=browse))
+        rule = "*.psd filter=lfs diff=lfs merge=lfs -text"
+        upstream = git(self.remote, "show", "main:.gitattributes") + "\n" + rule + "\n"
+        self.assertTrue(self.upload(config, "second.dat", b"two", browse=browse,
+                                    race={"path": ".gitattributes", "text": upstream}))
+        attributes = git(self.remote, "show", "main:.gitattributes").splitlines()
+        self.assertIn(rule, attributes)
+        self.assertIn("/docs/a/up/first.dat filter=lfs diff=lfs merge=lfs -text", attributes)
+        self.assertIn("/docs/a/up/second.dat filter=lfs diff=lfs merge=lfs -text", attributes)
+
+    def test_replay_keeps_upstream_attributes(self):
+        self.check_attributes_merged(browse=False)
+
+    def test_replay_keeps_upstream_attributes_browse(self):
+        self.check_attributes_merged(browse=True)
+
+    def test_upload_wins_over_upstream_change(self):
+        config = dict(DEFAULT_CONFIG, ingest_mode="copy")
+        self.assertTrue(self.upload(config, "first.dat", b"one"))
+        git(self.other, "pull", "-q", "--ff-only")
+        (self.other / "docs" / "a" / "up" / "first.dat").write_text("theirs\n")
+        git(self.other, "commit", "-q", "-am", "upstream edit")
+        git(self.other, "push", "-q", "origin", "main")
+        self.assertTrue(self.upload(config, "first.dat", b"ours"))
+        self.assertEqual(git(self.remote, "show", "main:docs/a/up/first.dat"), "ours")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class ResumeTest(unittest.TestCase):
+    """An upload whose push failed is resumed from its journaled commit, not from its source files."""
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="gitzilla_test_"))
+        self.remote = self.tmp / "remote.git"
+        git(self.tmp, "init", "-q", "--bare", "-b", "main", str(self.remote))
+        seed = self.tmp / "seed"
+        git(self.tmp, "clone", "-q", str(self.remote), str(seed))
+        (seed / "README").write_text("seed\n")
+        git(seed, "add", "-A")
+        git(seed, "commit", "-q", "-m", "initial")
+        git(seed, "push", "-q", "origin", "main")
+        self.env = dict(os.environ, **IDENTITY)
+        self.cache = CloneCache(self.tmp / "cache", 1 << 30)
+        self.journal = UploadJournal(self.tmp / "journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def check_resume(self, mode):
+        config = dict(DEFAULT_CONFIG, clone_mode=mode)
+        url = self.remote.as_uri()
+        hook = self.remote / "hooks" / "pre-receive"
+        hook.write_text("#!/bin/sh\necho rejected by policy >&2\nexit 1\n")
+        hook.chmod(0o755)
+        source = self.tmp / "data.bin"
+        source.write_bytes(b"payload")
+        run_job(lambda job: connect_repo(job, self.cache, "me/remote", url, config, env=self.env))
+        with self.assertRaises(GitzillaError):
+            run_job(lambda job: upload_batch(job, self.cache, "me/remote", url, [UploadItem(source, "data.bin")],
+                                             "up", config, env=self.env, journal=self.journal))
+        hook.unlink()
+        source.unlink()
+
+        run_job(lambda job: connect_repo(job, self.cache, "me/remote", url, config, env=self.env))
+        [entry] = self.journal.pending("me/remote")
+        result = run_job(lambda job: resume_upload(job, self.cache, self.journal, entry["id"], config, env=self.env))
+        self.assertEqual(result["status"], "pushed")
+        self.assertEqual(git(self.remote, "show", "main:up/data.bin"), "payload")
+        self.assertEqual(self.journal.pending("me/remote"), [])
+
+    def test_resume_full(self):
+        self.check_resume("full")
+
+    def test_resume_browse(self):
+        self.check_resume(BROWSE_MODE)